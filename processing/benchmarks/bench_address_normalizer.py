@@ -0,0 +1,96 @@
+"""
+data-cleansing-job の住所正規化のベンチマーク。
+
+従来のセル単位の処理（Series.apply を3回）と、ユニーク値のみを
+ベクトル化して正規化する address_normalizer を比較する。
+
+Usage:
+    python benchmarks/bench_address_normalizer.py --rows 500000 --unique 20000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+JOB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function", "D001", "preprocess",
+                       "data-cleansing-job")
+sys.path.insert(0, JOB_DIR)
+
+from address_normalizer import normalize_address_column  # noqa: E402
+from synthetic_data import addresses  # noqa: E402
+
+
+# 以下は data-cleansing-job の従来のセル単位の処理（比較用）
+def convert_address(address):
+    if isinstance(address, str):
+        address = re.sub(r"(\d+)丁目", r"\1-", address)
+        address = re.sub(r"(\d+)番地(\d+号?)", r"\1-\2", address)
+        address = re.sub(r"(\d+)番地$", r"\1", address)
+        address = re.sub(r'-$', '', address)
+    return address
+
+
+def replace_single_katakana(text):
+    single_no_pattern = r'(?<![ｦ-ﾟ])ﾉ(?![ｦ-ﾟ])|(?<![ァ-ン])ノ(?![ァ-ン])'
+    single_ke_pattern = r'(?<![ｦ-ﾟ])ｹ(?![ｦ-ﾟ])|(?<![ァ-ン])ケ(?![ァ-ン])'
+    single_tsu_pattern = r'(?<![ｦ-ﾟ])ﾂ(?![ｦ-ﾟ])|(?<![ァ-ン])ツ(?![ァ-ン])'
+    if isinstance(text, str):
+        text = re.sub(single_no_pattern, "の", text)
+        text = re.sub(single_ke_pattern, "が", text)
+        text = re.sub(single_tsu_pattern, "つ", text)
+    return text
+
+
+def convert_halfwidth_to_fullwidth(text):
+    half_to_full_katakana_map = str.maketrans(
+        "ｦｧｨｩｪｫｬｭｮｯｰｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜﾝﾞﾟ",
+        "ヲァィゥェォャュョッーアイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン゛゜"
+    )
+    if pd.isna(text):
+        return text
+    text = text.translate(half_to_full_katakana_map)
+    text = re.sub(r'(\w゛)', lambda x: chr(ord(x.group(1)[0]) + 1), text)
+    text = re.sub(r'(\w゜)', lambda x: chr(ord(x.group(1)[0]) + 2), text)
+    return text
+
+
+def per_cell(column):
+    column = column.apply(convert_address)
+    column = column.apply(replace_single_katakana)
+    column = column.apply(convert_halfwidth_to_fullwidth)
+    return column
+
+
+def measure(func, column, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(column)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--unique", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    column = addresses(args.rows, args.unique)
+    per_cell_time, expected = measure(per_cell, column, args.repeat)
+    engine_time, actual = measure(normalize_address_column, column, args.repeat)
+
+    pd.testing.assert_series_equal(expected, actual, check_dtype=False)
+    print(f"rows={args.rows} unique={args.unique}")
+    print(f"per-cell apply : {per_cell_time:.3f}s")
+    print(f"normalizer     : {engine_time:.3f}s")
+    print(f"speedup        : {per_cell_time / engine_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+data-cleansing-job のクレンジング処理のスケーリングベンチマーク。
+
+従来の処理（リクエスト順に op ごとに列全体を置換し、住所・日付はセル単位の
+apply、外れ値は detect_outliers で正規化）と、フィールドごとに op をまとめて
+1パスで処理する cleansing_planner をワーカー数（コア数）を変えて比較する。
+
+Usage:
+    python benchmarks/bench_cleansing_planner.py --rows 1000000 --fields 8 --workers 1 2 4 8
+"""
+import argparse
+import datetime
+import os
+import random
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+JOB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function", "D001", "preprocess",
+                       "data-cleansing-job")
+sys.path.insert(0, JOB_DIR)
+
+from bench_address_normalizer import per_cell  # noqa: E402
+from cleansing_planner import plan_cleansing, run_cleansing_plan  # noqa: E402
+from synthetic_data import address_pool, date_pool, fuzzy_name, name_pool  # noqa: E402
+from utils import detect_outliers  # noqa: E402
+
+
+# 1つのスキャンにまとめると結果が変わる置換ルールの組（従来の処理と同じ結果になることを確認する）
+REPLACE_CASES = [
+    [("株式会社", "(株)"), ("(株)", "KK")],  # 連鎖: 前の置換結果が次の置換対象になる
+    [("市", "市役所"), ("役所", "庁舎")],  # 置換結果と次の置換対象が部分的に重なる
+    [("丁目", "-"), ("目黒", "メグロ")],  # 置換対象どうしが重なる
+    [("1", "１"), ("12", "十二")],  # 短い置換対象が先
+    [("東京都", ""), ("区新", "区・新")],  # 削除で前後がつながる
+    [("(株)", "株式会社"), ("(有)", "有限会社"), ("(株)", "KK")],  # 独立したルールと重複した置換対象
+]
+REPLACE_VALUES = ["株式会社山田", "(株)山田", "札幌市", "目黒区1丁目目黒", "12番地", "東京都新宿区新宿", "(有)田中", None]
+
+
+def check_replace_rules():
+    for rules in REPLACE_CASES:
+        df = pd.DataFrame({"name": REPLACE_VALUES})
+        request = {"cleansing": [{"type": "replace", "field": "name", "target": target, "replace": replace}
+                                 for target, replace in rules]}
+        check(legacy(df.copy(), request), planned(df.copy(), request, 1), request)
+
+
+def generate(rows, fields, seed=0):
+    rng = random.Random(seed)
+    pool_rng = np.random.default_rng(seed)
+    names = [fuzzy_name(name, pool_rng) for name in name_pool(5000, pool_rng)]
+    addresses = address_pool(5000, pool_rng)
+    dates = date_pool(500, pool_rng)
+    data = {}
+    cleansing = []
+    for i in range(fields):
+        field = f"field{i}"
+        kind = i % 4
+        if kind == 0:
+            data[field] = [rng.choice(names) for _ in range(rows)]
+            cleansing += [{"type": "replace", "field": field, "target": "(株)", "replace": "株式会社"},
+                          {"type": "replace", "field": field, "target": "(有)", "replace": "有限会社"}]
+        elif kind == 1:
+            data[field] = [rng.choice(addresses) for _ in range(rows)]
+            cleansing += [{"type": "replace", "field": field, "target": "東京都", "replace": ""},
+                          {"type": "normalize", "field": field, "dataType": "address"}]
+        elif kind == 2:
+            data[field] = [rng.choice(dates) for _ in range(rows)]
+            cleansing += [{"type": "normalize", "field": field, "dataType": "datetime"}]
+        else:
+            data[field] = [str(rng.gauss(100, 15)) if rng.random() > 0.001 else "99999" for _ in range(rows)]
+            cleansing += [{"type": "normalize", "field": field, "dataType": "unitnum"}]
+    return pd.DataFrame(data), {"cleansing": cleansing}
+
+
+# 以下は data-cleansing-job の従来の処理（op ごとに列全体をセル単位で処理する）。比較用
+def convert_date_to_gregorian(date_text, output_format="%Y-%m-%d"):
+    # 和暦の「令和」「平成」「昭和」などを西暦に変換
+    era_mapping = {
+        "令和": 2018,  # 令和1年は2019年
+        "平成": 1988,  # 平成1年は1989年
+        "昭和": 1925,  # 昭和1年は1926年
+        "大正": 1911,  # 大正1年は1912年
+        "明治": 1867   # 明治1年は1868年
+    }
+
+    # 日付と時刻の正規表現パターン
+    patterns = [
+        r"(\d{4})年(\d{1,2})月(\d{1,2})日(?:.*?(\d{1,2})時(\d{1,2})分)?",  # 西暦形式
+        r"(令和|平成|昭和|大正|明治)(\d+)年(\d{1,2})月(\d{1,2})日(?:.*?(\d{1,2})時(\d{1,2})分)?",  # 和暦形式
+        r"(R|H|S|T|M)(\d+)年(\d{1,2})月(\d{1,2})日(?:.*?(\d{1,2})時(\d{1,2})分)?"   # 略記和暦形式
+    ]
+    if date_text is None:
+        return None
+    for pattern in patterns:
+        match = re.search(pattern, date_text)
+        if match:
+            groups = match.groups()
+            if len(groups) >= 4:
+                if groups[0] in era_mapping:  # 和暦形式
+                    era, year, month, day = groups[:4]
+                    year = era_mapping[era] + int(year)
+                elif groups[0] in "RHS":  # 略記和暦
+                    era, year, month, day = groups[:4]
+                    era_mapping_short = {"R": 2018, "H": 1988, "S": 1925}
+                    year = era_mapping_short[era] + int(year)
+                else:  # 西暦形式
+                    year, month, day = groups[:3]
+
+                # 時刻を抽出（デフォルトは 00:00:00）
+                try:
+                    hour = int(groups[4]) if len(groups) > 4 and groups[4] else 0
+                    minute = int(groups[5]) if len(groups) > 5 and groups[5] else 0
+                    if not (0 <= hour < 24) or not (0 <= minute < 60):
+                        raise ValueError
+                except ValueError:
+                    hour, minute = 0, 0  # 不正な時刻は 00:00:00 に設定
+
+                # 日時オブジェクトに変換
+                dt = datetime.datetime(int(year), int(month), int(day), hour, minute)
+                return dt.strftime(output_format)
+
+    # 日付が解析できない場合
+    return None
+
+
+def convert_to_year(value):
+    try:
+        if pd.isna(value) or value in ["特に記載なし", "未入力", "不明", "null", "記載なし", "データなし"]:
+            return None
+        value = str(value).strip()
+
+        # 和暦の変換
+        if re.match(r"令和(\d+)年?", value):  # 令和
+            year = int(re.search(r"令和(\d+)", value).group(1))
+            return 2018 + year
+        elif re.match(r"平成(\d+)年?", value):  # 平成
+            year = int(re.search(r"平成(\d+)", value).group(1))
+            return 1988 + year
+        elif re.match(r"昭和(\d+)年?", value):  # 昭和
+            year = int(re.search(r"昭和(\d+)", value).group(1))
+            return 1925 + year
+
+        # 西暦の変換
+        if re.match(r"\d{4}年", value):  # 西暦が含まれる場合
+            return int(re.search(r"(\d{4})年", value).group(1))
+
+        # 数字のみの場合（5年など）
+        if re.match(r"^\d+年", value):
+            year = int(re.search(r"^(\d+)年", value).group(1))
+            return year
+
+        # 不明な形式は None
+        return None
+    except Exception:
+        return None
+
+
+def legacy(df, request):
+    for op in request["cleansing"]:
+        field = op["field"]
+        if op["type"] == "normalize":
+            if op["dataType"] == "address":
+                df[field] = per_cell(df[field])
+            if op["dataType"] == "datetime":
+                datetime_format = op.get("datetimeFormat", None) or '%Y-%m-%d'
+                if datetime_format.lower() == '%y':
+                    df[field] = df[field].apply(convert_to_year)
+                else:
+                    df[field] = df[field].apply(lambda x: convert_date_to_gregorian(x, datetime_format))
+            if op["dataType"] == "unitnum":
+                df[field] = pd.to_numeric(df[field], errors="coerce")
+                outliers = detect_outliers(df, field)["outliers"]
+                df.loc[outliers, field] = pd.NA
+        elif op["type"] == "replace":
+            df[field] = df[field].replace(re.escape(op["target"]), op["replace"], regex=True)
+    return df
+
+
+def check(expected, actual, request):
+    # 西暦の区切り文字形式（2023/04/01 など）は従来の処理では None になり、現在は日付に変換されるので、
+    # 日付の列は従来の処理で変換できた行だけを比べる
+    date_fields = [op["field"] for op in request["cleansing"] if op.get("dataType") == "datetime"]
+    for field in date_fields:
+        parsed = expected[field].notna()
+        pd.testing.assert_series_equal(expected.loc[parsed, field], actual.loc[parsed, field], check_dtype=False)
+    pd.testing.assert_frame_equal(expected.drop(columns=date_fields), actual.drop(columns=date_fields),
+                                  check_dtype=False)
+
+
+def planned(df, request, workers):
+    return run_cleansing_plan(df, plan_cleansing(request["cleansing"], df.columns), max_workers=workers)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--fields", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    check_replace_rules()
+    df, request = generate(args.rows, args.fields)
+    start = time.perf_counter()
+    expected = legacy(df.copy(), request)
+    legacy_time = time.perf_counter() - start
+    print(f"rows={args.rows} fields={args.fields} ops={len(request['cleansing'])}")
+    print(f"legacy              : {legacy_time:.3f}s")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        actual = planned(df.copy(), request, workers)
+        elapsed = time.perf_counter() - start
+        check(expected, actual, request)
+        print(f"planner workers={workers:<3d}: {elapsed:.3f}s  speedup={legacy_time / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+cross-event-job のクロス集計のスケーリングベンチマーク。
+
+ファイル全体を読み込む従来の cross_tabulation と、バッチごとに集計する
+chunked_cross_tabulation（1プロセス）、キーのハッシュでパーティション分割して
+プロセスプールで集計する parallel_cross_tabulation をワーカー数（コア数）を
+変えて比較する。入力は synthetic_data.records の JSON（バイト範囲で分割する経路）か
+GeoPackage（Arrow のバッチを共有メモリで渡す経路）で、--input で既存の
+ファイルも指定できる。計測の前に、数値と文字列が混ざったキーで3つの結果の
+行の順が同じであることを確認する。
+
+Usage:
+    python benchmarks/bench_cross_parallel.py --rows 10000000 --workers 1 2 4 8 --skip-legacy
+    python benchmarks/bench_cross_parallel.py --rows 10000000 --format gpkg --workers 1 2 4 8 --skip-legacy
+    python benchmarks/bench_cross_parallel.py --input records.json --workers 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+import pandas as pd
+
+JOB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function", "D002", "cross-event-job")
+sys.path.insert(0, JOB_DIR)
+os.environ.setdefault("DMS_DATA", "")
+
+from main import cross_tabulation  # noqa: E402
+from chunked_crosstab import chunked_cross_tabulation  # noqa: E402
+from parallel_crosstab import parallel_cross_tabulation  # noqa: E402
+from synthetic_data import points, records  # noqa: E402
+
+KEY_FIELDS = ["都道府県", "区分"]
+FIELDS = [
+    {"name": "種別", "cnt": True},
+    {"name": "定員", "sum": True, "avg": True},
+    {"name": "面積", "sum": True, "avg": True},
+]
+
+
+def write_records(path, rows, chunk_rows=1_000_000, seed=0, file_format="json"):
+    """Write synthetic records as a JSON array or a GeoPackage of points, one chunk of rows at a time."""
+    if file_format == "gpkg":
+        for index, start in enumerate(range(0, rows, chunk_rows)):
+            chunk = records(min(chunk_rows, rows - start), seed=seed + index)
+            gdf = gpd.GeoDataFrame(chunk[KEY_FIELDS + [field["name"] for field in FIELDS]],
+                                   geometry=points(len(chunk), seed=seed + index).geometry)
+            gdf.to_file(path, driver="GPKG", mode="a" if start else "w")
+        return
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[")
+        for index, start in enumerate(range(0, rows, chunk_rows)):
+            chunk = records(min(chunk_rows, rows - start), seed=seed + index)
+            if start:
+                file.write(",")
+            file.write(chunk.to_json(orient="records", force_ascii=False)[1:-1])
+        file.write("]")
+
+
+def check(expected, actual):
+    pd.testing.assert_frame_equal(expected[0], actual[0])
+    pd.testing.assert_frame_equal(expected[1], actual[1], check_exact=False)
+
+
+def check_mixed_keys(work_dir, rows=2_000):
+    """Compare the three paths on keys which mix numbers and strings, read in several batches."""
+    frame = records(rows, seed=1)[KEY_FIELDS + [field["name"] for field in FIELDS]]
+    frame["都道府県"] = frame["都道府県"].astype(object)
+    frame.loc[frame.index % 3 == 0, "都道府県"] = frame.index[frame.index % 3 == 0] % 7
+    path = os.path.join(work_dir, "mixed_keys.json")
+    frame.to_json(path, orient="records", force_ascii=False)
+
+    expected = cross_tabulation(path, "json", KEY_FIELDS, FIELDS)
+    check(expected, chunked_cross_tabulation(path, "json", KEY_FIELDS, FIELDS, batch_bytes=16 * 1024))
+    check(expected, parallel_cross_tabulation(path, "json", KEY_FIELDS, FIELDS, workers=2, batch_bytes=16 * 1024))
+    print(f"mixed-type keys     : {len(expected[1])} groups in the same order")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--input", help="existing JSON array or vector file with the columns of synthetic_data.records")
+    parser.add_argument("--format", choices=["json", "gpkg"], default="json", help="format of the generated input")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--skip-legacy", action="store_true", help="skip reading the whole file (needs a lot of memory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        check_mixed_keys(work_dir)
+
+        path = args.input
+        if path is None:
+            path = os.path.join(work_dir, f"records.{args.format}")
+            start = time.perf_counter()
+            write_records(path, args.rows, file_format=args.format)
+            print(f"generated {args.rows} rows in {time.perf_counter() - start:.1f}s")
+        extension = os.path.splitext(path)[1].lstrip(".").lower()
+        print(f"input={path} size={os.path.getsize(path) / 1024 / 1024:.0f}MiB cpus={os.cpu_count()}")
+
+        start = time.perf_counter()
+        expected = chunked_cross_tabulation(path, extension, KEY_FIELDS, FIELDS)
+        baseline = time.perf_counter() - start
+        print(f"chunked             : {baseline:.3f}s")
+
+        if not args.skip_legacy:
+            start = time.perf_counter()
+            actual = cross_tabulation(path, extension, KEY_FIELDS, FIELDS)
+            elapsed = time.perf_counter() - start
+            check(actual, expected)
+            print(f"legacy              : {elapsed:.3f}s")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            actual = parallel_cross_tabulation(path, extension, KEY_FIELDS, FIELDS, workers=workers)
+            elapsed = time.perf_counter() - start
+            check(expected, actual)
+            print(f"parallel workers={workers:<3d}: {elapsed:.3f}s  speedup={baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
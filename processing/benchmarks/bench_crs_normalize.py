@@ -0,0 +1,87 @@
+"""
+data-cleansing-job のCRS正規化（Z座標の除去 + WGS84への変換）のベンチマーク。
+
+synthetic_data.census_polygons を平面直角座標系（EPSG:6677）に変換したZ付きポリゴンの
+GeoJSONに対して、従来の処理（shape() のリスト内包 + apply(remove_z_coordinate) + to_crs）と
+to_frame + convert_crs（shapely.force_2d / キャッシュした pyproj Transformer による一括変換）を比較する。
+
+Usage:
+    python benchmarks/bench_crs_normalize.py --vertices 1000000 --vertices-per-polygon 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import geopandas as gpd
+from shapely.geometry import MultiPolygon, Polygon, shape
+
+JOB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function", "D001", "preprocess",
+                       "data-cleansing-job")
+sys.path.insert(0, JOB_DIR)
+
+from main import to_frame, convert_crs  # noqa: E402
+from synthetic_data import JGD2011_PLANE_IX, census_polygons  # noqa: E402
+
+
+def generate_geojson(vertices, vertices_per_polygon, seed=0):
+    gdf = census_polygons(max(vertices // vertices_per_polygon, 1), crs=JGD2011_PLANE_IX, seed=seed,
+                          vertices=vertices_per_polygon, z=10.0)
+    data = json.loads(gdf.to_json(to_wgs84=False))
+    epsg = gdf.crs.to_epsg()
+    data["crs"] = {"type": "name", "properties": {"name": f"urn:ogc:def:crs:EPSG::{epsg}"}}
+    return data
+
+
+def remove_z_coordinate(geometry):
+    if geometry.geom_type == 'Polygon':
+        return Polygon([(x, y) for x, y, *_ in geometry.exterior.coords])
+    elif geometry.geom_type == 'MultiPolygon':
+        return MultiPolygon([Polygon([(x, y) for x, y, *_ in poly.exterior.coords]) for poly in geometry.geoms])
+    return geometry
+
+
+def legacy(data):
+    crs_info = data['crs']['properties']['name']
+    features = data['features']
+    properties = [feature['properties'] for feature in features]
+    geometries = [shape(feature['geometry']) if feature['geometry'] is not None else None for feature in features]
+    gdf = gpd.GeoDataFrame(properties, geometry=geometries)
+    gdf = gdf[gdf.geometry.notna()]
+    gdf.set_crs(crs_info, inplace=True)
+    gdf['geometry'] = gdf['geometry'].apply(remove_z_coordinate)
+    return gdf.to_crs(epsg=4326)
+
+
+def vectorized(data):
+    return convert_crs(to_frame(data, "geojson"))
+
+
+def measure(func, data):
+    start = time.perf_counter()
+    result = func(data)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vertices", type=int, default=1_000_000)
+    parser.add_argument("--vertices-per-polygon", type=int, default=100)
+    args = parser.parse_args()
+
+    data = generate_geojson(args.vertices, args.vertices_per_polygon)
+    legacy_time, expected = measure(legacy, data)
+    vectorized_time, actual = measure(vectorized, data)
+
+    assert len(expected) == len(actual)
+    assert expected.geometry.geom_equals_exact(actual.geometry.set_crs(expected.crs, allow_override=True),
+                                               tolerance=1e-9).all()
+    print(f"polygons={len(data['features'])} vertices={args.vertices}")
+    print(f"legacy     : {legacy_time:.3f}s")
+    print(f"vectorized : {vectorized_time:.3f}s")
+    print(f"speedup    : {legacy_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+data-cleansing-job のジオコーディングクライアントのベンチマーク。
+
+ローカルのモックジオコーダ（秒間クォータを超えると429を返す）に対して、
+従来の方式（20件ずつ gather して5秒待機、リクエスト毎に新しいセッション）と
+GeocodingClient（プールされたセッション + トークンバケット + スライディングウィンドウ）
+のスループットを比較する。
+
+Usage:
+    python benchmarks/bench_geocoding_client.py --requests 500 --quota 50 --rate 45
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import deque
+
+import aiohttp
+from aiohttp import web
+
+JOB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function", "D001", "preprocess",
+                       "data-cleansing-job")
+sys.path.insert(0, JOB_DIR)
+
+from geocoding_client import GeocodingClient  # noqa: E402
+
+
+def create_mock_geocoder(quota, latency):
+    accepted = deque()
+    stats = {"ok": 0, "throttled": 0}
+
+    async def search_text(request):
+        await request.json()
+        now = time.monotonic()
+        while accepted and now - accepted[0] > 1:
+            accepted.popleft()
+        if len(accepted) >= quota:
+            stats["throttled"] += 1
+            return web.json_response({"message": "Rate exceeded"}, status=429)
+        accepted.append(now)
+        await asyncio.sleep(latency)
+        stats["ok"] += 1
+        return web.json_response({"Results": [{"Place": {"Geometry": {"Point": [139.76, 35.68]}}}]})
+
+    app = web.Application()
+    app.router.add_post("/search/text", search_text)
+    return app, stats
+
+
+async def legacy(url, addresses):
+    semaphore = asyncio.Semaphore(20)
+
+    async def get_lat_lng(address):
+        async with semaphore:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(url, json={"Text": address}) as response:
+                    if response.status == 200:
+                        return (await response.json())["Results"][0]["Place"]["Geometry"]["Point"]
+                    return 0, 0
+
+    results = []
+    for i in range(0, len(addresses), 20):
+        results.extend(await asyncio.gather(*(get_lat_lng(address) for address in addresses[i:i + 20])))
+        await asyncio.sleep(5)
+    return results
+
+
+async def pooled(url, addresses, rate, max_in_flight):
+    async def get_lat_lng(address, client):
+        return await client.geocode(address)
+
+    async with GeocodingClient(url, rate=rate, max_in_flight=max_in_flight) as client:
+        return await client.map(get_lat_lng, addresses)
+
+
+async def run(args):
+    app, stats = create_mock_geocoder(args.quota, args.latency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/search/text"
+    addresses = [f"東京都千代田区霞が関{i}" for i in range(args.requests)]
+
+    try:
+        for name, coroutine in [("legacy chunk+sleep", lambda: legacy(url, addresses)),
+                                ("pooled token bucket", lambda: pooled(url, addresses, args.rate,
+                                                                       args.max_in_flight))]:
+            if name.startswith("legacy") and args.skip_legacy:
+                continue
+            stats.update(ok=0, throttled=0)
+            start = time.perf_counter()
+            results = await coroutine()
+            elapsed = time.perf_counter() - start
+            geocoded = sum(1 for result in results if result and tuple(result) != (0, 0))
+            print(f"{name:20s}: {elapsed:7.2f}s  {len(addresses) / elapsed:7.1f} req/s  "
+                  f"geocoded={geocoded}/{len(addresses)} ok={stats['ok']} throttled={stats['throttled']}")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--quota", type=int, default=50, help="mock provider quota (requests per second)")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock provider latency (seconds)")
+    parser.add_argument("--rate", type=float, default=45, help="client token-bucket rate (requests per second)")
+    parser.add_argument("--max-in-flight", type=int, default=20)
+    parser.add_argument("--skip-legacy", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
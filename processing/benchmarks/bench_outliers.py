@@ -0,0 +1,72 @@
+"""
+data-cleansing-job の外れ値除去（unitnum の正規化）のベンチマーク。
+
+従来の列ごとの detect_outliers + df.loc による除去と、全列の統計量を
+2次元配列で1パスで計算する mask_outliers、チャンクごとに統計量を集計して
+マージする OutlierStatistics を比較する。
+
+Usage:
+    python benchmarks/bench_outliers.py --rows 1000000 --columns 30 --method iqr
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+JOB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function", "D001", "preprocess",
+                       "data-cleansing-job")
+sys.path.insert(0, JOB_DIR)
+
+from utils import detect_outliers, mask_outliers, OutlierStatistics  # noqa: E402
+from synthetic_data import numeric_frame  # noqa: E402
+
+
+def legacy(df, method):
+    for column in df.columns:
+        outliers = detect_outliers(df, column, method)["outliers"]
+        df.loc[outliers, column] = pd.NA
+    return df
+
+
+def chunked(df, method, chunk_rows):
+    chunks = [df.iloc[start:start + chunk_rows].copy() for start in range(0, len(df), chunk_rows)]
+    statistics = OutlierStatistics(df.columns, method)
+    for chunk in chunks:
+        statistics.update(chunk)
+    bounds = statistics.bounds()
+    return pd.concat([statistics.apply(chunk, bounds) for chunk in chunks])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--columns", type=int, default=30)
+    parser.add_argument("--method", choices=["iqr", "zscore"], default="iqr")
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    df = numeric_frame(args.rows, args.columns)
+    print(f"rows={args.rows} columns={args.columns} method={args.method}")
+
+    start = time.perf_counter()
+    expected = legacy(df.copy(), args.method)
+    legacy_time = time.perf_counter() - start
+    print(f"legacy  : {legacy_time:.3f}s")
+
+    start = time.perf_counter()
+    actual = mask_outliers(df.copy(), df.columns, args.method)
+    elapsed = time.perf_counter() - start
+    pd.testing.assert_frame_equal(expected, actual)
+    print(f"batch   : {elapsed:.3f}s  speedup={legacy_time / elapsed:.1f}x")
+
+    start = time.perf_counter()
+    actual = chunked(df, args.method, args.chunk_rows)
+    elapsed = time.perf_counter() - start
+    pd.testing.assert_frame_equal(expected.isna(), actual.isna())
+    print(f"chunked : {elapsed:.3f}s  speedup={legacy_time / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+format_sniffer の JSON / GeoJSON 判定の確認。
+
+ドキュメント全体を json.loads して判定する従来の規則（トップレベルの
+"type" が "FeatureCollection" で "features" が配列なら geojson）と
+sniff_file_format の結果を比べる。各ジョブにコピーされた format_sniffer.py が
+同じ内容であることも確認する。
+
+Usage:
+    python benchmarks/check_format_sniffer.py
+"""
+import filecmp
+import glob
+import json
+import os
+import sys
+import tempfile
+
+CLOUD_FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function")
+sys.path.insert(0, os.path.join(CLOUD_FUNCTION_DIR, "D002", "cross-event-job"))
+
+import format_sniffer  # noqa: E402
+
+FEATURE = {"type": "Feature", "properties": {"名前": "東京"}, "geometry": {"type": "Point", "coordinates": [139, 35]}}
+
+CASES = {
+    "feature collection": {"type": "FeatureCollection", "features": [FEATURE]},
+    "features before type": {"features": [FEATURE], "type": "FeatureCollection"},
+    "empty features": {"type": "FeatureCollection", "features": []},
+    "features without type": {"x": 1, "features": [{"type": "Feature"}]},
+    "type without features": {"type": "FeatureCollection"},
+    "features not an array": {"type": "FeatureCollection", "features": {"a": FEATURE}},
+    "nested feature collection": {"data": {"type": "FeatureCollection", "features": [FEATURE]}},
+    "array of features": [FEATURE],
+    "records": [{"type": "FeatureCollection", "features": 1}],
+    # "type" が走査の上限（SNIFF_JSON_MAX_BYTES）より後ろにある場合
+    "long features before type": {"features": [FEATURE] * 20_000, "type": "FeatureCollection"},
+}
+
+
+def expected_format(document):
+    if (isinstance(document, dict) and document.get("type") == "FeatureCollection"
+            and isinstance(document.get("features"), list)):
+        return format_sniffer.GEOJSON
+    return format_sniffer.JSON
+
+
+def main():
+    copies = sorted(glob.glob(os.path.join(CLOUD_FUNCTION_DIR, "**", "format_sniffer.py"), recursive=True))
+    different = [path for path in copies if not filecmp.cmp(copies[0], path, shallow=False)]
+    if different:
+        raise AssertionError(f"The copies of format_sniffer.py differ: {different}")
+
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "input")
+        for name, document in CASES.items():
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(document, file, ensure_ascii=False)
+            expected = expected_format(document)
+            actual = format_sniffer.sniff_file_format(path)
+            print(f"{name:<28}: {actual:<8} ({os.path.getsize(path)} bytes)")
+            if actual != expected:
+                failures.append((name, expected, actual))
+    if failures:
+        raise AssertionError(f"Unexpected formats (name, expected, actual): {failures}")
+    print(f"{len(CASES)} documents, {len(copies)} copies of format_sniffer.py: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+json_codec の orjson と標準ライブラリのフォールバックの出力の確認。
+
+NumPy / pandas の値や配列、日時、Decimal、NaN・無限大を含む値を両方の
+バックエンドで dumps し、バイト列が同じであることを確認する。各ジョブに
+コピーされた json_codec.py が同じ内容であることも確認する。
+
+Usage:
+    python benchmarks/check_json_codec.py
+"""
+import datetime
+import decimal
+import filecmp
+import glob
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+CLOUD_FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function")
+sys.path.insert(0, os.path.join(CLOUD_FUNCTION_DIR, "D002", "cross-event-job"))
+
+import json_codec  # noqa: E402
+
+CASES = {
+    "scalars": {"int": np.int64(3), "float": np.float32(1.5), "bool": np.bool_(True), "str": "東京"},
+    "non-finite": {"nan": float("nan"), "inf": float("inf"), "np nan": np.float64("nan"), "nested": [[-np.inf]]},
+    "dates": [datetime.datetime(2020, 1, 2, 3, 4, 5, 678901), datetime.date(2020, 1, 2), datetime.time(3, 4),
+              pd.Timestamp("2020-01-02 03:04:05")],
+    "datetime64 scalars": [np.datetime64("2020-01-02"), np.datetime64("2020-01-02T03:04:05.123456789"),
+                           np.datetime64("2020-01-02T03:04:05.5", "ms")],
+    "decimal": {"value": decimal.Decimal("1.25")},
+    "int keys": {1: "a", 2: ["b", (3, 4)]},
+    "float array": np.array([1.5, np.nan, np.inf]),
+    "int array": np.array([[1, 2], [3, 4]], dtype=np.int8),
+    "bool array": np.array([True, False]),
+    "datetime64[ns] array": np.array(["2020-01-02", "2020-01-02T03:04:05.123456789"], dtype="datetime64[ns]"),
+    "datetime64[D] array": np.array(["2020-01-02", "1969-12-31"], dtype="datetime64[D]"),
+    "datetime64[ms] 2-D array": np.array([["2020-01-02T03:04:05.5"], ["2021-01-01"]], dtype="datetime64[ms]"),
+    "records": [{"名前": "大阪", "値": np.array([1.0, np.nan]), "日付": np.array(["2020-01-02"], dtype="datetime64[s]")}],
+}
+
+
+def main():
+    copies = sorted(glob.glob(os.path.join(CLOUD_FUNCTION_DIR, "**", "json_codec.py"), recursive=True))
+    different = [path for path in copies if not filecmp.cmp(copies[0], path, shallow=False)]
+    if different:
+        raise AssertionError(f"The copies of json_codec.py differ: {different}")
+    if json_codec.orjson is None:
+        raise RuntimeError("orjson is needed to compare the two backends")
+
+    failures = []
+    orjson = json_codec.orjson
+    for name, value in CASES.items():
+        expected = json_codec.dumps(value)
+        json_codec.orjson = None
+        try:
+            actual = json_codec.dumps(value)
+        finally:
+            json_codec.orjson = orjson
+        print(f"{name:<26}: {expected.decode('utf-8')}")
+        if actual != expected:
+            failures.append((name, expected, actual))
+    if failures:
+        raise AssertionError(f"The backends differ (name, orjson, fallback): {failures}")
+    print(f"{len(CASES)} values, {len(copies)} copies of json_codec.py: ok")
+
+
+if __name__ == "__main__":
+    main()
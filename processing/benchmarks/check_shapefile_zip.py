@@ -0,0 +1,106 @@
+"""
+data-cleansing-job がシェイプファイルの zip を展開せずに読めることの確認。
+
+synthetic_data.points のシェイプファイルを zip にまとめてローカル HTTP サーバで
+配信し、get_input_data（ダウンロード → process_shp）で読む。zip の展開
+（zipfile.ZipFile.extractall）に落ちた場合と、読んだ内容が元のデータと
+異なる場合はエラーにする。ダウンロード先と同じく拡張子のない一時ファイルを
+process_shp に渡す場合も確認する。
+
+Usage:
+    python benchmarks/check_shapefile_zip.py --rows 10000
+"""
+import argparse
+import functools
+import http.server
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+import pandas as pd
+
+JOB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function", "D001", "preprocess",
+                       "data-cleansing-job")
+sys.path.insert(0, JOB_DIR)
+os.environ.setdefault("DMS_DATA", "")
+
+import main as cleansing_job  # noqa: E402
+from synthetic_data import points  # noqa: E402
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def write_zipped_shapefile(gdf, work_dir, folder=""):
+    shp_dir = os.path.join(work_dir, "shp")
+    os.makedirs(shp_dir, exist_ok=True)
+    gdf.to_file(os.path.join(shp_dir, "施設.shp"), encoding="utf-8")
+    path = os.path.join(work_dir, "施設.zip")
+    with zipfile.ZipFile(path, "w") as zip_file:
+        for name in os.listdir(shp_dir):
+            zip_file.write(os.path.join(shp_dir, name), folder + name)
+    shutil.rmtree(shp_dir)
+    return path
+
+
+def check(expected, actual):
+    pd.testing.assert_frame_equal(pd.DataFrame(expected.drop(columns="geometry")),
+                                  pd.DataFrame(actual.drop(columns="geometry")), check_dtype=False)
+    assert expected.geometry.geom_equals(actual.geometry).all()
+    assert actual.crs == expected.crs, actual.crs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    extracted = []
+    extractall = zipfile.ZipFile.extractall
+
+    def record_extractall(self, *args, **kwargs):
+        extracted.append(self.filename)
+        return extractall(self, *args, **kwargs)
+
+    zipfile.ZipFile.extractall = record_extractall
+    # DBF のフィールド名は10バイトまでなので、UTF-8 で収まる名前にする
+    expected = points(args.rows).rename(columns={"利用者数": "利用数"})
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), functools.partial(QuietHandler, directory=work_dir))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for folder in ("", "data/"):
+                path = write_zipped_shapefile(expected, work_dir, folder)
+                url = f"http://127.0.0.1:{server.server_address[1]}/{os.path.basename(path)}"
+                start = time.perf_counter()
+                actual, _ = cleansing_job.get_input_data({"input": url, "inputType": "shapefile"})
+                elapsed = time.perf_counter() - start
+                check(expected, actual)
+                print(f"get_input_data folder={folder or '/':<6}: {elapsed:.3f}s")
+
+                # 拡張子のない一時ファイルでも /vsizip/ で読めること
+                with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+                    with open(path, "rb") as file:
+                        shutil.copyfileobj(file, temp_file)
+                try:
+                    check(expected, cleansing_job.process_shp(temp_file.name))
+                finally:
+                    os.remove(temp_file.name)
+        finally:
+            server.shutdown()
+
+    if extracted:
+        raise AssertionError(f"The zip was extracted instead of read through /vsizip/: {extracted}")
+    print(f"rows={args.rows}: read through /vsizip/ without extracting the zip")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+Cloud Run ジョブをローカルで実行するハーネス。
+
+ジョブの main.py を読み込み、エントリ関数（cleansing_data, cross_event など）を
+同じプロセスで実行する。GCP の代わりに次のものを使う。
+
+- 入力ファイル: --files のディレクトリを配信するローカル HTTP サーバ
+  （リクエストの "{files}" をその URL に置き換える）
+- ステータス: mongomock（なければメモリ上）のコレクション
+- apiEndpoint: 送られた結果を記録するローカル HTTP サーバ
+
+ジョブの関数ごとの実行時間（呼び出し回数と合計時間）、ピーク RSS（プロセスプールの
+子プロセスを含む合計と、このプロセスだけの値）、apiEndpoint に送られたデータのサイズ、
+最終ステータスを出力する。RSS はサンプリングなので、ごく短い間だけ存在した子プロセスは
+含まれないことがある。
+call_api_endpoint の time.sleep は --keep-sleep を指定しない限り省略する。
+
+Usage:
+    python benchmarks/job_harness.py cross-event-job --files data/ --request request.json
+    python benchmarks/job_harness.py spatial-join-event-job --files data/ --request request.json \
+        --repeat 3 --report report.json --expect-process Completed
+
+request.json の例:
+    {"ticketId": "t1", "input": "{files}/sample.csv", "apiEndpoint": "", ...}
+"""
+import argparse
+import functools
+import http.server
+import importlib
+import inspect
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict
+
+CLOUD_FUNCTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_function")
+
+# ジョブ名 -> (ディレクトリ, エントリ関数)
+JOBS = {
+    "data-cleansing-job": ("D001/preprocess/data-cleansing-job", "cleansing_data"),
+    "cross-event-job": ("D002/cross-event-job", "cross_event"),
+    "masking-data-event-job": ("D002/masking-data-event-job", "masking_data_event"),
+    "spatial-aggregate-event-job": ("D002/spatial-aggregate-event-job", "spatial_aggregate_event"),
+    "spatial-join-event-job": ("D002/spatial-join-event-job", "spatial_join_event"),
+    "text-match-event-job": ("D002/text-match-event-job", "text_match_event"),
+    "vectorize-event-job": ("D009/vectorize-event-job", "vectorize_event"),
+}
+
+RSS_SAMPLE_INTERVAL_SECONDS = 0.005
+
+
+class MemoryStatusCollection:
+    """
+    In-memory stand-in for the status collection, used when mongomock is not
+    installed.
+
+    pymongo's UpdateOne has no public accessor for its filter and update, so
+    `bulk_write` applies the updates recorded from `StatusWriter.update`
+    since the previous write instead (see `record_status_updates`).
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.recorded = []
+
+    def update_one(self, query, update, upsert=False):
+        document = self.documents.setdefault(query["_id"], {"_id": query["_id"]})
+        document.update(update.get("$set", {}))
+
+    def bulk_write(self, requests, ordered=True):
+        recorded, self.recorded = self.recorded, []
+        for query, fields in recorded:
+            self.update_one(query, {"$set": fields})
+
+    def insert_one(self, document):
+        self.documents[document["_id"]] = dict(document)
+
+    def find_one(self, query):
+        return self.documents.get(query["_id"])
+
+    def delete_many(self, query):
+        self.documents.clear()
+
+
+def record_status_updates(writer, collection):
+    """Record the updates of the status writer in the MemoryStatusCollection before they are written."""
+    update = writer.update
+
+    def recorded_update(query, fields, flush=False):
+        # flush と同じロックの中で記録し、記録した更新と書き込まれる更新を一致させる
+        with writer.lock:
+            collection.recorded.append((dict(query), dict(fields)))
+            update(query, fields, flush)
+
+    writer.update = recorded_update
+
+
+def create_status_collection():
+    try:
+        import mongomock
+    except ImportError:
+        return MemoryStatusCollection()
+    return mongomock.MongoClient()["harness"]["status"]
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def create_capture_handler(captured):
+    class CaptureHandler(QuietHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            captured.append({"path": self.path, "bytes": len(body), "body": body, "received_at": time.perf_counter()})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+    return CaptureHandler
+
+
+def start_server(handler):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class PeakRssSampler:
+    """
+    Sample the resident set size of this process and of its descendants
+    (process pool workers) in a thread, and keep the peaks of their sum and
+    of this process alone.
+
+    Descendants are looked up in /proc every CHILDREN_REFRESH_SAMPLES
+    samples. Without /proc, the peaks come from getrusage: this process,
+    plus the largest finished child.
+    """
+
+    CHILDREN_REFRESH_SAMPLES = 20
+
+    def __init__(self):
+        self.peak = 0
+        self.peak_self = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self.has_proc = os.path.exists("/proc/self/statm")
+        self.children = []
+        self.samples = 0
+
+    def rss(self, pid):
+        try:
+            with open(f"/proc/{pid}/statm") as file:
+                return int(file.read().split()[1]) * self.page_size
+        except (OSError, IndexError, ValueError):
+            return 0
+
+    def descendants(self):
+        parents = {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat") as file:
+                    # comm は括弧で囲まれ空白を含むことがあるので、最後の ")" の後から読む
+                    parents[int(name)] = int(file.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+        found = []
+        pending = [os.getpid()]
+        while pending:
+            parent = pending.pop()
+            children = [pid for pid, ppid in parents.items() if ppid == parent]
+            found.extend(children)
+            pending.extend(children)
+        return found
+
+    def sample(self):
+        if not self.has_proc:
+            own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            self.peak_self = max(self.peak_self, own)
+            self.peak = max(self.peak, own + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024)
+            return
+        if self.samples % self.CHILDREN_REFRESH_SAMPLES == 0:
+            self.children = self.descendants()
+        self.samples += 1
+        own = self.rss("self")
+        self.peak_self = max(self.peak_self, own)
+        self.peak = max(self.peak, own + sum(self.rss(pid) for pid in self.children))
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(RSS_SAMPLE_INTERVAL_SECONDS)
+
+    def __enter__(self):
+        self.sample()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop_event.set()
+        self.thread.join()
+        self.sample()
+
+
+class StageTimer:
+    """
+    Wrap the top-level functions of a job module to record their calls and
+    inclusive wall time. Only the outermost call of a recursive function is
+    counted.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.stats = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+        self.local = threading.local()
+        self.originals = {}
+
+    def install(self):
+        for name, function in list(vars(self.module).items()):
+            if inspect.isfunction(function) and function.__module__ == self.module.__name__:
+                self.originals[name] = function
+                setattr(self.module, name, self.wrap(name, function))
+
+    def uninstall(self):
+        for name, function in self.originals.items():
+            setattr(self.module, name, function)
+
+    def reset(self):
+        self.stats.clear()
+
+    def wrap(self, name, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            active = self.local.__dict__.setdefault("active", set())
+            if name in active:
+                return function(*args, **kwargs)
+            active.add(name)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                active.discard(name)
+                stat = self.stats[name]
+                stat["calls"] += 1
+                stat["seconds"] += time.perf_counter() - start
+
+        return timed
+
+
+def skip_sleep(module):
+    """Replace `time` in the job module with a copy whose sleep only records the time skipped."""
+    skipped = {"seconds": 0.0}
+    fake_time = types.ModuleType("time")
+    fake_time.__dict__.update(vars(time))
+
+    def sleep(seconds):
+        skipped["seconds"] += seconds
+
+    fake_time.sleep = sleep
+    module.time = fake_time
+    return skipped
+
+
+def load_job(job, asset_cache_dir, geocode_cache_path):
+    directory, entry_name = JOBS[job]
+    job_dir = os.path.abspath(os.path.join(CLOUD_FUNCTION_DIR, directory))
+    # モジュールの読み込み時に参照される環境変数。キャッシュは指定しない限り無効にし、
+    # 実行環境の /tmp などに残った状態を使わないようにする
+    os.environ["DMS_DATA"] = ""
+    os.environ["ASSET_CACHE_DIR"] = asset_cache_dir
+    os.environ["GEOCODE_CACHE_PATH"] = geocode_cache_path
+    sys.path.insert(0, job_dir)
+    os.chdir(job_dir)
+    module = importlib.import_module("main")
+    return module, getattr(module, entry_name)
+
+
+def fill_request(template, files_url, api_endpoint):
+    request = json.loads(json.dumps(template).replace("{files}", files_url))
+    request["apiEndpoint"] = api_endpoint
+    request.setdefault("ticketId", "harness")
+    return request
+
+
+def run_once(entry, request, collection, captured, timer):
+    timer.reset()
+    captured.clear()
+    collection.delete_many({})
+    collection.insert_one({"_id": request["ticketId"]})
+
+    start = time.perf_counter()
+    with PeakRssSampler() as sampler:
+        entry(json.dumps(request, ensure_ascii=False))
+        sys.modules["status_writer"].status_writer.flush()
+    wall_seconds = time.perf_counter() - start
+
+    status = collection.find_one({"_id": request["ticketId"]}) or {}
+    return {
+        "wall_seconds": round(wall_seconds, 6),
+        "peak_rss_bytes": sampler.peak,
+        "peak_rss_self_bytes": sampler.peak_self,
+        "output_bytes": sum(item["bytes"] for item in captured),
+        "api_calls": len(captured),
+        "process": status.get("process"),
+        "message": status.get("message"),
+        "stages": {name: {"calls": stat["calls"], "seconds": round(stat["seconds"], 6)}
+                   for name, stat in sorted(timer.stats.items(), key=lambda item: -item[1]["seconds"])},
+    }
+
+
+def print_run(index, result):
+    print(f"run {index}: {result['wall_seconds']:.3f}s  peak_rss={result['peak_rss_bytes'] / 1024 / 1024:.1f}MiB "
+          f"(self {result['peak_rss_self_bytes'] / 1024 / 1024:.1f}MiB)  "
+          f"output={result['output_bytes']}B ({result['api_calls']} call(s))  process={result['process']}")
+    for name, stat in result["stages"].items():
+        print(f"    {name:<40} {stat['calls']:>6}  {stat['seconds']:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("job", choices=sorted(JOBS))
+    parser.add_argument("--request", required=True, help="JSON file of the job request (DMS_DATA)")
+    parser.add_argument("--files", default=".", help="directory served as {files}")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--asset-cache", default="", help="ASSET_CACHE_DIR of the job (disabled by default)")
+    parser.add_argument("--geocode-cache", default="",
+                        help="GEOCODE_CACHE_PATH of the job (disabled by default); 'work' puts a new one in the "
+                             "temporary work directory of this invocation, shared by its --repeat runs")
+    parser.add_argument("--keep-sleep", action="store_true", help="keep time.sleep in the job")
+    parser.add_argument("--report", help="write the results to this JSON file")
+    parser.add_argument("--output", help="write the last apiEndpoint payload to this file")
+    parser.add_argument("--expect-process", help="exit with 1 when the final process is different")
+    args = parser.parse_args()
+
+    files_dir = os.path.abspath(args.files)
+    with open(args.request, encoding="utf-8") as file:
+        template = json.load(file)
+    report_path = os.path.abspath(args.report) if args.report else None
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    captured = []
+    file_server, files_url = start_server(functools.partial(QuietHandler, directory=files_dir))
+    capture_server, capture_url = start_server(create_capture_handler(captured))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        asset_cache_dir = args.asset_cache and os.path.abspath(args.asset_cache)
+        if args.geocode_cache == "work":
+            geocode_cache_path = os.path.join(work_dir, "geocode_cache.sqlite3")
+        else:
+            geocode_cache_path = args.geocode_cache and os.path.abspath(args.geocode_cache)
+        module, entry = load_job(args.job, asset_cache_dir, geocode_cache_path)
+        collection = create_status_collection()
+        status_writer = sys.modules["status_writer"]
+        status_writer.get_collection = lambda: collection
+        if isinstance(collection, MemoryStatusCollection):
+            record_status_updates(status_writer.status_writer, collection)
+        skipped = {"seconds": 0.0} if args.keep_sleep else skip_sleep(module)
+        timer = StageTimer(module)
+        timer.install()
+        os.chdir(work_dir)
+
+        results = []
+        for index in range(args.repeat):
+            request = fill_request(template, files_url, f"{capture_url}/api")
+            result = run_once(entry, request, collection, captured, timer)
+            result["sleep_skipped_seconds"] = skipped["seconds"]
+            skipped["seconds"] = 0.0
+            results.append(result)
+            print_run(index, result)
+
+        timer.uninstall()
+        if output_path and captured:
+            with open(output_path, "wb") as file:
+                file.write(captured[-1]["body"])
+
+    file_server.shutdown()
+    capture_server.shutdown()
+
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as file:
+            json.dump({"job": args.job, "runs": results}, file, ensure_ascii=False, indent=2)
+
+    if args.expect_process and any(result["process"] != args.expect_process for result in results):
+        print(f"expected process {args.expect_process}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
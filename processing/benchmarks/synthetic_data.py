@@ -0,0 +1,453 @@
+"""
+ベンチマーク用の合成データ生成。
+
+実データ（自治体のオープンデータ）に似た形のデータを、乱数のシードを固定して
+1千行から1千万行まで生成する。各ベンチマーク（data-cleansing, cross, masking,
+spatial, text-match）はここの関数を共有する。
+
+- 住所: 丁目・番地・号、半角カナの町名、全角数字、ハイフン区切りなどの揺れ
+- 日付: 和暦（令和5年4月1日, R5年4月1日）と西暦（2023年4月1日, 2023/04/01）
+- 数値: 正規分布に外れ値と欠損を混ぜた列
+- 地理空間: 点と国勢調査の小地域に似た格子状のポリゴン（WGS84 / JGD2011 の経緯度 /
+  JGD2011 の平面直角座標系 第IX系）
+- 名寄せ: 正規の名称・住所と、表記揺れを加えた名称・住所の組（text-match 用）
+- メタデータ: create-rdf が読む複数シートの Excel
+
+値の種類は --unique で指定した数のプールから選ぶので、行数を増やしても
+生成時間は行数にほぼ比例する。
+
+Usage:
+    python benchmarks/synthetic_data.py --rows 1000000 --out /tmp/synthetic
+    python benchmarks/synthetic_data.py --rows 10000 --out /tmp/synthetic --datasets records points polygons
+"""
+import argparse
+import datetime
+import os
+import unicodedata
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+WGS84 = "EPSG:4326"
+JGD2011 = "EPSG:6668"
+# JGD2011 の平面直角座標系 第IX系（東京都など）。normalizeCrs が変換する必要のある座標
+JGD2011_PLANE_IX = "EPSG:6677"
+
+# (都道府県, 都道府県コード, 市区町村, 市区町村コード, 町名)
+MUNICIPALITIES = [
+    ("東京都", "13", "千代田区", "101", ["霞が関", "丸の内", "永田町", "神田ﾂﾂｼﾞｹ丘"]),
+    ("東京都", "13", "世田谷区", "112", ["ｹﾔｷ台", "桜丘", "三軒茶屋", "駒ケ原"]),
+    ("大阪府", "27", "大阪市北区", "127", ["梅田", "中之島", "ﾐﾄﾞﾘ町", "天神橋"]),
+    ("愛知県", "23", "名古屋市中区", "106", ["栄", "丸の内", "錦", "青葉ﾉ森"]),
+    ("福岡県", "40", "福岡市博多区", "132", ["博多駅前", "中洲", "ﾊﾟｰｸｻｲﾄﾞ", "住吉"]),
+    ("北海道", "01", "札幌市中央区", "101", ["北一条西", "大通西", "南ﾉ沢", "宮の森"]),
+    ("茨城県", "08", "つくば市", "220", ["竹園", "吾妻", "一ノ瀬", "ｻｸﾗ台"]),
+    ("埼玉県", "11", "さいたま市浦和区", "107", ["高砂", "常盤", "岸町", "ﾅｶﾏﾁ"]),
+]
+KANJI_NUMBERS = ["", "一", "二", "三", "四", "五", "六", "七", "八", "九"]
+BUILDINGS = ["ﾊｲﾂ", "ﾏﾝｼｮﾝ", "コーポ", "ﾚｼﾞﾃﾞﾝｽ", "ビル"]
+
+# 和暦の元号と開始日（新しい順）
+ERAS = [
+    ("令和", "R", datetime.date(2019, 5, 1)),
+    ("平成", "H", datetime.date(1989, 1, 8)),
+    ("昭和", "S", datetime.date(1926, 12, 25)),
+]
+DATE_START = datetime.date(1960, 1, 1)
+DATE_END = datetime.date(2025, 12, 31)
+
+CATEGORIES = {
+    "種別": ["保育所", "幼稚園", "小学校", "中学校", "公民館", "図書館", "病院", "診療所"],
+    "区分": ["公立", "私立", "その他"],
+}
+CORPORATE_FORMS = [("株式会社", ["(株)", "㈱", "（株）"]), ("有限会社", ["(有)", "㈲"]),
+                   ("一般社団法人", ["(一社)"]), ("社会福祉法人", ["(福)"])]
+NAME_WORDS = ["サクラ", "ミドリ", "アオバ", "ヒカリ", "ツバサ", "ヤマト", "ミナト", "カエデ", "スズラン", "アサヒ"]
+NAME_KINDS = ["商事", "建設", "運輸", "食品", "保育園", "クリニック", "福祉会", "不動産", "電機", "薬局"]
+
+# 全角カナ -> 半角カナ（濁点・半濁点を含む）
+HALFWIDTH_KATAKANA = {}
+for code in range(0xFF66, 0xFF9E):
+    half = chr(code)
+    HALFWIDTH_KATAKANA[unicodedata.normalize("NFKC", half)] = half
+    for mark in ("ﾞ", "ﾟ"):
+        full = unicodedata.normalize("NFKC", half + mark)
+        if len(full) == 1:
+            HALFWIDTH_KATAKANA[full] = half + mark
+FULLWIDTH_DIGITS = str.maketrans("0123456789-", "０１２３４５６７８９－")
+
+
+def to_halfwidth_katakana(text):
+    return "".join(HALFWIDTH_KATAKANA.get(char, char) for char in text)
+
+
+def pick(rng, pool, rows, missing_rate=0.0):
+    """Return `rows` values drawn from `pool` as an object Series, with some None."""
+    values = np.asarray(pool, dtype=object)[rng.integers(0, len(pool), rows)]
+    if missing_rate:
+        values[rng.random(rows) < missing_rate] = None
+    return pd.Series(values, dtype=object)
+
+
+def address_pool(unique, rng):
+    """Distinct addresses written in the forms found in the source data."""
+    pool = []
+    for _ in range(unique):
+        pref, _, city, _, towns = MUNICIPALITIES[rng.integers(len(MUNICIPALITIES))]
+        town = towns[rng.integers(len(towns))]
+        chome, banchi, go = int(rng.integers(1, 10)), int(rng.integers(1, 41)), int(rng.integers(1, 31))
+        form = rng.integers(6)
+        if form == 0:
+            address = f"{pref}{city}{town}{chome}丁目{banchi}番地{go}号"
+        elif form == 1:
+            address = f"{pref}{city}{town}{chome}丁目{banchi}番{go}号"
+        elif form == 2:
+            address = f"{city}{town}{chome}-{banchi}-{go}"
+        elif form == 3:
+            address = f"{pref}{city}{town}{chome}丁目{banchi}番地".translate(FULLWIDTH_DIGITS)
+        elif form == 4:
+            address = f"{pref}{city}{town}{KANJI_NUMBERS[chome]}丁目{banchi}番地"
+        else:
+            building = BUILDINGS[rng.integers(len(BUILDINGS))]
+            address = f"{pref}{city}{town}{chome}-{banchi} {building}{NAME_WORDS[rng.integers(len(NAME_WORDS))]}" \
+                      f"{int(rng.integers(1, 10))}0{int(rng.integers(1, 10))}号室"
+        pool.append(address)
+    return pool
+
+
+def addresses(rows, unique=20_000, missing_rate=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    return pick(rng, address_pool(min(unique, rows), rng), rows, missing_rate)
+
+
+def to_wareki(date, short=False):
+    for era, letter, start in ERAS:
+        if date >= start:
+            year = date.year - start.year + 1
+            return f"{letter if short else era}{year}年{date.month}月{date.day}日"
+    return f"{date.year}年{date.month}月{date.day}日"
+
+
+def date_pool(unique, rng):
+    """Distinct dates in 和暦 and 西暦 notations, some with a time."""
+    span = (DATE_END - DATE_START).days
+    pool = []
+    for offset in rng.integers(0, span, unique):
+        date = DATE_START + datetime.timedelta(days=int(offset))
+        form = rng.integers(6)
+        if form == 0:
+            text = to_wareki(date)
+        elif form == 1:
+            text = to_wareki(date, short=True)
+        elif form == 2:
+            text = f"{date.year}年{date.month}月{date.day}日"
+        elif form == 3:
+            text = date.strftime("%Y/%m/%d")
+        elif form == 4:
+            text = f"{date.year}-{date.month}-{date.day}"
+        else:
+            text = f"{to_wareki(date)} {int(rng.integers(0, 24))}時{int(rng.integers(0, 60))}分"
+        pool.append(text)
+    return pool
+
+
+def wareki_dates(rows, unique=5_000, missing_rate=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    return pick(rng, date_pool(min(unique, rows), rng), rows, missing_rate)
+
+
+def numeric_values(rows, mean=100.0, std=15.0, outlier_rate=0.001, missing_rate=0.01, seed=0):
+    """Normally distributed values with large outliers and NaN."""
+    rng = np.random.default_rng(seed)
+    values = rng.normal(mean, std, rows)
+    values[rng.random(rows) < outlier_rate] = mean * 1000
+    values[rng.random(rows) < missing_rate] = np.nan
+    return values
+
+
+def numeric_frame(rows, columns, outlier_rate=0.001, missing_rate=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(100, 15, (rows, columns))
+    values[rng.random((rows, columns)) < missing_rate] = np.nan
+    values[rng.random((rows, columns)) < outlier_rate] = 99999
+    return pd.DataFrame(values, columns=[f"value{i}" for i in range(columns)])
+
+
+def name_pool(unique, rng):
+    """Distinct organization names (正規の表記)."""
+    names = set()
+    while len(names) < unique:
+        form, _ = CORPORATE_FORMS[rng.integers(len(CORPORATE_FORMS))]
+        word = NAME_WORDS[rng.integers(len(NAME_WORDS))]
+        kind = NAME_KINDS[rng.integers(len(NAME_KINDS))]
+        names.add(f"{form}{word}{kind}{len(names)}" if rng.random() < 0.5 else f"{word}{kind}{form}{len(names)}")
+    return sorted(names)
+
+
+def fuzzy_name(name, rng):
+    """A spelling variant of a name, as written by another source."""
+    for form, abbreviations in CORPORATE_FORMS:
+        if form in name and rng.random() < 0.6:
+            name = name.replace(form, abbreviations[rng.integers(len(abbreviations))])
+    if rng.random() < 0.3:
+        name = to_halfwidth_katakana(name)
+    if rng.random() < 0.3:
+        name = name.translate(FULLWIDTH_DIGITS)
+    if rng.random() < 0.2:
+        position = int(rng.integers(1, len(name)))
+        name = f"{name[:position]} {name[position:]}"
+    return name
+
+
+def fuzzy_address(address, rng):
+    if rng.random() < 0.5:
+        address = address.replace("丁目", "-").replace("番地", "-").replace("番", "-").replace("号", "")
+    if rng.random() < 0.3:
+        address = to_halfwidth_katakana(address)
+    return address
+
+
+def records(rows, unique=20_000, seed=0):
+    """A table shaped like facility lists (cleansing, cross and masking inputs)."""
+    rng = np.random.default_rng(seed)
+    names = name_pool(min(unique, rows), rng)
+    data = {
+        "ID": np.arange(1, rows + 1),
+        "名称": pick(rng, names, rows),
+        "住所": pick(rng, address_pool(min(unique, rows), rng), rows, 0.01),
+        "開設日": pick(rng, date_pool(min(5_000, rows), rng), rows, 0.01),
+    }
+    for column, values in CATEGORIES.items():
+        data[column] = pick(rng, values, rows)
+    data["都道府県"] = pick(rng, [municipality[0] for municipality in MUNICIPALITIES], rows)
+    data["定員"] = rng.integers(10, 300, rows)
+    data["面積"] = numeric_values(rows, 500, 150, seed=seed + 1).round(2)
+    data["利用者数"] = numeric_values(rows, 1000, 300, seed=seed + 2).round()
+    return pd.DataFrame(data)
+
+
+def text_match_records(rows, unique=20_000, seed=0):
+    """
+    Return (main, sub) for text-match: `sub` has up to `unique` canonical
+    names and addresses (one tenth of `rows` at most), `main` has `rows` of
+    spelling variants of them. `main["正解ID"]`
+    is the ID of the row of `sub` each variant was made from.
+    """
+    rng = np.random.default_rng(seed)
+    unique = max(min(unique, rows // 10), 1)
+    sub = pd.DataFrame({
+        "ID": np.arange(1, unique + 1),
+        "名称": name_pool(unique, rng),
+        "住所": address_pool(unique, rng),
+    })
+    # 同じ揺れは繰り返し現れるので、元の行ごとに4通りの揺れを作って選ぶ
+    source = rng.integers(0, unique, rows)
+    keys, inverse = np.unique(source * 4 + rng.integers(0, 4, rows), return_inverse=True)
+    names = np.array([fuzzy_name(sub["名称"].iat[key // 4], rng) for key in keys], dtype=object)
+    variant_addresses = np.array([fuzzy_address(sub["住所"].iat[key // 4], rng) for key in keys], dtype=object)
+    main = pd.DataFrame({
+        "ID": np.arange(1, rows + 1),
+        "名称": names[inverse],
+        "住所": variant_addresses[inverse],
+        "正解ID": source + 1,
+    })
+    return main, sub
+
+
+# 点と格子の範囲（東京都区部付近、経度・緯度）
+BOUNDS = (139.55, 35.55, 139.95, 35.80)
+
+
+def to_crs(gdf, crs):
+    """Return the WGS84 frame in `crs`, transforming the coordinates unless it is geographic JGD2011."""
+    if crs == WGS84:
+        return gdf
+    if crs == JGD2011:
+        # JGD2011 と WGS84 の経緯度はこの精度では一致するので、CRS だけを付け替える
+        return gdf.set_crs(crs, allow_override=True)
+    return gdf.to_crs(crs)
+
+
+def points(rows, crs=WGS84, seed=0):
+    """
+    Points with attributes to aggregate, in WGS84, JGD2011 (geographic) or
+    any other CRS such as JGD2011_PLANE_IX, to which they are transformed.
+    """
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = BOUNDS
+    geometry = shapely.points(rng.uniform(min_x, max_x, rows), rng.uniform(min_y, max_y, rows))
+    gdf = gpd.GeoDataFrame({
+        "ID": np.arange(1, rows + 1),
+        "種別": pick(rng, CATEGORIES["種別"], rows),
+        "定員": rng.integers(10, 300, rows),
+        "利用者数": numeric_values(rows, 1000, 300, missing_rate=0, seed=seed + 1).round(),
+    }, geometry=geometry, crs=WGS84)
+    return to_crs(gdf, crs)
+
+
+def census_polygons(count, crs=WGS84, seed=0, vertices=None, z=None):
+    """
+    About `count` grid cells shaped like 国勢調査 小地域 boundaries, with
+    KEY_CODE, names and population attributes, in `crs` (see `points`).
+
+    With `vertices`, the edges are split so that each ring has about that
+    many vertices. With `z`, every vertex gets that Z coordinate.
+    """
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = BOUNDS
+    columns = max(int(np.sqrt(count * (max_x - min_x) / (max_y - min_y))), 1)
+    rows = max(int(np.ceil(count / columns)), 1)
+    width, height = (max_x - min_x) / columns, (max_y - min_y) / rows
+    x, y = np.meshgrid(np.arange(columns), np.arange(rows))
+    x, y = x.ravel()[:count], y.ravel()[:count]
+    geometry = shapely.box(min_x + x * width, min_y + y * height, min_x + (x + 1) * width, min_y + (y + 1) * height)
+    if vertices is not None and vertices > 5:
+        geometry = shapely.segmentize(geometry, 2 * (width + height) / (vertices - 1))
+
+    cells = len(geometry)
+    municipality = rng.integers(0, len(MUNICIPALITIES), cells)
+    pref_names = np.array([item[0] for item in MUNICIPALITIES], dtype=object)[municipality]
+    pref_codes = np.array([item[1] for item in MUNICIPALITIES], dtype=object)[municipality]
+    city_names = np.array([item[2] for item in MUNICIPALITIES], dtype=object)[municipality]
+    city_codes = np.array([item[3] for item in MUNICIPALITIES], dtype=object)[municipality]
+    town = np.array([MUNICIPALITIES[m][4][rng.integers(4)] for m in municipality], dtype=object)
+    chome = rng.integers(1, 10, cells)
+    s_names = [f"{name}{KANJI_NUMBERS[c]}丁目" for name, c in zip(town, chome)]
+    key_codes = [f"{p}{c}{i:06d}" for p, c, i in zip(pref_codes, city_codes, range(cells))]
+    population = rng.poisson(800, cells)
+    gdf = gpd.GeoDataFrame({
+        "KEY_CODE": key_codes,
+        "PREF_NAME": pref_names,
+        "CITY_NAME": city_names,
+        "S_NAME": s_names,
+        "JINKO": population,
+        "SETAI": (population / rng.uniform(1.8, 2.6, cells)).astype(int),
+    }, geometry=geometry, crs=WGS84)
+    gdf = to_crs(gdf, crs)
+    if z is not None:
+        gdf.geometry = gdf.geometry.force_3d(z)
+    return gdf
+
+
+def metadata_sheet(distributions, seed=0):
+    """Rows of the '01_データ構成（メタデータ）' sheet read by create-rdf."""
+    rng = np.random.default_rng(seed)
+    base = "https://example.jp/dataset/synthetic"
+
+    def date():
+        return (DATE_END - datetime.timedelta(days=int(rng.integers(0, 3650)))).isoformat()
+
+    groups = [
+        ("カタログ情報", {
+            "管理ID（URL）": f"{base}/catalog", "タイトル（データセット名称）": "合成データカタログ",
+            "説明": "ベンチマーク用の合成データ", "キーワード": "施設,人口", "テーマ分類": "行政",
+            "対象地域": "東京都", "対象期間": "2020-2025", "提供者": "サンプル市", "連絡先情報": f"{base}/contact",
+            "作成者": "サンプル市", "公開日": date(), "最終更新日": date(), "更新頻度": "年次",
+            "ライセンス": "CC BY 4.0", "利用規約": f"{base}/terms", "ホームページ（ソース）": base,
+        }),
+        ("データセット情報", {
+            "管理ID（URL）": f"{base}/dataset", "タイトル": "施設一覧", "バージョン": "1.0",
+            "説明": "施設の一覧", "キーワード": "施設", "対象地域(範囲)": "東京都", "対象期間": "2025",
+            "分類": "施設", "提供者": "サンプル市", "作成者": "サンプル市", "連絡先情報": f"{base}/contact",
+            "タイプ": "Dataset", "公開日": date(), "最終更新日": date(), "更新頻度": "月次", "言語": "ja",
+            "ライセンス": "CC BY 4.0", "準拠する標準": f"{base}/standard", "関連ドキュメント": f"{base}/docs",
+            "ランディングページ": base,
+        }),
+        ("データサービス情報", {
+            "管理ID（URL）": f"{base}/service", "タイトル": "施設API", "説明": "施設一覧のAPI",
+            "キーワード": "API", "提供者": "サンプル市", "タイプ": "DataService", "ライセンス": "CC BY 4.0",
+            "準拠する標準": "OpenAPI 3.0", "関連ドキュメント": f"{base}/docs", "エンドポイントURL": f"{base}/api",
+            "ランディングページ": base,
+        }),
+    ]
+    for index in range(1, distributions + 1):
+        groups.append((f"配信情報{index}", {
+            "管理ID（URL）": f"{base}/distribution/{index}", "タイトル（ファイル名）": f"facilities_{index}.csv",
+            "説明": f"施設一覧（{index}）", "アクセスサービス": f"{base}/service",
+            "バイトサイズ": int(rng.integers(1_000, 10_000_000)), "ファイル形式": "CSV", "メディアタイプ": "text/csv",
+            "公開日": date(), "最終更新日": date(), "期間": "2025", "ステータス": "公開", "言語": "ja",
+            "ライセンス": "CC BY 4.0", "準拠する標準": f"{base}/standard", "関連ドキュメント": f"{base}/docs",
+            "アクセスURL": f"{base}/distribution/{index}", "ダウンロードURL": f"{base}/files/facilities_{index}.csv",
+        }))
+
+    rows = []
+    for category, items in groups:
+        for position, (item, value) in enumerate(items.items()):
+            rows.append({"カテゴリ（クラス）": category if position == 0 else None, "": None,
+                         "メタデータ項目": item, "メタデータ内容": value})
+    return pd.DataFrame(rows)
+
+
+def write_metadata_excel(path, distributions=10, seed=0):
+    """
+    Write a metadata workbook in the layout of the source files: a title
+    row and an empty row above the header of the metadata sheet, and other
+    sheets (表紙, データ項目定義) around it.
+    """
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        pd.DataFrame({"項目": ["データセット名", "作成日"], "内容": ["合成データ", DATE_END.isoformat()]}) \
+            .to_excel(writer, sheet_name="00_表紙", index=False)
+        metadata_sheet(distributions, seed).to_excel(writer, sheet_name="01_データ構成（メタデータ）",
+                                                     index=False, startrow=2)
+        writer.sheets["01_データ構成（メタデータ）"].cell(row=1, column=1, value="データ構成（メタデータ）")
+        pd.DataFrame({"項目名": list(records(1).columns), "型": "string"}) \
+            .to_excel(writer, sheet_name="02_データ項目定義", index=False)
+
+
+def write_json_records(df, path, chunk_rows=100_000):
+    """Write a DataFrame as a JSON array of records, one chunk at a time."""
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[")
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows].to_json(orient="records", force_ascii=False)
+            if start:
+                file.write(",")
+            file.write(chunk[1:-1])
+        file.write("]")
+
+
+DATASETS = ["records", "text_match", "points", "polygons", "metadata"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--unique", type=int, default=20_000, help="distinct names and addresses")
+    parser.add_argument("--polygons", type=int, default=None, help="number of polygons (default rows / 100)")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--datasets", nargs="+", choices=DATASETS, default=DATASETS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    os.makedirs(args.out, exist_ok=True)
+
+    def output(name):
+        path = os.path.join(args.out, name)
+        print(path)
+        return path
+
+    if "records" in args.datasets:
+        df = records(args.rows, args.unique, args.seed)
+        df.to_csv(output("records.csv"), index=False)
+        write_json_records(df, output("records.json"))
+    if "text_match" in args.datasets:
+        main_df, sub_df = text_match_records(args.rows, args.unique, args.seed)
+        write_json_records(main_df, output("text_match_main.json"))
+        write_json_records(sub_df, output("text_match_sub.json"))
+    if "points" in args.datasets:
+        gdf = points(args.rows, seed=args.seed)
+        gdf.to_file(output("points.geojson"), driver="GeoJSON")
+        to_crs(gdf, JGD2011).to_file(output("points_jgd2011.geojson"), driver="GeoJSON")
+        to_crs(gdf, JGD2011_PLANE_IX).to_file(output("points_6677.geojson"), driver="GeoJSON")
+    if "polygons" in args.datasets:
+        gdf = census_polygons(args.polygons or max(args.rows // 100, 1), seed=args.seed)
+        gdf.to_file(output("polygons.geojson"), driver="GeoJSON")
+        to_crs(gdf, JGD2011).to_file(output("polygons_jgd2011.geojson"), driver="GeoJSON")
+        to_crs(gdf, JGD2011_PLANE_IX).to_file(output("polygons_6677.geojson"), driver="GeoJSON")
+    if "metadata" in args.datasets:
+        write_metadata_excel(output("metadata.xlsx"), max(args.rows // 1000, 1), args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# 住所表記の正規化ルール（モジュール読み込み時に一度だけコンパイルする）
+CHOME_PATTERN = re.compile(r"(\d+)丁目")
+BANCHI_GOU_PATTERN = re.compile(r"(\d+)番地(\d+号?)")
+BANCHI_END_PATTERN = re.compile(r"(\d+)番地$")
+TRAILING_HYPHEN_PATTERN = re.compile(r"-$")
+
+# 単独の「ノ」「ケ」「ツ」をひらがなに置換するルール
+SINGLE_KATAKANA_RULES = [
+    (re.compile(r"(?<![ｦ-ﾟ])ﾉ(?![ｦ-ﾟ])|(?<![ァ-ン])ノ(?![ァ-ン])"), "の"),
+    (re.compile(r"(?<![ｦ-ﾟ])ｹ(?![ｦ-ﾟ])|(?<![ァ-ン])ケ(?![ァ-ン])"), "が"),
+    (re.compile(r"(?<![ｦ-ﾟ])ﾂ(?![ｦ-ﾟ])|(?<![ァ-ン])ツ(?![ァ-ン])"), "つ"),
+]
+
+HALF_TO_FULL_KATAKANA_MAP = str.maketrans(
+    "ｦｧｨｩｪｫｬｭｮｯｰｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜﾝﾞﾟ",
+    "ヲァィゥェォャュョッーアイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン゛゜"
+)
+DAKUTEN_PATTERN = re.compile(r"(\w゛)")
+HANDAKUTEN_PATTERN = re.compile(r"(\w゜)")
+
+
+def _combine_dakuten(match):
+    return chr(ord(match.group(1)[0]) + 1)
+
+
+def _combine_handakuten(match):
+    return chr(ord(match.group(1)[0]) + 2)
+
+
+def normalize_address_values(addresses: pd.Series) -> pd.Series:
+    """
+    Normalize a Series of address strings with vectorized `.str` operations.
+
+    The rules are applied in the same order as `convert_address`,
+    `replace_single_katakana` and `convert_halfwidth_to_fullwidth`.
+
+    Parameters
+    ----------
+    addresses : pd.Series
+        A Series which contains only address strings.
+
+    Returns
+    -------
+    pd.Series
+        The normalized addresses.
+    """
+    addresses = addresses.str.replace(CHOME_PATTERN, r"\1-", regex=True)
+    addresses = addresses.str.replace(BANCHI_GOU_PATTERN, r"\1-\2", regex=True)
+    addresses = addresses.str.replace(BANCHI_END_PATTERN, r"\1", regex=True)
+    addresses = addresses.str.replace(TRAILING_HYPHEN_PATTERN, "", regex=True)
+    for pattern, replacement in SINGLE_KATAKANA_RULES:
+        addresses = addresses.str.replace(pattern, replacement, regex=True)
+    addresses = addresses.str.translate(HALF_TO_FULL_KATAKANA_MAP)
+    addresses = addresses.str.replace(DAKUTEN_PATTERN, _combine_dakuten, regex=True)
+    addresses = addresses.str.replace(HANDAKUTEN_PATTERN, _combine_handakuten, regex=True)
+    return addresses
+
+
+def normalize_address_column(address_column: pd.Series) -> pd.Series:
+    """
+    Normalize a column of addresses.
+
+    Only the distinct values of the column are normalized, and the results
+    are mapped back to every row. Missing values and non-string values are
+    kept as they are.
+
+    Parameters
+    ----------
+    address_column : pd.Series
+        A column of addresses in a DataFrame.
+
+    Returns
+    -------
+    pd.Series
+        The normalized column of addresses.
+    """
+    codes, uniques = pd.factorize(address_column, use_na_sentinel=True)
+    if len(uniques) == 0:
+        return address_column
+
+    uniques = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    is_text = uniques.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    if is_text.any():
+        uniques[is_text] = normalize_address_values(uniques[is_text])
+
+    values = address_column.to_numpy(dtype=object, copy=True)
+    has_value = codes >= 0
+    values[has_value] = uniques.to_numpy()[codes[has_value]]
+    return pd.Series(values, index=address_column.index, name=address_column.name)
@@ -0,0 +1,268 @@
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from address_normalizer import normalize_address_column
+from utils import mask_outliers, convert_year_column, convert_date_column
+
+# この行数 × 列数を超える場合、列ごとの処理をプロセスプールで並列に実行する
+CLEANSING_PARALLEL_MIN_CELLS = int(os.getenv("CLEANSING_PARALLEL_MIN_CELLS", 1_000_000))
+CLEANSING_MAX_WORKERS = int(os.getenv("CLEANSING_MAX_WORKERS", os.cpu_count() or 1))
+
+
+def process_address(address_column: pd.Series) -> pd.Series:
+    return normalize_address_column(address_column)
+
+
+def process_datetime_column(datetime_column: pd.Series, datetime_format: str = None) -> pd.Series:
+    """
+    Process a column of datetime in a DataFrame.
+
+    This function takes a column of datetime in a DataFrame and
+    processes it to convert it to a standard datetime format.
+    If the format is '%y', it converts it to a year.
+    Otherwise, it converts the datetime to the Gregorian calendar.
+    Each distinct value is parsed only once, and the results are
+    broadcast back to the rows.
+
+    Parameters
+    ----------
+    datetime_column : pd.Series
+        A column of datetime in a DataFrame to be processed.
+    datetime_format : str
+        The format of the datetime in the column. If None, the
+        default format is '%Y-%m-%d'.
+
+    Returns
+    -------
+    pd.Series
+        The processed column of datetime.
+    """
+    if datetime_format is None:
+        datetime_format = '%Y-%m-%d'
+
+    if datetime_format.lower() == '%y':
+        datetime_column = convert_year_column(datetime_column)
+    else:
+        datetime_column = convert_date_column(datetime_column, datetime_format)
+
+    return datetime_column
+
+
+def process_outliers(df: pd.DataFrame, column_name: str) -> pd.DataFrame:
+    """Process a column of a DataFrame for outliers.
+
+    Detect outliers in a column of a DataFrame using the mask_outliers
+    function and set them to NaN.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A DataFrame to be processed.
+    column_name : str
+        Name of the column to be processed.
+
+    Returns
+    -------
+    pd.DataFrame
+        Output DataFrame with outliers set to NaN.
+    """
+    return mask_outliers(df, [column_name])
+
+
+class LiteralReplacer:
+    """
+    Apply many literal replacements to a string in one scan.
+
+    The targets are compiled once into a single alternation regex sorted by
+    length, so the leftmost match wins and, at the same position, the longest
+    target wins. When the same target is given several times, the first
+    replacement in request order is used. This is the same as replacing them
+    one after another only for independent replacements, see
+    `is_independent_replacement`.
+    """
+
+    def __init__(self, replacements: list):
+        self.mapping = {}
+        for target, replacement in replacements:
+            self.mapping.setdefault(target, replacement)
+        targets = sorted(self.mapping, key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(target) for target in targets))
+
+    def replace(self, value):
+        if not isinstance(value, str):
+            return value
+        return self.pattern.sub(lambda match: self.mapping[match.group(0)], value)
+
+    def apply(self, values: pd.Series) -> pd.Series:
+        return values.map(self.replace)
+
+
+def is_literal_replace_op(op: dict) -> bool:
+    # Series.replace(regex=True) は置換後の文字列のバックスラッシュを解釈するので、それを含む op は対象外
+    return (op.get("type", None) == "replace" and isinstance(op.get("target", None), str) and op["target"] != ""
+            and isinstance(op.get("replace", None), str) and "\\" not in op["replace"])
+
+
+def targets_overlap(first: str, second: str) -> bool:
+    """Whether occurrences of the two targets can overlap in some string."""
+    if first in second or second in first:
+        return True
+    return any(first.endswith(second[:size]) or second.endswith(first[:size])
+               for size in range(1, min(len(first), len(second))))
+
+
+def is_independent_replacement(replacements: list, target: str) -> bool:
+    """
+    Whether replacing `target` in one scan together with the earlier
+    `replacements` gives the same result as replacing it after them.
+
+    The targets must not overlap, and no earlier replacement may create the
+    target: it must not share a character with it, and must not be empty
+    (removing a target joins the text around it).
+    """
+    for previous_target, previous_replacement in replacements:
+        if targets_overlap(previous_target, target):
+            return False
+        if previous_replacement == "" or set(previous_replacement) & set(target):
+            return False
+    return True
+
+
+def compile_value_ops(ops: list) -> list:
+    """
+    Compile value ops into steps, merging runs of consecutive literal replace
+    ops into one LiteralReplacer when they are independent of each other.
+    Chained rules (A->B, then B->C) stay in separate steps.
+    """
+    steps = []
+    replacements = []
+    for op in ops:
+        if is_literal_replace_op(op):
+            if not is_independent_replacement(replacements, op["target"]):
+                steps.append(LiteralReplacer(replacements).apply)
+                replacements = []
+            replacements.append((op["target"], op["replace"]))
+            continue
+        if replacements:
+            steps.append(LiteralReplacer(replacements).apply)
+            replacements = []
+        steps.append(partial(apply_value_op, op=op))
+    if replacements:
+        steps.append(LiteralReplacer(replacements).apply)
+    return steps
+
+
+def is_value_op(op: dict) -> bool:
+    """Whether the op converts each value independently, so that it can run on the distinct values only."""
+    if op.get("type", None) == "replace":
+        return True
+    return op.get("type", None) == "normalize" and op.get("dataType", None) in ["address", "datetime"]
+
+
+def apply_value_op(values: pd.Series, op: dict) -> pd.Series:
+    if op.get("type", None) == "replace":
+        pattern = re.escape(op.get("target", None))
+        return values.replace(pattern, op.get("replace", None), regex=True)
+    if op.get("dataType", None) == "address":
+        return process_address(values)
+    return process_datetime_column(values, op.get("datetimeFormat", None))
+
+
+def apply_fused_value_ops(column: pd.Series, ops: list) -> pd.Series:
+    """
+    Apply consecutive value ops to a column in one pass.
+
+    The column is factorized once, all the ops run on the distinct values in
+    request order, and the results are broadcast back to the rows once.
+    Consecutive independent literal replace ops are applied together in one scan.
+    """
+    codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    values = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    for step in compile_value_ops(ops):
+        values = step(values)
+
+    result = column.to_numpy(dtype=object, copy=True)
+    has_value = codes >= 0
+    result[has_value] = values.to_numpy(dtype=object)[codes[has_value]]
+    if any(op.get("dataType", None) == "datetime" for op in ops):
+        # 日付の正規化では欠損値は None になる
+        result[~has_value] = None
+    return pd.Series(result, index=column.index, name=column.name).infer_objects()
+
+
+def is_unitnum_op(op: dict) -> bool:
+    return op.get("type", None) == "normalize" and op.get("dataType", None) == "unitnum"
+
+
+def cleanse_column(column: pd.Series, ops: list) -> pd.Series:
+    """Apply the ops of one field in request order, fusing consecutive value ops."""
+    fused = []
+    for op in ops:
+        if is_value_op(op):
+            fused.append(op)
+            continue
+        if fused:
+            column = apply_fused_value_ops(column, fused)
+            fused = []
+        if is_unitnum_op(op):
+            df = pd.to_numeric(column, errors="coerce").to_frame()
+            column = process_outliers(df, column.name)[column.name]
+    if fused:
+        column = apply_fused_value_ops(column, fused)
+    return column
+
+
+def plan_cleansing(cleansing: list, columns) -> OrderedDict:
+    """
+    Group the cleansing ops by field, keeping the request order within each field.
+
+    Ops on different fields are independent, so each field can be processed
+    in one pass and in parallel with the other fields.
+    """
+    plan = OrderedDict()
+    for op in cleansing:
+        field = op.get("field", None)
+        if op.get("type", None) not in ["normalize", "replace"]:
+            continue
+        if field not in columns:
+            print(f"Field '{field}' does not exist in DataFrame.")
+            continue
+        plan.setdefault(field, []).append(op)
+    return plan
+
+
+def run_cleansing_plan(df: pd.DataFrame, plan: OrderedDict, max_workers: int = None) -> pd.DataFrame:
+    """
+    Run a cleansing plan on a DataFrame in place.
+
+    Large frames with several fields are processed in a process pool, one
+    field per task. A unitnum op at the end of the ops of a field is run
+    after the other ops, together with the other fields ending with one, so
+    that the outlier statistics of all these fields are computed in one pass.
+    """
+    if max_workers is None:
+        max_workers = CLEANSING_MAX_WORKERS
+    outlier_fields = [field for field, ops in plan.items() if ops and is_unitnum_op(ops[-1])]
+    plan = OrderedDict((field, ops[:-1] if field in outlier_fields else ops) for field, ops in plan.items())
+    plan = OrderedDict((field, ops) for field, ops in plan.items() if ops)
+
+    workers = min(max_workers, len(plan))
+    if workers > 1 and len(df) * len(plan) >= CLEANSING_PARALLEL_MIN_CELLS:
+        fields = list(plan.keys())
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(cleanse_column, [df[field] for field in fields], [plan[field] for field in fields])
+            for field, column in zip(fields, results):
+                df[field] = column
+    else:
+        for field, ops in plan.items():
+            df[field] = cleanse_column(df[field], ops)
+
+    for field in outlier_fields:
+        df[field] = pd.to_numeric(df[field], errors="coerce")
+    return mask_outliers(df, outlier_fields)
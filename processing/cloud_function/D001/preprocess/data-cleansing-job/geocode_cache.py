@@ -0,0 +1,113 @@
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+# キャッシュは GEOCODE_CACHE_PATH を指定したときだけ使う。Cloud Run の /tmp はメモリ上にあり
+# 実行ごとに消えるので、永続ディスクか Filestore（NFS）をマウントしたパスを指定すること。
+# Cloud Storage FUSE はファイルロックがないので、SQLite のファイルを置くと壊れることがある
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "")
+# WAL は共有メモリを使うので、1台のマシンのローカルディスクでのみ指定できる。NFS では DELETE のままにすること
+GEOCODE_CACHE_JOURNAL_MODE = os.getenv("GEOCODE_CACHE_JOURNAL_MODE", "DELETE")
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", 1_000_000))
+GEOCODE_CACHE_TTL_DAYS = float(os.getenv("GEOCODE_CACHE_TTL_DAYS", 90))
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_cache_key(address: str) -> str:
+    """Normalize an address (NFKC, no whitespace) to use it as a cache key."""
+    return WHITESPACE_PATTERN.sub("", unicodedata.normalize("NFKC", address))
+
+
+class GeocodeCache:
+    """
+    Persistent, size-bounded geocoding cache stored in SQLite.
+
+    Entries older than `ttl_days` are treated as missing. When the cache has
+    more than `max_entries` entries, the least recently used ones are evicted
+    on `close`.
+    """
+
+    def __init__(self, path=GEOCODE_CACHE_PATH, max_entries=GEOCODE_CACHE_MAX_ENTRIES,
+                 ttl_days=GEOCODE_CACHE_TTL_DAYS, journal_mode=GEOCODE_CACHE_JOURNAL_MODE):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        if journal_mode.upper() == "WAL":
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            "address TEXT PRIMARY KEY, longitude REAL NOT NULL, latitude REAL NOT NULL, "
+            "created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS geocode_last_used_at ON geocode (last_used_at)")
+        self.connection.commit()
+
+    def get(self, address: str):
+        """Return (longitude, latitude) of the address, or None when it is not cached."""
+        key = normalize_cache_key(address)
+        now = time.time()
+        row = self.connection.execute(
+            "SELECT longitude, latitude, created_at FROM geocode WHERE address = ?", (key,)
+        ).fetchone()
+        if row is None or now - row[2] > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self.connection.execute("UPDATE geocode SET last_used_at = ? WHERE address = ?", (now, key))
+        self.hits += 1
+        return row[0], row[1]
+
+    def set(self, address: str, longitude: float, latitude: float):
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO geocode (address, longitude, latitude, created_at, last_used_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (normalize_cache_key(address), longitude, latitude, now, now)
+        )
+
+    def evict(self):
+        """Delete expired entries, then the least recently used ones above `max_entries`."""
+        self.connection.execute("DELETE FROM geocode WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        count = self.connection.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM geocode WHERE address IN "
+                "(SELECT address FROM geocode ORDER BY last_used_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+        self.connection.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        try:
+            self.evict()
+        finally:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_geocode_cache():
+    """Open the geocoding cache, or return None when GEOCODE_CACHE_PATH is not set or cannot be opened."""
+    if not GEOCODE_CACHE_PATH:
+        return None
+    try:
+        return GeocodeCache()
+    except (sqlite3.Error, OSError) as e:
+        print(f"[GEOCODE CACHE] Cannot open {GEOCODE_CACHE_PATH}: {e}")
+        return None
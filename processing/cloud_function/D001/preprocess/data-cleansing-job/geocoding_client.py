@@ -0,0 +1,151 @@
+import asyncio
+import os
+import time
+
+import aiohttp
+
+GEOCODING_RATE_PER_SECOND = float(os.getenv("GEOCODING_RATE_PER_SECOND", 10))
+GEOCODING_MAX_IN_FLIGHT = int(os.getenv("GEOCODING_MAX_IN_FLIGHT", 20))
+GEOCODING_MAX_RETRIES = int(os.getenv("GEOCODING_MAX_RETRIES", 5))
+GEOCODING_TIMEOUT_SECONDS = float(os.getenv("GEOCODING_TIMEOUT_SECONDS", 30))
+
+MAX_BACKOFF_SECONDS = 30
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter which adapts its rate to the provider.
+
+    The rate is halved and requests are paused whenever the provider throttles
+    (429/5xx), and it increases additively back to `rate` on successes.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, min_rate: float = 0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.consecutive_throttles = 0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        self.consecutive_throttles = 0
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def on_throttle(self, retry_after: float = None):
+        now = time.monotonic()
+        if now < self.blocked_until:
+            # 同じバーストで複数のリクエストが失敗した場合は一度だけ減速する
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            return
+        self.consecutive_throttles += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        delay = retry_after
+        if delay is None:
+            delay = min(MAX_BACKOFF_SECONDS, 0.5 * 2 ** (self.consecutive_throttles - 1))
+        self.blocked_until = now + delay
+        self.tokens = 0
+        self.updated_at = self.blocked_until
+
+
+def parse_retry_after(value):
+    try:
+        return min(MAX_BACKOFF_SECONDS, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+class GeocodingClient:
+    """
+    AWS Location Service client with one pooled session per job.
+
+    Requests go through a token bucket, and at most `max_in_flight` requests
+    run at the same time as a sliding window (a new request starts as soon as
+    another one finishes).
+    """
+
+    def __init__(self, url: str, rate: float = GEOCODING_RATE_PER_SECOND,
+                 max_in_flight: int = GEOCODING_MAX_IN_FLIGHT, max_retries: int = GEOCODING_MAX_RETRIES,
+                 cache=None):
+        self.url = url
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.cache = cache
+        self.limiter = TokenBucket(rate)
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+            timeout=aiohttp.ClientTimeout(total=GEOCODING_TIMEOUT_SECONDS)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.session.close()
+
+    async def geocode(self, address: str):
+        """Return (longitude, latitude) of the address, or None when it cannot be geocoded."""
+        if self.cache is not None:
+            cached = self.cache.get(address)
+            if cached is not None:
+                return cached
+
+        for _ in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            try:
+                async with self.session.post(self.url, json={"Text": address}) as response:
+                    if response.status == 429 or response.status >= 500:
+                        self.limiter.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+                        continue
+                    if response.status != 200:
+                        print(f"[GET LAT LNG] Status {response.status} from AWS", address)
+                        return None
+                    self.limiter.on_success()
+                    data = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Error getting location for {address}: {e}")
+                self.limiter.on_throttle()
+                continue
+
+            result = data.get("Results")
+            if not result:
+                print('[GET LAT LNG] Cannot get lat lng from AWS', address)
+                return None
+            longitude, latitude = result[0]["Place"]["Geometry"]["Point"]
+            if self.cache is not None:
+                self.cache.set(address, longitude, latitude)
+            return longitude, latitude
+
+        print('[GET LAT LNG] Retries exhausted', address)
+        return None
+
+    async def map(self, func, items: list) -> list:
+        """Run `func(item, self)` for every item within the in-flight window and keep the order."""
+        results = [None] * len(items)
+        pending = iter(enumerate(items))
+
+        async def worker():
+            for index, item in pending:
+                results[index] = await func(item, self)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.max_in_flight, len(items)))))
+        return results
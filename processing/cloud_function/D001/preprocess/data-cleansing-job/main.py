@@ -1,41 +1,32 @@
 import asyncio
-import io
-import mimetypes
-from io import BytesIO, StringIO
+import codecs
 from typing import Tuple
 
-import aiohttp
-import magic
-from shapely.geometry import MultiPolygon, Polygon, shape
-from shapely import wkt
-from pymongo import MongoClient
+import shapely
+from shapely.geometry import shape
+from pyproj import CRS, Transformer
 from datetime import datetime, timezone
 import json
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-import re
 import requests
 import time
 import sys
-from shapely.geometry import Point
 import os
 from pyogrio.errors import DataSourceError
 import zipfile
+from functools import lru_cache
 import tempfile
-from json import JSONDecoder
 from collections import OrderedDict
-from urllib.parse import quote_plus
-from utils import detect_outliers, convert_to_year, convert_date_to_gregorian
+from status_writer import status_writer
+from json_codec import JSON_HEADERS, dumps, loads
+from cleansing_planner import plan_cleansing, run_cleansing_plan
+from geocode_cache import open_geocode_cache
+from geocoding_client import GeocodingClient
 
-semaphore = asyncio.Semaphore(20)
-custom_json_decoder = JSONDecoder(object_pairs_hook=OrderedDict)
 AWS_LOCATION_SERVICE_API_KEY = os.getenv('AWS_LOCATION_SERVICE_API_KEY')
 AWS_LOCATION_SERVICE_API_ENDPOINT = os.getenv('AWS_LOCATION_SERVICE_API_ENDPOINT')
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 CMS_GET_ASSETS_TOKEN = os.getenv("CMS_GET_ASSETS_TOKEN", "")
 # Retrieve Job-defined env vars
 TASK_INDEX = os.getenv("CLOUD_RUN_TASK_INDEX", 0)
@@ -43,6 +34,13 @@ TASK_ATTEMPT = os.getenv("CLOUD_RUN_TASK_ATTEMPT", 0)
 # Retrieve User-defined env vars
 DMS_DATA = os.getenv("DMS_DATA", "")
 
+ENCODING_CANDIDATES = ['utf-8', 'cp932', 'shift_jis']
+ENCODING_SNIFF_BYTES = 1024 * 1024
+# ASCII だけの先頭が続いても、エンコーディングの検出で読むのはこの大きさまで
+ENCODING_SNIFF_MAX_BYTES = 8 * 1024 * 1024
+ENCODING_SNIFF_BLOCK_BYTES = 64 * 1024
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
 LATITUDE_POSTFIX = "_緯度"
 LONGITUDE_POSTFIX = "_軽度"
 
@@ -50,7 +48,7 @@ LONGITUDE_POSTFIX = "_軽度"
 def cleansing_data(request_data):
     ticket_id = None
     try:
-        request = custom_json_decoder.decode(request_data)
+        request = loads(request_data)
         ticket_id = request["ticketId"]
         update_information({"process": "Processing"}, request["ticketId"])
         try:
@@ -74,10 +72,7 @@ def cleansing_data(request_data):
             to_geojson_file = False
 
         data = preprocess_data(request, data, type_file)
-        data_json = data
-        if isinstance(data, str):
-            data_json = custom_json_decoder.decode(data)
-        data_json = append_document_name(data_json, document_name, to_geojson_file)
+        data_json = append_document_name(data, document_name, to_geojson_file)
         properties = generate_properties(data_json)
 
         call_api_endpoint(data_json, properties, request["ticketId"], request["apiEndpoint"])
@@ -104,7 +99,7 @@ def preprocess_data(request, data, type_file):
         normalizeCrs = request.get("normalizeCrs", None)
         if type_file == "shapefile":
             if normalizeCrs is not None and normalizeCrs:
-                data = crs_normalise_function(data)
+                data = crs_normalise_function(data, type_file)
         else:
             cleansing = request.get("cleansing", None)
             geocoding = request.get("geocoding", None)
@@ -114,7 +109,7 @@ def preprocess_data(request, data, type_file):
                 data = geocoding_function(request, data, type_file)
             if normalizeCrs is not None and normalizeCrs and (
                     type_file == "geojson" or (type_file == "json" and geocoding and geocoding is not None)):
-                data = crs_normalise_function(data)
+                data = crs_normalise_function(data, type_file)
 
         return data
     except BaseException as e:
@@ -122,240 +117,40 @@ def preprocess_data(request, data, type_file):
         raise Exception("処理に失敗しました。入力データを確認するか、サポートにお問い合わせください。")
 
 
-def convert_address(address):
-    if isinstance(address, str):
-        address = re.sub(r"(\d+)丁目", r"\1-", address)
-        address = re.sub(r"(\d+)番地(\d+号?)", r"\1-\2", address)
-        address = re.sub(r"(\d+)番地$", r"\1", address)
-        address = re.sub(r'-$', '', address)
-    return address
-
-
-def replace_single_katakana(text):
-    single_no_pattern = r'(?<![ｦ-ﾟ])ﾉ(?![ｦ-ﾟ])|(?<![ァ-ン])ノ(?![ァ-ン])'
-    single_ke_pattern = r'(?<![ｦ-ﾟ])ｹ(?![ｦ-ﾟ])|(?<![ァ-ン])ケ(?![ァ-ン])'
-    single_tsu_pattern = r'(?<![ｦ-ﾟ])ﾂ(?![ｦ-ﾟ])|(?<![ァ-ン])ツ(?![ァ-ン])'
-    if isinstance(text, str):
-        text = re.sub(single_no_pattern, "の", text)
-        text = re.sub(single_ke_pattern, "が", text)
-        text = re.sub(single_tsu_pattern, "つ", text)
-    return text
-
-
-def convert_halfwidth_to_fullwidth(text):
-    half_to_full_katakana_map = str.maketrans(
-        "ｦｧｨｩｪｫｬｭｮｯｰｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜﾝﾞﾟ",
-        "ヲァィゥェォャュョッーアイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン゛゜"
-    )
-    if pd.isna(text):
-        return text
-    text = text.translate(half_to_full_katakana_map)
-    text = re.sub(r'(\w゛)', lambda x: chr(ord(x.group(1)[0]) + 1), text)
-    text = re.sub(r'(\w゜)', lambda x: chr(ord(x.group(1)[0]) + 2), text)
-    return text
-
-
-def process_address(address_column: pd.DataFrame):
-    address_column = address_column.apply(convert_address)
-    address_column = address_column.apply(replace_single_katakana)
-    address_column = address_column.apply(convert_halfwidth_to_fullwidth)
-    return address_column
-
-
-def process_datetime_column(datetime_column: pd.Series, datetime_format: str = None) -> pd.Series:
-    """
-    Process a column of datetime in a DataFrame.
-
-    This function takes a column of datetime in a DataFrame and
-    processes it to convert it to a standard datetime format.
-    If the format is '%y', it converts it to a year.
-    Otherwise, it uses the `convert_date_to_gregorian` function
-    to convert the datetime to the Gregorian calendar.
-
-    Parameters
-    ----------
-    datetime_column : pd.Series
-        A column of datetime in a DataFrame to be processed.
-    datetime_format : str
-        The format of the datetime in the column. If None, the
-        default format is '%Y-%m-%d'.
-
-    Returns
-    -------
-    pd.Series
-        The processed column of datetime.
-    """
-    if datetime_format is None:
-        datetime_format = '%Y-%m-%d'
-
-    if datetime_format.lower() == '%y':
-        datetime_column = datetime_column.apply(convert_to_year)
-    else:
-        datetime_column = datetime_column.apply(lambda x: convert_date_to_gregorian(x, datetime_format))
-
-    return datetime_column
-
-
-def process_outliers(df: pd.DataFrame, column_name: str) -> pd.DataFrame:
-    """Process a column of a DataFrame for outliers.
-
-    Detect outliers in a column of a DataFrame using the detect_outliers
-    function and set them to NaN.
-
-    Parameters
-    ----------
-    df : pd.DataFrame
-        A DataFrame to be processed.
-    column_name : str
-        Name of the column to be processed.
-
-    Returns
-    -------
-    pd.DataFrame
-        Output DataFrame with outliers set to NaN.
-    """
-    outliers = detect_outliers(df, column_name)["outliers"]
-    df.loc[outliers, column_name] = pd.NA
-    return df
-
-
 def process_data_cleansing(df, request):
     try:
-        cleansing = request["cleansing"]
-        for op in cleansing:
-            if op.get("type", None) == "normalize":
-                field = op.get("field", None)
-                if field in df.columns:
-                    data_type = op.get("dataType", None)
-                    if data_type == "address":
-                        df[field] = process_address(df[field])
-                    if data_type == "datetime":
-                        datetime_format = op.get("datetimeFormat", None)
-                        print('PROCESS DATETIME', datetime_format, df[field])
-                        df[field] = process_datetime_column(df[field], datetime_format)
-                    if data_type == "unitnum":
-                        df[field] = pd.to_numeric(df[field], errors="coerce")
-                        df = process_outliers(df, field)
-                else:
-                    print(f"Field '{field}' does not exist in DataFrame.")
-            elif op.get("type", None) == "replace":
-                if op.get("field", None) in df.columns:
-                    pattern = re.escape(op.get("target", None))
-                    df[op["field"]] = df[op.get("field", None)].replace(pattern, op.get("replace", None), regex=True)
-                else:
-                    print(f"Field {op.get("field", '')} does not exist in DataFrame.")
-
+        plan = plan_cleansing(request["cleansing"], df.columns)
+        run_cleansing_plan(df, plan)
     except BaseException as e:
         print(f"Error: {e}")
         raise Exception(e)
 
 
-def get_extension_file(url):
-    try:
-        # Download file
-        headers = None
-        if CMS_GET_ASSETS_TOKEN:
-            headers = {"Authorization": f"Bearer {CMS_GET_ASSETS_TOKEN}"}
-        data = requests.get(url, stream=True, headers=headers)
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            for chunk in data.iter_content(chunk_size=8192):
-                if chunk:
-                    temp_file.write(chunk)
-
-            output_file = temp_file.name
-        ext_file = get_extention_file_from_url(url)
-        if ext_file["status"]:
-            return ext_file["ext"], output_file
-        else:
-            validator = magic.Magic(uncompress=True, mime=True)
-            file_type = validator.from_file(output_file)
-            extension = mimetypes.guess_extension(file_type, strict=True).replace('.', '')
-
-            if extension and extension != 'txt' or extension == None:
-                return extension, output_file
-            else:
-                is_csv = is_csv_file(output_file)
-                if is_csv["status"]:
-                    return is_csv["ext"], output_file
-
-                file = open(output_file, "r", encoding="utf8", errors="ignore")
-                data = file.read()
-                is_json = is_json_file(data)
-                if is_json["status"]:
-                    file.close()
-                    return is_json["ext"], output_file
-
-                file.close()
-                return 'txt', output_file
-    except BaseException as e:
-        print(e)
-        return 'txt', None
-
-
-def is_json_file(file_data):
-    json_data = None
-    try:
-        json_data = json.loads(file_data)
-        # Check geojson or json
-        if type(json_data) == dict:
-            if (
-                    "type" in json_data
-                    and json_data["type"] == "FeatureCollection"
-                    and "features" in json_data
-                    and type(json_data["features"]) == list
-            ):
-                return {"status": True, "ext": "geojson"}
-            else:
-                return {"status": True, "ext": "json"}
-        else:
-            return {"status": True, "ext": "json"}
-    except BaseException as e:
-        return {"status": False, "ext": ""}
-
-
-def is_csv_file(data):
-    try:
-        pd.read_csv(data)
-        return {"status": True, "ext": "csv"}
-    except Exception as e:
-        return {"status": False, "ext": "not csv"}
-
-
-def get_extention_file_from_url(url):
-    arr_file_url = url.split('/')
-    file_name = arr_file_url[len(arr_file_url) - 1]
-    arr_file_name = file_name.split('.')
-    if len(arr_file_name) > 1:
-        return {'status': True, 'ext': arr_file_name[len(arr_file_name) - 1]}
-    else:
-        return {'status': False, 'ext': ''}
-
-
 def get_input_data(request):
     try:
         url = request["input"]
         headers = None
         if CMS_GET_ASSETS_TOKEN:
             headers = {"Authorization": f"Bearer {CMS_GET_ASSETS_TOKEN}"}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        bytesIo = BytesIO(response.content)
         type_file = request.get("inputType")
-        match type_file:
-            case "json":
-                data = json.load(bytesIo)
-            case "geojson":
-                data = json.load(bytesIo)
-            case "csv":
-                data = process_csv(bytesIo)
-            case "shapefile":
-                try:
-                    data = process_shp(url)
-                except Exception as e:
-                    raise DataSourceError(e)
-
-        if isinstance(data, str):
-            data = custom_json_decoder.decode(data)
+        file_path = download_to_temp_file(url, headers, suffix=".zip" if type_file == "shapefile" else None)
+        try:
+            match type_file:
+                case "json":
+                    with open(file_path, "rb") as file:
+                        data = loads(file.read())
+                case "geojson":
+                    with open(file_path, "rb") as file:
+                        data = loads(file.read())
+                case "csv":
+                    data = process_csv(file_path)
+                case "shapefile":
+                    try:
+                        data = process_shp(file_path)
+                    except Exception as e:
+                        raise DataSourceError(e)
+        finally:
+            os.remove(file_path)
 
         return data, type_file
     except DataSourceError as e:
@@ -366,53 +161,73 @@ def get_input_data(request):
         raise Exception(e)
 
 
-def process_shp(url):
+def process_shp(file_path):
+    """
+    Read the shapefile in a downloaded zip file into a GeoDataFrame.
+
+    The shapefile is read directly from the zip through GDAL's /vsizip/. The
+    path of the zip is put in braces, since GDAL only finds where the archive
+    name ends by its .zip extension otherwise. The zip is extracted to a
+    temporary directory only when GDAL cannot open it directly (e.g. file
+    names which are not UTF-8).
+    """
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            if response.status_code == 200:
-                file_path = f"{temp_dir + os.sep + str(time.time() * 1000)}.zip"
-                with open(file_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=1024):
-                        if chunk:
-                            f.write(chunk)
-                with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            # ルートにあるシェイプファイルを優先する
+            shp_files = sorted((name for name in zip_ref.namelist() if name.endswith(".shp")),
+                               key=lambda name: name.count("/"))
+            if not shp_files:
+                raise Exception("シェイプファイルが見つかりません。")
+            try:
+                return gpd.read_file(f"/vsizip/{{{file_path}}}/{shp_files[0]}")
+            except DataSourceError as e:
+                print(f"[SHAPEFILE] Cannot read {shp_files[0]} through /vsizip/, extracting the zip: {e}")
+                with tempfile.TemporaryDirectory() as temp_dir:
                     zip_ref.extractall(temp_dir)
-
-                def find_shp_file_in_root(directory):
-                    for file in os.listdir(directory):
-                        if file.endswith(".shp"):
-                            return os.path.join(directory, file)
-                    return None
-
-                def find_shp_file_in_subfolders(directory):
-                    for root, dirs, files in os.walk(directory):
-                        for file in files:
-                            if file.endswith(".shp"):
-                                return os.path.join(root, file)
-                    return None
-
-                shp_file = find_shp_file_in_root(temp_dir)
-                if not shp_file:
-                    shp_file = find_shp_file_in_subfolders(temp_dir)
-                if shp_file:
-                    gdf = gpd.read_file(shp_file)
-                    geojson_str = gdf.to_json()
-                    return geojson_str
-                else:
-                    raise Exception("シェイプファイルが見つかりません。")
-            else:
-                raise Exception("SHPファイルの取得中にエラーが発生しました。")
+                    return gpd.read_file(os.path.join(temp_dir, shp_files[0]))
     except BaseException as e:
         print(e)
         raise Exception(
             "シェイプファイルのセットが不完全です。SHP、SHX、DBF、PRJファイルがすべて必要です。シェイプファイルセットを確認し、全ての必須ファイルをアップロードしてください。")
 
 
+def to_frame(data, type_file) -> pd.DataFrame:
+    """
+    Convert the input data to the in-memory representation shared by the
+    cleansing, geocoding and CRS normalization stages.
+
+    GeoJSON and shapefile inputs become a GeoDataFrame (with the CRS of the
+    input when it is given), and the other inputs a DataFrame.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data
+    if type_file in ["geojson", "shapefile"]:
+        crs_info = None
+        crs_metadata = data.get('crs')
+        if crs_metadata:
+            crs_info = crs_metadata.get('properties', {}).get('name', None)
+        return gpd.GeoDataFrame.from_features(data['features'], crs=crs_info)
+    return pd.DataFrame(data)
+
+
+def frame_to_records(df: pd.DataFrame) -> list:
+    """Convert a DataFrame to a list of records with Python scalars and None for missing values."""
+    records = df.astype(object)
+    records[df.isna().to_numpy()] = None
+    return records.to_dict(orient='records')
+
+
 def append_document_name(data, document_name, to_geojson_file=True):
     try:
-        if isinstance(data, dict):
+        if isinstance(data, gpd.GeoDataFrame) and to_geojson_file:
+            gdf = data.reset_index(drop=True)
+            gdf = gdf[gdf.geometry.notna()]
+            gdf = gdf.assign(_document_name=document_name)
+            return gdf.to_geo_dict()
+        elif isinstance(data, pd.DataFrame):
+            df = data.drop(columns='geometry', errors='ignore') if isinstance(data, gpd.GeoDataFrame) else data
+            return frame_to_records(df.assign(_document_name=document_name))
+        elif isinstance(data, dict):
             if to_geojson_file:
                 features = data['features']
                 properties = [feature['properties'] for feature in features]
@@ -422,7 +237,7 @@ def append_document_name(data, document_name, to_geojson_file=True):
                 gdf = gdf[gdf.geometry.notna()]
                 gdf['_document_name'] = document_name
                 data_str = gdf.to_json()
-                data_json = custom_json_decoder.decode(data_str)
+                data_json = loads(data_str)
                 return data_json
             else:
                 for key, value in data.items():
@@ -437,70 +252,73 @@ def append_document_name(data, document_name, to_geojson_file=True):
         raise Exception(e)
 
 
-def detect_encoding(file_bytes: BytesIO) -> str:
-    encodings = ['utf-8', 'cp932', 'shift_jis']
-    for encoding in encodings:
-        try:
-            file_bytes.seek(0)
-            file_bytes.read().decode(encoding)
-            return encoding
-        except UnicodeDecodeError:
-            continue
-    raise ValueError("エンコーディングを検出できません。UTF-8、CP932、Shift-JIS のみ対応しています。")
+def download_to_temp_file(url, headers=None, suffix=None) -> str:
+    """Stream the file at `url` to a temporary file (with the `suffix`) and return its path."""
+    with requests.get(url, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+            try:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                    temp_file.write(chunk)
+            except BaseException:
+                temp_file.close()
+                os.remove(temp_file.name)
+                raise
+    return temp_file.name
 
 
-def process_csv(bytesIo):
+def detect_encoding(file_path: str, max_bytes: int = ENCODING_SNIFF_MAX_BYTES) -> str:
+    """
+    Detect the encoding of a file with incremental decoders.
+
+    The file is read block by block, and the candidates which fail to decode
+    are dropped. The detection stops ENCODING_SNIFF_BYTES bytes after the
+    first non-ASCII block, or after `max_bytes` bytes (None reads the whole
+    file).
+    """
+    decoders = {encoding: codecs.getincrementaldecoder(encoding)() for encoding in ENCODING_CANDIDATES}
+    candidates = list(ENCODING_CANDIDATES)
+    sniffed = 0
+    read = 0
+    with open(file_path, "rb") as file:
+        while True:
+            block = file.read(ENCODING_SNIFF_BLOCK_BYTES)
+            read += len(block)
+            if sniffed or not block.isascii():
+                sniffed += len(block)
+            for encoding in list(candidates):
+                try:
+                    decoders[encoding].decode(block, final=not block)
+                except UnicodeDecodeError:
+                    candidates.remove(encoding)
+            if not candidates:
+                raise ValueError("エンコーディングを検出できません。UTF-8、CP932、Shift-JIS のみ対応しています。")
+            if not block or sniffed >= ENCODING_SNIFF_BYTES or (max_bytes is not None and read >= max_bytes):
+                return candidates[0]
+
+
+def read_csv_file(file_path: str) -> pd.DataFrame:
+    encoding = detect_encoding(file_path)
     try:
-        encoding = detect_encoding(bytesIo)
-        bytesIo.seek(0)
-        df = pd.read_csv(bytesIo, encoding=encoding)
-        output = df.to_json(orient='records', force_ascii=False)
-        output = output.replace("\\/", "/")
-        return output
-    except Exception as e:
-        raise Exception(e)
+        return pd.read_csv(file_path, encoding=encoding)
+    except UnicodeDecodeError:
+        # 先頭だけでは判定できなかった場合（非 ASCII 文字が後ろにしかない等）は、ファイル全体で検出し直す
+        encoding = detect_encoding(file_path, max_bytes=None)
+        return pd.read_csv(file_path, encoding=encoding)
 
 
-def replace_none_with_null(d):
-    if isinstance(d, dict):
-        return {k: replace_none_with_null(v) for k, v in d.items()}
-    elif isinstance(d, list):
-        return [replace_none_with_null(v) for v in d]
-    elif d is None:
-        return "null"
-    else:
-        return d
+def process_csv(file_path):
+    try:
+        return read_csv_file(file_path)
+    except Exception as e:
+        raise Exception(e)
 
 
 def cleansing_function(request, data, type_file):
     try:
-        if isinstance(data, str):
-            data = custom_json_decoder.decode(data)
-        match type_file:
-            case "json":
-                df = pd.DataFrame(data)
-                process_data_cleansing(df, request)
-                json_data = df.to_json(orient='records', force_ascii=False)
-                json_data = json_data.replace("\\/", "/")
-                return json_data
-            case "csv":
-                df = pd.DataFrame(data)
-                process_data_cleansing(df, request)
-                json_data = df.to_json(orient='records', force_ascii=False)
-                json_data = json_data.replace("\\/", "/")
-                return json_data
-            case "geojson":
-                gdf = gpd.GeoDataFrame.from_features(data["features"])
-                process_data_cleansing(gdf, request)
-                features = gdf.to_json()
-                features = features.replace("\\/", "/")
-                features_json = custom_json_decoder.decode(features)
-                geojson_data = {
-                    "type": "FeatureCollection",
-                    "features": features_json["features"],
-                    "crs": data["crs"] if "crs" in data else ""
-                }
-                return json.dumps(geojson_data, ensure_ascii=False, sort_keys=False)
+        df = to_frame(data, type_file)
+        process_data_cleansing(df, request)
+        return df
     except BaseException as e:
         print(f"Cleansing error {e}")
         raise Exception(e)
@@ -510,242 +328,127 @@ def geocoding_function(request, data, type_file):
     try:
         target_column = request["geocoding"]["fields"]
         to_geojson_file = request.get("geocoding", {}).get("toGeojson", True)
-        if isinstance(data, str):
-            data = custom_json_decoder.decode(data)
-
-        if type_file == "geojson":
-            data = replace_none_with_null(data)
-            if isinstance(data, dict):
-                geojson_file = StringIO(json.dumps(data))
-            else:
-                geojson_file = StringIO(data)
-
-            dataframe = gpd.read_file(geojson_file)
-        else:
-            dataframe = pd.DataFrame(data)
+        dataframe = to_frame(data, type_file)
 
-        output = asyncio.run(add_lat_lng(dataframe, type_file, target_column, to_geojson_file))
-        data = json.dumps(output, ensure_ascii=False, sort_keys=False, indent=4)
-        return data
+        cache = open_geocode_cache()
+        try:
+            output = asyncio.run(add_lat_lng(dataframe, type_file, target_column, to_geojson_file, cache))
+        finally:
+            if cache is not None:
+                cache.close()
+                print("[GEOCODE CACHE]", cache.stats())
+                update_information({"geocodingCache": cache.stats()}, request["ticketId"])
+        return output
 
     except BaseException as e:
         print(e)
         raise Exception(e)
 
 
-def crs_normalise_function(data):
+def crs_normalise_function(data, type_file="geojson"):
     try:
-        if isinstance(data, str):
-            data = custom_json_decoder.decode(data)
-        gdf = convert_crs(data)
-        response = gdf.to_json()
-        return response
+        gdf = convert_crs(to_frame(data, type_file))
+        if gdf is None:
+            raise ValueError("CRS normalization failed.")
+        return gdf
 
     except BaseException as e:
         print(f"Error function crs_normalise_function: {e}")
         raise Exception(e)
 
 
-def convert_address(address):
-    if isinstance(address, str):
-        address = re.sub(r"(\d+)丁目", r"\1-", address)
-        address = re.sub(r"(\d+)番地(\d+号?)", r"\1-\2", address)
-        address = re.sub(r"(\d+)番地$", r"\1", address)
-        address = re.sub(r'-$', '', address)
-    return address
-
-
-def replace_single_katakana(text):
-    single_no_pattern = r'(?<![ｦ-ﾟ])ﾉ(?![ｦ-ﾟ])|(?<![ァ-ン])ノ(?![ァ-ン])'
-    single_ke_pattern = r'(?<![ｦ-ﾟ])ｹ(?![ｦ-ﾟ])|(?<![ァ-ン])ケ(?![ァ-ン])'
-    single_tsu_pattern = r'(?<![ｦ-ﾟ])ﾂ(?![ｦ-ﾟ])|(?<![ァ-ン])ツ(?![ァ-ン])'
-    if isinstance(text, str):
-        text = re.sub(single_no_pattern, "の", text)
-        text = re.sub(single_ke_pattern, "が", text)
-        text = re.sub(single_tsu_pattern, "つ", text)
-    return text
-
-
-def convert_halfwidth_to_fullwidth(text):
-    half_to_full_katakana_map = str.maketrans(
-        "ｦｧｨｩｪｫｬｭｮｯｰｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜﾝﾞﾟ",
-        "ヲァィゥェォャュョッーアイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン゛゜"
-    )
-    if pd.isna(text):
-        return text
-    text = text.translate(half_to_full_katakana_map)
-    text = re.sub(r'(\w゛)', lambda x: chr(ord(x.group(1)[0]) + 1), text)
-    text = re.sub(r'(\w゜)', lambda x: chr(ord(x.group(1)[0]) + 2), text)
-    return text
-
-
-def insert_conditional_column(df, lat_column_name, lng_column_name, longitude, latitude, file_extension, row_index,
-                              output_dict,
-                              to_geojson_file):
-    df.loc[row_index, lat_column_name] = latitude
-    df.loc[row_index, lng_column_name] = longitude
-    if file_extension == "geojson":
-        df.loc[row_index, 'geometry'] = Point(longitude, latitude)
-    if to_geojson_file:
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [longitude, latitude]
-            },
-            "properties": df.loc[row_index].to_dict()
-        }
-        output_dict["features"].append(feature)
-
-
-def prepare_output_format(file_extension, to_geojson_file):
-    output_format = {}
-    if file_extension != "geojson" and to_geojson_file:
-        output_format = {
-            "type": "FeatureCollection",
-            "features": [],
-            "crs": {
-                "type": "name",
-                "properties": {
-                    "name": "urn:ogc:def:crs:EPSG::4326"
-                }
-            }
-        }
+def build_full_address(df: pd.DataFrame, target_column: list) -> pd.Series:
+    """Concatenate the address columns of every row. Missing values are treated as empty strings."""
+    full_address = df[target_column[0]].fillna("").astype(str)
+    for address_col in target_column[1:]:
+        full_address = full_address + df[address_col].fillna("").astype(str)
+    return full_address
 
-    return output_format
 
-
-async def add_lat_lng(df, file_extension: str, target_column: list, to_geojson_file: bool = True) -> list:
+async def add_lat_lng(df, file_extension: str, target_column: list, to_geojson_file: bool = True,
+                      cache=None) -> pd.DataFrame:
     print("GEOCODING: Start add lat lng")
     try:
         df = df.map(lambda x: x.replace('\n', '').replace('\r', '') if isinstance(x, str) else x)
 
-        output = prepare_output_format(file_extension, to_geojson_file)
-
         target_column_index = df.columns.get_loc(target_column[-1])
         lat_column_name = f'{target_column[-1]}{LATITUDE_POSTFIX}'
         lng_column_name = f'{target_column[-1]}{LONGITUDE_POSTFIX}'
-        df.insert(target_column_index + 1, lng_column_name, None)
-        df.insert(target_column_index + 2, lat_column_name, None)
-
-        address = []
-        for index, row in df.iterrows():
-            full_address = ""
-            for address_col in target_column:
-                full_address += row[address_col]
-                if full_address:
-                    address.append({
-                        index: full_address
-                    })
-                else:
-                    print('[ADD LAT LNG] No address found', index, row)
-                    insert_conditional_column(df, lat_column_name, lng_column_name, 0, 0, file_extension, index, output,
-                                              to_geojson_file)
-
-        list_address = [address[i:i + 20] for i in range(0, len(address), 20)]
-        for chunk in list_address:
-            task = [get_lat_lng(row) for row in chunk]
-            results = await asyncio.gather(*task)
-            await asyncio.sleep(5)
-            for result in results:
-                row_index, longitude, latitude = result
-                insert_conditional_column(df, lat_column_name, lng_column_name, longitude, latitude, file_extension,
-                                          row_index,
-                                          output, to_geojson_file)
-
-        if file_extension == "geojson" or not to_geojson_file:
-            output = custom_json_decoder.decode(df.to_json(orient='records', force_ascii=False))
-        return output
+
+        # 同じ住所は一度だけジオコーディングし、結果を該当する全ての行に展開する
+        full_address = build_full_address(df, target_column)
+        codes, unique_addresses = pd.factorize(full_address)
+        no_address = (full_address == "").to_numpy()
+        if no_address.any():
+            print('[ADD LAT LNG] No address found', df.index[no_address].tolist())
+        address = [{code: value} for code, value in enumerate(unique_addresses) if value]
+
+        url = f"{AWS_LOCATION_SERVICE_API_ENDPOINT}{AWS_LOCATION_SERVICE_API_KEY}"
+        async with GeocodingClient(url, cache=cache) as client:
+            results = await client.map(get_lat_lng, address)
+        unique_longitudes = np.zeros(len(unique_addresses))
+        unique_latitudes = np.zeros(len(unique_addresses))
+        for code, longitude, latitude in results:
+            unique_longitudes[code] = longitude
+            unique_latitudes[code] = latitude
+        longitudes = unique_longitudes[codes]
+        latitudes = unique_latitudes[codes]
+
+        df.insert(target_column_index + 1, lng_column_name, longitudes)
+        df.insert(target_column_index + 2, lat_column_name, latitudes)
+        if file_extension == "geojson":
+            # ジオコーディングの結果は WGS84 なので、入力の座標系に変換してから置き換える
+            points = gpd.GeoSeries(gpd.points_from_xy(longitudes, latitudes), index=df.index, crs="EPSG:4326")
+            df['geometry'] = points.to_crs(df.crs) if df.crs is not None else points
+        elif to_geojson_file:
+            df = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(longitudes, latitudes), crs="EPSG:4326")
+        return df
     except Exception as e:
         print(f"Error function add_lat_lng: {e}")
         raise
 
 
-async def get_lat_lng(full_address: dict) -> Tuple[int, float, float]:
+async def get_lat_lng(full_address: dict, client: GeocodingClient) -> Tuple[int, float, float]:
     """Get latitude and longitude from address using AWS Location Service."""
-    async with semaphore:
-        row_index, address = None, None
-        longitude, latitude = 0, 0
-        try:
-            for key, value in full_address.items():
-                address = value
-                row_index = key
-
-            url = f"{AWS_LOCATION_SERVICE_API_ENDPOINT}{AWS_LOCATION_SERVICE_API_KEY}"
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json={"Text": address}) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        result = data.get("Results")
-                        if result:
-                            longitude, latitude = result[0]["Place"]["Geometry"]["Point"]
-                        else:
-                            print('[GET LAT LNG] Cannot get lat lng from AWS', address)
-            return row_index, longitude, latitude
-        except aiohttp.ClientError as e:
-            print(f"Error getting location for {address}: {e}")
-            return row_index, longitude, latitude
-
-
-def remove_z_coordinate(geometry):
-    # ポリゴンの場合
-    if geometry.geom_type == 'Polygon':
-        # 外部リングの座標からZ座標を除去し、新しいポリゴンを作成
-        return Polygon([(x, y) for x, y, *_ in geometry.exterior.coords])
-    # マルチポリゴンの場合
-    elif geometry.geom_type == 'MultiPolygon':
-        new_polygons = []
-        # 各ポリゴンに対してZ座標を除去
-        for poly in geometry.geoms:
-            new_polygons.append(Polygon([(x, y) for x, y, *_ in poly.exterior.coords]))
-        # 新しいマルチポリゴンを作成
-        return MultiPolygon(new_polygons)
-    # その他のジオメトリタイプの場合は変更せずに返す
-    else:
-        return geometry
+    row_index, address = None, None
+    for key, value in full_address.items():
+        address = value
+        row_index = key
+    longitude, latitude = 0, 0
+    coordinates = await client.geocode(address)
+    if coordinates is not None:
+        longitude, latitude = coordinates
+    return row_index, longitude, latitude
 
 
-def convert_crs(data) -> gpd.GeoDataFrame:
-    try:
-        crs_info = None
-        crs_metadata = data.get('crs')
-        if crs_metadata:
-            crs_info = crs_metadata.get('properties', {}).get('name', None)
-        features = data['features']
+@lru_cache(maxsize=32)
+def get_wgs84_transformer(crs_wkt: str) -> Transformer:
+    return Transformer.from_crs(CRS.from_wkt(crs_wkt), CRS.from_epsg(4326), always_xy=True)
 
-        properties = [feature['properties'] for feature in features]
-        geometries = [shape(feature['geometry']) if feature['geometry'] is not None else None for feature in
-                      features]
-        gdf = gpd.GeoDataFrame(properties, geometry=geometries)
-        gdf = gdf[gdf.geometry.notna()]
 
-        if crs_info:
-            gdf.set_crs(crs_info, inplace=True)
-
-        if 'geometry' not in gdf.columns:
-            print("'geometry' column is missing in the input data")
-        else:
-            gdf['geometry'] = gdf['geometry'].apply(
-                lambda wkt_str: wkt.loads(wkt_str) if isinstance(wkt_str, str) else wkt_str)
-
-            gdf['geometry'] = gdf['geometry'].apply(remove_z_coordinate)
+def convert_crs(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+    """
+    Convert the geometries to 2D and to WGS84 (EPSG:4326).
 
-        if gdf.crs is None:
-            gdf.set_crs(epsg=4326, inplace=True)
-        gdf_wgs84 = gdf.to_crs(epsg=4326)
-        return gdf_wgs84
+    Z coordinates are dropped from every geometry type (interior rings are
+    kept), and all the coordinates are transformed in one call with a cached
+    pyproj transformer. Rows without geometry are dropped. A GeoDataFrame
+    without CRS is treated as WGS84.
+    """
+    try:
+        gdf = gdf[gdf.geometry.notna()]
+        geometries = shapely.force_2d(gdf.geometry.values.to_numpy())
+        if gdf.crs is not None and not gdf.crs.equals(4326):
+            transformer = get_wgs84_transformer(gdf.crs.to_wkt())
+            geometries = shapely.transform(
+                geometries, lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1])))
+        return gpd.GeoDataFrame(gdf.drop(columns=gdf.geometry.name), geometry=geometries, crs="EPSG:4326")
     except BaseException as e:
         print(f"Error function convert_crs: {e}")
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -753,11 +456,9 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        client.close()
 
 
 def call_api_endpoint(data, properties, ticketId, apiEndpoint):
@@ -774,7 +475,7 @@ def call_api_endpoint(data, properties, ticketId, apiEndpoint):
         )
         print("request", request)
         time.sleep(5)
-        response = requests.post(apiEndpoint, json=request)
+        response = requests.post(apiEndpoint, data=dumps(request), headers=JSON_HEADERS)
         print("response", response)
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
@@ -3,6 +3,7 @@ import pandas as pd
 from scipy.stats import zscore
 import re
 import datetime
+import warnings
 
 def detect_outliers(df, column, method='iqr', threshold=1.5):
     """
@@ -54,82 +55,334 @@ def detect_outliers(df, column, method='iqr', threshold=1.5):
         'non_outliers': non_outlier_indices
     }
 
-def convert_date_to_gregorian(date_text, output_format="%Y-%m-%d"):
-    # 和暦の「令和」「平成」「昭和」などを西暦に変換
-    era_mapping = {
-        "令和": 2018,  # 令和1年は2019年
-        "平成": 1988,  # 平成1年は1989年
-        "昭和": 1925,  # 昭和1年は1926年
-        "大正": 1911,  # 大正1年は1912年
-        "明治": 1867   # 明治1年は1868年
-    }
+def outlier_bounds(values, method='iqr', threshold=1.5):
+    """
+    Compute the outlier bounds of every column of a 2-D array in one pass.
+
+    Parameters:
+        values (np.ndarray): A 2-D float array (rows x columns), NaN for missing values.
+        method (str): The method to use for detecting outliers ('iqr' or 'zscore').
+        threshold (float): The threshold for detecting outliers (see `detect_outliers`).
+
+    Returns:
+        tuple: Arrays of the lower and upper bounds of each column. The bounds of
+            a column without values are NaN, so that it has no outliers.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        if method == 'iqr':
+            q1, q3 = np.nanpercentile(values, [25, 75], axis=0)
+            iqr = q3 - q1
+            return q1 - threshold * iqr, q3 + threshold * iqr
+        if method == 'zscore':
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0)
+            return mean - threshold * std, mean + threshold * std
+    raise ValueError("Method must be either 'iqr' or 'zscore'.")
+
+
+def outlier_mask(values, lower, upper):
+    """Return a boolean array which is True where a value is outside the bounds of its column."""
+    with np.errstate(invalid="ignore"):
+        return (values < lower) | (values > upper)
+
+
+def numeric_values(df, columns):
+    for column in columns:
+        if column not in df.columns:
+            raise ValueError(f"Column '{column}' does not exist in the DataFrame.")
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            raise ValueError(f"Column '{column}' is not numeric.")
+    return df[columns].to_numpy(dtype="float64", na_value=np.nan)
+
+
+def detect_outliers_batch(df, columns, method='iqr', threshold=1.5):
+    """
+    Detect outliers in several columns of a DataFrame at once.
+
+    Returns:
+        np.ndarray: A boolean array (rows x columns) which is True for outliers.
+    """
+    values = numeric_values(df, columns)
+    lower, upper = outlier_bounds(values, method, threshold)
+    return outlier_mask(values, lower, upper)
+
+
+def mask_outliers(df, columns, method='iqr', threshold=1.5):
+    """Set the outliers of the columns to NaN in place and return the DataFrame."""
+    columns = list(columns)
+    if not columns:
+        return df
+    outliers = detect_outliers_batch(df, columns, method, threshold)
+    return assign_outlier_mask(df, columns, outliers)
 
-    # 日付と時刻の正規表現パターン
-    patterns = [
-        r"(\d{4})年(\d{1,2})月(\d{1,2})日(?:.*?(\d{1,2})時(\d{1,2})分)?",  # 西暦形式
-        r"(令和|平成|昭和|大正|明治)(\d+)年(\d{1,2})月(\d{1,2})日(?:.*?(\d{1,2})時(\d{1,2})分)?",  # 和暦形式
-        r"(R|H|S|T|M)(\d+)年(\d{1,2})月(\d{1,2})日(?:.*?(\d{1,2})時(\d{1,2})分)?"   # 略記和暦形式
-    ]
-    if date_text is None:
+
+def assign_outlier_mask(df, columns, outliers):
+    # 外れ値を含む列だけを書き換える
+    for i in np.flatnonzero(outliers.any(axis=0)):
+        df[columns[i]] = df[columns[i]].mask(outliers[:, i])
+    return df
+
+
+class OutlierStatistics:
+    """
+    Mergeable outlier statistics for inputs read in chunks.
+
+    Call `update` with every chunk (or `merge` statistics computed on other
+    chunks), then `bounds` to get the bounds, and `apply` on every chunk to
+    set its outliers to NaN. For 'zscore', only the count, mean and sum of
+    squared deviations of each column are kept. For 'iqr', the quartiles need
+    every value, so the non-missing values of each column are kept as float
+    arrays.
+    """
+
+    def __init__(self, columns, method='iqr', threshold=1.5):
+        if method not in ('iqr', 'zscore'):
+            raise ValueError("Method must be either 'iqr' or 'zscore'.")
+        self.columns = list(columns)
+        self.method = method
+        self.threshold = threshold
+        self.count = np.zeros(len(self.columns))
+        self.mean = np.zeros(len(self.columns))
+        self.m2 = np.zeros(len(self.columns))
+        self.samples = [[] for _ in self.columns]
+
+    def update(self, df):
+        values = numeric_values(df, self.columns)
+        if self.method == 'zscore':
+            count = np.sum(~np.isnan(values), axis=0)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                mean = np.nan_to_num(np.nanmean(values, axis=0))
+                m2 = np.nansum((values - mean) ** 2, axis=0)
+            self._merge_moments(count, mean, m2)
+        else:
+            for i in range(len(self.columns)):
+                column = values[:, i]
+                self.samples[i].append(column[~np.isnan(column)])
+        return self
+
+    def merge(self, other):
+        if other.columns != self.columns or other.method != self.method:
+            raise ValueError("Cannot merge outlier statistics of different columns or methods.")
+        if self.method == 'zscore':
+            self._merge_moments(other.count, other.mean, other.m2)
+        else:
+            for samples, other_samples in zip(self.samples, other.samples):
+                samples.extend(other_samples)
+        return self
+
+    def _merge_moments(self, count, mean, m2):
+        total = self.count + count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * count / total, 0.0)
+            self.m2 = np.where(total > 0, self.m2 + m2 + delta ** 2 * self.count * count / total, 0.0)
+        self.count = total
+
+    def bounds(self):
+        if self.method == 'zscore':
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.where(self.count > 0, self.mean, np.nan)
+                std = np.sqrt(self.m2 / self.count)
+            return mean - self.threshold * std, mean + self.threshold * std
+
+        lower = np.full(len(self.columns), np.nan)
+        upper = np.full(len(self.columns), np.nan)
+        for i, samples in enumerate(self.samples):
+            data = np.concatenate(samples) if samples else np.empty(0)
+            self.samples[i] = [data]
+            if len(data):
+                q1, q3 = np.percentile(data, [25, 75])
+                iqr = q3 - q1
+                lower[i] = q1 - self.threshold * iqr
+                upper[i] = q3 + self.threshold * iqr
+        return lower, upper
+
+    def apply(self, df, bounds=None):
+        """Set the outliers of a chunk to NaN in place and return it."""
+        lower, upper = bounds if bounds is not None else self.bounds()
+        outliers = outlier_mask(numeric_values(df, self.columns), lower, upper)
+        return assign_outlier_mask(df, self.columns, outliers)
+
+
+# 和暦の「令和」「平成」「昭和」などを西暦に変換するためのオフセット
+ERA_MAPPING = {
+    "令和": 2018,  # 令和1年は2019年
+    "平成": 1988,  # 平成1年は1989年
+    "昭和": 1925,  # 昭和1年は1926年
+    "大正": 1911,  # 大正1年は1912年
+    "明治": 1867   # 明治1年は1868年
+}
+ERA_SHORT_MAPPING = {"R": 2018, "H": 1988, "S": 1925, "T": 1911, "M": 1867}
+
+# 日付と時刻の正規表現パターン
+DATE_PATTERNS = [
+    re.compile(r"(\d{4})年(\d{1,2})月(\d{1,2})日(?:.*?(\d{1,2})時(\d{1,2})分)?"),  # 西暦形式
+    re.compile(r"(令和|平成|昭和|大正|明治)(\d+)年(\d{1,2})月(\d{1,2})日(?:.*?(\d{1,2})時(\d{1,2})分)?"),  # 和暦形式
+    re.compile(r"(R|H|S|T|M)(\d+)年(\d{1,2})月(\d{1,2})日(?:.*?(\d{1,2})時(\d{1,2})分)?")   # 略記和暦形式
+]
+# ISO/西暦の区切り文字形式（2024-01-05, 2024/1/5 12:30 など）
+WESTERN_DATE_PATTERN = re.compile(r"\s*\d{4}[-/.]\d{1,2}[-/.]\d{1,2}(?:[ T]\d{1,2}:\d{1,2}(?::\d{1,2}(?:\.\d+)?)?)?\s*")
+WESTERN_DATE_SEPARATOR_PATTERN = re.compile(r"^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})")
+
+YEAR_NULL_VALUES = ["特に記載なし", "未入力", "不明", "null", "記載なし", "データなし"]
+YEAR_ERA_PATTERNS = [
+    (re.compile(r"令和(\d+)"), 2018),  # 令和
+    (re.compile(r"平成(\d+)"), 1988),  # 平成
+    (re.compile(r"昭和(\d+)"), 1925),  # 昭和
+]
+YEAR_WESTERN_PATTERN = re.compile(r"(\d{4})年")  # 西暦が含まれる場合
+YEAR_NUMBER_PATTERN = re.compile(r"(\d+)年")  # 数字のみの場合（5年など）
+
+
+def convert_date_to_gregorian(date_text, output_format="%Y-%m-%d"):
+    if not isinstance(date_text, str):
         return None
-    for pattern in patterns:
-        match = re.search(pattern, date_text)
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(date_text)
         if match:
             groups = match.groups()
-            if len(groups) >= 4:
-                if groups[0] in era_mapping:  # 和暦形式
-                    era, year, month, day = groups[:4]
-                    year = era_mapping[era] + int(year)
-                elif groups[0] in "RHS":  # 略記和暦
-                    era, year, month, day = groups[:4]
-                    era_mapping_short = {"R": 2018, "H": 1988, "S": 1925}
-                    year = era_mapping_short[era] + int(year)
-                else:  # 西暦形式
-                    year, month, day = groups[:3]
-
-                # 時刻を抽出（デフォルトは 00:00:00）
-                try:
-                    hour = int(groups[4]) if len(groups) > 4 and groups[4] else 0
-                    minute = int(groups[5]) if len(groups) > 5 and groups[5] else 0
-                    if not (0 <= hour < 24) or not (0 <= minute < 60):
-                        raise ValueError
-                except ValueError:
-                    hour, minute = 0, 0  # 不正な時刻は 00:00:00 に設定
-
-                # 日時オブジェクトに変換
+            if groups[0] in ERA_MAPPING:  # 和暦形式
+                era, year, month, day = groups[:4]
+                year = ERA_MAPPING[era] + int(year)
+            elif groups[0] in ERA_SHORT_MAPPING:  # 略記和暦
+                era, year, month, day = groups[:4]
+                year = ERA_SHORT_MAPPING[era] + int(year)
+            else:  # 西暦形式
+                year, month, day = groups[:3]
+
+            # 時刻を抽出（デフォルトは 00:00:00）
+            hour = int(groups[-2]) if groups[-2] else 0
+            minute = int(groups[-1]) if groups[-1] else 0
+            if not (0 <= hour < 24) or not (0 <= minute < 60):
+                hour, minute = 0, 0  # 不正な時刻は 00:00:00 に設定
+
+            # 日時オブジェクトに変換
+            try:
                 dt = datetime.datetime(int(year), int(month), int(day), hour, minute)
-                return dt.strftime(output_format)
+            except ValueError:
+                return None
+            return dt.strftime(output_format)
 
     # 日付が解析できない場合
     return None
 
+
 def convert_to_year(value):
     try:
-        if pd.isna(value) or value in ["特に記載なし", "未入力", "不明", "null", "記載なし", "データなし"]:
+        if pd.isna(value) or value in YEAR_NULL_VALUES:
             return None
         value = str(value).strip()
 
         # 和暦の変換
-        if re.match(r"令和(\d+)年?", value):  # 令和
-            year = int(re.search(r"令和(\d+)", value).group(1))
-            return 2018 + year
-        elif re.match(r"平成(\d+)年?", value):  # 平成
-            year = int(re.search(r"平成(\d+)", value).group(1))
-            return 1988 + year
-        elif re.match(r"昭和(\d+)年?", value):  # 昭和
-            year = int(re.search(r"昭和(\d+)", value).group(1))
-            return 1925 + year
+        for pattern, offset in YEAR_ERA_PATTERNS:
+            match = pattern.match(value)
+            if match:
+                return offset + int(match.group(1))
 
         # 西暦の変換
-        if re.match(r"\d{4}年", value):  # 西暦が含まれる場合
-            return int(re.search(r"(\d{4})年", value).group(1))
+        match = YEAR_WESTERN_PATTERN.match(value)
+        if match:
+            return int(match.group(1))
 
         # 数字のみの場合（5年など）
-        if re.match(r"^\d+年", value):
-            year = int(re.search(r"^(\d+)年", value).group(1))
-            return year
+        match = YEAR_NUMBER_PATTERN.match(value)
+        if match:
+            return int(match.group(1))
 
         # 不明な形式は None
         return None
     except Exception:
         return None
+
+
+def is_western_date(value):
+    return isinstance(value, str) and WESTERN_DATE_PATTERN.fullmatch(value) is not None
+
+
+def parse_western_dates(values: pd.Series) -> pd.Series:
+    """
+    Parse ISO/Western-format date strings with `pd.to_datetime`.
+
+    Parameters:
+        values (pd.Series): Unique date strings which match WESTERN_DATE_PATTERN.
+
+    Returns:
+        pd.Series: Parsed datetimes, NaT for invalid dates.
+    """
+    values = values.str.strip().str.replace(WESTERN_DATE_SEPARATOR_PATTERN, r"\1-\2-\3", regex=True)
+    return pd.to_datetime(values, format="ISO8601", errors="coerce")
+
+
+def map_unique_values(column: pd.Series, parse) -> pd.Series:
+    """
+    Apply `parse` to each distinct value of a column once and broadcast the results back.
+
+    Parameters:
+        column (pd.Series): The column to convert.
+        parse (callable): A function which takes a Series of unique values and returns the converted Series.
+
+    Returns:
+        pd.Series: The converted column. Missing values become None.
+    """
+    codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    values = np.full(len(column), None, dtype=object)
+    if len(uniques):
+        parsed = parse(pd.Series(np.asarray(uniques, dtype=object), dtype=object)).to_numpy(dtype=object)
+        has_value = codes >= 0
+        values[has_value] = parsed[codes[has_value]]
+    return pd.Series(values, index=column.index, name=column.name).infer_objects()
+
+
+def convert_date_column(column: pd.Series, output_format="%Y-%m-%d") -> pd.Series:
+    """
+    Convert a column of dates (和暦 or 西暦) to the Gregorian calendar in `output_format`.
+
+    Each distinct value is parsed once. ISO/Western-format values go through
+    `pd.to_datetime` first, and the others through the 和暦 patterns.
+
+    Parameters:
+        column (pd.Series): The column of dates.
+        output_format (str): The output format of the dates.
+
+    Returns:
+        pd.Series: The converted column. Values which cannot be parsed become None.
+    """
+    def parse(uniques):
+        result = pd.Series(None, index=uniques.index, dtype=object)
+        is_western = uniques.map(is_western_date).astype(bool)
+        if is_western.any():
+            dates = parse_western_dates(uniques[is_western])
+            result[is_western] = dates.dt.strftime(output_format).where(dates.notna(), None)
+        others = ~is_western
+        result[others] = [convert_date_to_gregorian(value, output_format) for value in uniques[others]]
+        return result
+
+    return map_unique_values(column, parse)
+
+
+def convert_year_column(column: pd.Series) -> pd.Series:
+    """
+    Convert a column of years (和暦 or 西暦) to Gregorian years.
+
+    Each distinct value is parsed once. ISO/Western-format dates go through
+    `pd.to_datetime` first, and the others through the 和暦 patterns.
+
+    Parameters:
+        column (pd.Series): The column of years.
+
+    Returns:
+        pd.Series: The converted column. Values which cannot be parsed become None.
+    """
+    def parse(uniques):
+        result = pd.Series(None, index=uniques.index, dtype=object)
+        is_western = uniques.map(is_western_date).astype(bool)
+        if is_western.any():
+            dates = parse_western_dates(uniques[is_western])
+            result[is_western] = dates.dt.year.astype("Int64").astype(object).where(dates.notna(), None)
+        others = ~is_western
+        result[others] = [convert_to_year(value) for value in uniques[others]]
+        return result
+
+    return map_unique_values(column, parse)
@@ -1,26 +1,18 @@
-import mimetypes
 import tempfile
 import time
 from typing import List, Literal, Optional, Any
 
-import magic
-import pandas as pd
 import requests
 from flask import jsonify, make_response
 from datetime import datetime, timezone
 from google.cloud.run_v2 import JobsClient, RunJobRequest, EnvVar
 from pydantic import BaseModel, ValidationError, field_validator
-from pymongo import MongoClient
 import json
 import uuid
 import os
-from urllib.parse import quote_plus
+from status_writer import get_collection, status_writer
+from format_sniffer import sniff_file_format
 
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 PROJECT_ID = os.getenv('PROJECT_ID')
 REGION = os.getenv('REGION')
 DATA_CLEANING_JOB_NAME = os.getenv('DATA_CLEANSING_JOB_NAME')
@@ -128,14 +120,8 @@ def trigger_job(data):
 
 
 def create_ticket_id(data):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
+        collection = get_collection()
         ticketId = str(uuid.uuid4())
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
@@ -154,18 +140,10 @@ def create_ticket_id(data):
     except BaseException as e:
         print(f"error {e}")
         raise ConnectionError(e)
-    finally:
-        client.close()
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -173,16 +151,20 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict, flush=True)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        client.close()
 
 
 # Function get extension file
 def get_extension_file(url):
+    output_file = None
     try:
+        ext_file = get_extention_file_from_url(url)
+        if ext_file["status"]:
+            return ext_file["ext"]
+
+        # Download file
         headers = None
         if CMS_GET_ASSETS_TOKEN:
             headers = {'Authorization': f"Bearer {CMS_GET_ASSETS_TOKEN}"}
@@ -193,65 +175,13 @@ def get_extension_file(url):
                     temp_file.write(chunk)
 
             output_file = temp_file.name
-        ext_file = get_extention_file_from_url(url)
-        if ext_file["status"]:
-            return ext_file["ext"]
-        else:
-            # Download file
-            validator = magic.Magic(uncompress=True, mime=True)
-            file_type = validator.from_file(output_file)
-            extension = mimetypes.guess_extension(file_type, strict=True).replace('.', '')
-
-            if extension and extension != 'txt' or extension == None:
-                return extension
-            else:
-                is_csv = is_csv_file(output_file)
-                if is_csv["status"]:
-                    return is_csv["ext"], output_file
-
-                file = open(output_file, "r", encoding="utf8", errors="ignore")
-                data = file.read()
-                is_json = is_json_file(data)
-                if is_json["status"]:
-                    file.close()
-                    os.remove(output_file)
-                    return is_json["ext"]
-
-                file.close()
-                os.remove(output_file)
-                return 'txt'
+        return sniff_file_format(output_file)
     except BaseException as e:
         print(e)
         return 'txt'
-
-
-def is_json_file(file_data):
-    json_data = None
-    try:
-        json_data = json.loads(file_data)
-        # Check geojson or json
-        if type(json_data) == dict:
-            if (
-                    "type" in json_data
-                    and json_data["type"] == "FeatureCollection"
-                    and "features" in json_data
-                    and type(json_data["features"]) == list
-            ):
-                return {"status": True, "ext": "geojson"}
-            else:
-                return {"status": True, "ext": "json"}
-        else:
-            return {"status": True, "ext": "json"}
-    except BaseException as e:
-        return {"status": False, "ext": ""}
-
-
-def is_csv_file(data):
-    try:
-        pd.read_csv(data)
-        return {"status": True, "ext": "csv"}
-    except Exception as e:
-        return {"status": False, "ext": "not csv"}
+    finally:
+        if output_file is not None and os.path.exists(output_file):
+            os.remove(output_file)
 
 
 def get_extention_file_from_url(url):
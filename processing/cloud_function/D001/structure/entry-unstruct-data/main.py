@@ -1,19 +1,13 @@
 from typing import Any, Dict, List, Literal, Optional
 from google.cloud import run_v2
 from pydantic import BaseModel, Field, ValidationError, field_validator
-from pymongo import MongoClient
 from flask import Response
 from datetime import datetime, timezone
 import json
 import uuid
 import os
-from urllib.parse import quote_plus
+from status_writer import get_collection, status_writer
 
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 OCR_TOPIC = os.getenv('OCR_TOPIC')
 PROJECT_ID = os.getenv('PROJECT_ID')
 REGION = os.getenv('REGION')
@@ -117,13 +111,8 @@ def entry_unstruct_data(request):
 
 
 def create_ticket_id(data):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
+        collection = get_collection()
         ticketId = str(uuid.uuid4())
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
@@ -151,8 +140,6 @@ def create_ticket_id(data):
         print("FAIL SS")
         print(f"error {e}")
         raise ConnectionError(e)
-    finally:
-        client.close()
 
 
 def trigger_job(data):
@@ -192,13 +179,7 @@ def trigger_job(data):
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -206,8 +187,6 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict, flush=True)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        client.close()
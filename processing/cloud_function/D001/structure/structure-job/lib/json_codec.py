@@ -0,0 +1,92 @@
+import datetime
+import decimal
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson がない環境では標準ライブラリで同じ出力にする
+    orjson = None
+
+# requests.post(json=...) の代わりに data=dumps(...) で送るときのヘッダ
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def datetime64_isoformat(values):
+    """
+    Convert datetime64 values (a scalar or an array) to ISO 8601 strings as
+    orjson writes them: to the microsecond, with the time even for dates.
+    NaT becomes None.
+    """
+    values = values.astype("datetime64[us]")
+    if isinstance(values, np.ndarray):
+        return np.frompyfunc(lambda value: None if value is None else value.isoformat(), 1, 1)(
+            values.astype(object)).tolist()
+    value = values.item()
+    return None if value is None else value.isoformat()
+
+
+def default(obj):
+    """Convert the values which JSON does not know (NumPy, pandas, datetime, Decimal)."""
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, np.datetime64):
+        return datetime64_isoformat(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        # tolist() は datetime64[ns] を整数にするので、文字列にしてから変換する
+        return datetime64_isoformat(obj) if obj.dtype.kind == "M" else obj.tolist()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def finite(obj):
+    """Replace NaN and infinity with None in nested dicts and lists, as orjson writes them as null."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [finite(value) for value in obj]
+    return obj
+
+
+def loads(data):
+    """
+    Decode JSON from bytes (or str) into plain dicts and lists.
+
+    Dicts keep the order of the keys in the document, so the result can be
+    used where an OrderedDict decoder was used before.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> bytes:
+    """
+    Encode to UTF-8 JSON bytes.
+
+    NumPy and pandas scalars and arrays, datetimes (ISO 8601) and Decimal
+    are encoded natively. NaN and infinity are written as null, also by the
+    standard library fallback.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+    return json.dumps(finite(obj), default=lambda value: finite(default(value)), ensure_ascii=False,
+                      separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def dumps_str(obj) -> str:
+    """`dumps` for the places which need a str, such as environment variables."""
+    return dumps(obj).decode("utf-8")
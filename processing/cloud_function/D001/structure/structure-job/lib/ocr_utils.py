@@ -1,15 +1,13 @@
 # external imports
-import json
-import mimetypes
+import asyncio
 import os
 from typing import get_args
 
 import aiofiles
-import magic
-import pandas as pd
 import httpx
 
 # internal imports
+from lib.format_sniffer import sniff_file_format
 from lib.ocr_constants import FILE_EXTENSIONS, SOURCE_TYPES
 CMS_GET_ASSETS_TOKEN = os.getenv("CMS_GET_ASSETS_TOKEN", "")
 
@@ -37,58 +35,13 @@ async def get_extension_file(url):
         if ext_file["status"]:
             return ext_file["ext"], output_file
         else:
-            # Download file
-            validator = magic.Magic(uncompress=True, mime=True)
-            file_type = validator.from_file(output_file)
-            extension = mimetypes.guess_extension(file_type, strict=True).replace('.', '')
-
-            if extension and extension != 'txt' or extension == None:
-                return extension, output_file
-            else:
-                is_csv = is_csv_file(output_file)
-                if is_csv["status"]:
-                    return is_csv["ext"], output_file
-                async with aiofiles.open(output_file, mode='r', encoding='utf8', errors='ignore') as file:
-                    data = await file.read()
-
-                is_json = is_json_file(data)
-                if is_json["status"]:
-                    return is_json["ext"], output_file
-                return 'txt', output_file
+            extension = await asyncio.to_thread(sniff_file_format, output_file)
+            return extension, output_file
     except BaseException as e:
         print(e)
         return 'txt', None
 
 
-def is_json_file(file_data):
-    json_data = None
-    try:
-        json_data = json.loads(file_data)
-        # Check geojson or json
-        if type(json_data) == dict:
-            if (
-                    "type" in json_data
-                    and json_data["type"] == "FeatureCollection"
-                    and "features" in json_data
-                    and type(json_data["features"]) == list
-            ):
-                return {"status": True, "ext": "geojson"}
-            else:
-                return {"status": True, "ext": "json"}
-        else:
-            return {"status": True, "ext": "json"}
-    except BaseException as e:
-        return {"status": False, "ext": ""}
-
-
-def is_csv_file(data):
-    try:
-        pd.read_csv(data)
-        return {"status": True, "ext": "csv"}
-    except Exception as e:
-        return {"status": False, "ext": "not csv"}
-
-
 def get_extention_file_from_url(url):
     arr_file_url = url.split('/')
     file_name = arr_file_url[len(arr_file_url) - 1]
@@ -9,27 +9,21 @@ from typing import Type
 
 import httpx
 from botocore.exceptions import ClientError
-from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field, create_model
-from pymongo import MongoClient
 
 from ai_ocr.utils import get_config, aload_documents
 from lib.llm_utils import aextract_from_doc_ocr
 from lib.ocr_types import RequestBody
 from lib.ocr_utils import confirm_request, get_extension_file
+from lib.status_writer import async_status_writer, status_writer
+from lib.json_codec import JSON_HEADERS, dumps, loads
 import signal
-from urllib.parse import quote_plus
 
 semaphore = asyncio.Semaphore(20)
 # Retrieve Job-defined env vars
 TASK_INDEX = os.getenv("CLOUD_RUN_TASK_INDEX", 0)
 TASK_ATTEMPT = os.getenv("CLOUD_RUN_TASK_ATTEMPT", 0)
 # Retrieve User-defined env vars
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 CMS_GET_ASSETS_TOKEN = os.getenv("CMS_GET_ASSETS_TOKEN", "")
 DMS_DATA = os.getenv("DMS_DATA", "")
 TICKET_ID=None
@@ -55,13 +49,7 @@ def handle_timeout(signum, frame):
     sys.exit(1)
 
 async def update_information(data, ticketId):
-    client = None
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = AsyncIOMotorClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -69,23 +57,14 @@ async def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        result = await collection.update_one({"_id": ticketId, "files.fileId": merged_dict['fileId']},
-                                             {"$set": {"files.$": merged_dict}})
-        print(f"Result update file: {merged_dict['fileId']}", result)
+        await async_status_writer.update({"_id": ticketId, "files.fileId": merged_dict['fileId']},
+                                         {"files.$": merged_dict})
+        print(f"Update file: {merged_dict['fileId']}")
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        if client:
-            client.close()
 
 def update_information_total(data, ticketId):
-    client = None
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -93,12 +72,9 @@ def update_information_total(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        if client:
-            client.close()
 
 
 async def doc_ocr(data, extension):
@@ -190,7 +166,7 @@ async def call_api_endpoint(data, ticketId, fileId, apiEndpoint, confidence, sug
         })
         print("Process done, call api endpoint")
         async with httpx.AsyncClient() as client:
-            response = await client.post(apiEndpoint.strip(), json=request)
+            response = await client.post(apiEndpoint.strip(), content=dumps(request), headers=JSON_HEADERS)
         print("response", response)
     except httpx.HTTPStatusError as http_err:
         print(f"HTTP error occurred: {http_err}")
@@ -412,7 +388,7 @@ async def main():
             env_data += os.getenv(f"DMS_DATA_{i}", "")
     json_data = env_data
     if json_data:
-        data = json.loads(json_data)
+        data = loads(json_data)
         global TICKET_ID
         TICKET_ID = data["ticketId"]
         print("[DMS_DATA]", data)
@@ -432,6 +408,7 @@ async def main():
     else:
         print("No data provided")
 
+    await async_status_writer.flush()
     print(f"Completed Task #{TASK_INDEX}.")
 
 
@@ -0,0 +1,219 @@
+import mimetypes
+import os
+import re
+import zipfile
+from io import BytesIO
+
+import magic
+import pandas as pd
+
+# 先頭から読むバイト数（マジックバイトと CSV の判定に使う）
+SNIFF_PREFIX_BYTES = int(os.getenv("SNIFF_PREFIX_BYTES", 64 * 1024))
+# JSON と GeoJSON を見分けるために走査する最大バイト数
+SNIFF_JSON_MAX_BYTES = int(os.getenv("SNIFF_JSON_MAX_BYTES", 1024 * 1024))
+SNIFF_BLOCK_BYTES = 64 * 1024
+
+UTF8_BOM = b"\xef\xbb\xbf"
+ZIP_SIGNATURES = (b"PK\x03\x04", b"PK\x05\x06")
+PDF_SIGNATURE = b"%PDF-"
+
+JSON_STRUCTURE_PATTERN = re.compile(rb'["{}\[\]:,]')
+# 判定に関係しない深さでは区切り文字を読み飛ばす
+JSON_NESTED_PATTERN = re.compile(rb'["{}\[\]]')
+JSON_STRING_PATTERN = re.compile(rb'"((?:[^"\\]|\\.)*)"', re.DOTALL)
+
+GEOJSON = "geojson"
+JSON = "json"
+
+
+class JsonSniffer:
+    """
+    Incremental JSON tokenizer which tells GeoJSON from JSON.
+
+    Only the structure of the document is tracked (a stack of containers and
+    the current key of each object), so the memory used does not depend on
+    the size of the input, except for a string cut at the end of a block.
+    `feed` returns 'geojson' or 'json' once the format is known, and None
+    while more input is needed. A ValueError is raised when the input is not
+    JSON.
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.keys = []
+        self.expect_key = []
+        self.pending = b""
+        self.has_feature_collection_type = False
+        self.has_features = False
+        self.in_first_feature = False
+        self.has_first_feature = False
+
+    def feed(self, data: bytes):
+        buffer = self.pending + data
+        self.pending = b""
+        position = 0
+        while True:
+            pattern = JSON_NESTED_PATTERN if len(self.stack) > 2 and not self.in_first_feature \
+                else JSON_STRUCTURE_PATTERN
+            match = pattern.search(buffer, position)
+            if match is None:
+                return None
+            token = match.group(0)
+            position = match.end()
+            if token == b'"':
+                string = JSON_STRING_PATTERN.match(buffer, match.start())
+                if string is None:
+                    # 文字列がブロックの境界で切れているので次のブロックと結合する
+                    self.pending = buffer[match.start():]
+                    return None
+                position = string.end()
+                result = self._on_string(string.group(1))
+            elif token in b"{[":
+                result = self._on_open(token)
+            elif token in b"}]":
+                result = self._on_close(token)
+            elif token == b":":
+                result = None
+            else:
+                if self.stack and self.stack[-1] == b"{":
+                    self.expect_key[-1] = True
+                result = None
+            if result is not None:
+                return result
+
+    def _on_string(self, value: bytes):
+        if not self.stack:
+            raise ValueError("The top-level value is not an object or an array.")
+        if self.stack[-1] == b"{" and self.expect_key[-1]:
+            self.keys[-1] = value
+            self.expect_key[-1] = False
+            return None
+        depth = len(self.stack)
+        key = self.keys[-1]
+        if depth == 1 and key == b"type" and value == b"FeatureCollection":
+            self.has_feature_collection_type = True
+        if self.in_first_feature and depth == 3 and key == b"type" and value == b"Feature":
+            self.has_first_feature = True
+        return self._decide()
+
+    def _on_open(self, token: bytes):
+        depth = len(self.stack)
+        if depth == 0 and token == b"[":
+            return JSON
+        if depth == 1 and token == b"[" and self.keys[-1] == b"features":
+            self.has_features = True
+        if depth == 2 and token == b"{" and self.stack == [b"{", b"["] and self.keys[0] == b"features":
+            self.in_first_feature = True
+        self.stack.append(token)
+        self.keys.append(None)
+        self.expect_key.append(token == b"{")
+        return self._decide()
+
+    def _on_close(self, token: bytes):
+        if not self.stack or (self.stack[-1] == b"{") != (token == b"}"):
+            raise ValueError("Unbalanced brackets.")
+        if len(self.stack) == 3 and self.in_first_feature:
+            self.in_first_feature = False
+        self.stack.pop()
+        self.keys.pop()
+        self.expect_key.pop()
+        if not self.stack:
+            return GEOJSON if self.has_feature_collection_type and self.has_features else JSON
+        return None
+
+    def _decide(self):
+        if self.has_feature_collection_type and self.has_features:
+            return GEOJSON
+        return None
+
+    def close(self):
+        """
+        Return the format when the input ends (or the scan limit is reached)
+        before it is known. The "type" key may come after a long "features"
+        array, so a first "Feature" is taken as GeoJSON then.
+        """
+        if not self.stack:
+            raise ValueError("The input is not JSON.")
+        return GEOJSON if self.has_feature_collection_type or self.has_first_feature else JSON
+
+
+def sniff_json(file, prefix: bytes):
+    """Return 'geojson' or 'json' by scanning at most SNIFF_JSON_MAX_BYTES, or None when it is not JSON."""
+    sniffer = JsonSniffer()
+    scanned = 0
+    block = prefix
+    try:
+        while block:
+            result = sniffer.feed(block)
+            if result is not None:
+                return result
+            scanned += len(block)
+            if scanned >= SNIFF_JSON_MAX_BYTES:
+                break
+            block = file.read(SNIFF_BLOCK_BYTES)
+        return sniffer.close()
+    except ValueError:
+        return None
+
+
+def is_csv_prefix(prefix: bytes, truncated: bool) -> bool:
+    """Whether the complete lines of the prefix can be read as CSV."""
+    if truncated:
+        end = prefix.rfind(b"\n")
+        if end > 0:
+            prefix = prefix[:end + 1]
+    try:
+        pd.read_csv(BytesIO(prefix))
+        return True
+    except Exception:
+        return False
+
+
+def sniff_zip(file_path: str) -> str:
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = archive.namelist()
+    except zipfile.BadZipFile:
+        return "zip"
+    for prefix, extension in (("xl/", "xlsx"), ("word/", "docx"), ("ppt/", "pptx")):
+        if any(name.startswith(prefix) for name in names):
+            return extension
+    return "zip"
+
+
+def guess_extension_with_magic(file_path: str) -> str:
+    validator = magic.Magic(uncompress=True, mime=True)
+    file_type = validator.from_file(file_path)
+    extension = mimetypes.guess_extension(file_type, strict=True)
+    return extension.replace('.', '') if extension else 'txt'
+
+
+def sniff_file_format(file_path: str) -> str:
+    """
+    Detect the format of a downloaded file from its content.
+
+    Zip (xlsx, docx, pptx), PDF, JSON and GeoJSON are detected from the magic
+    bytes and a bounded prefix of the file, in constant memory. Other files
+    are detected with libmagic, and plain text is 'csv' when the complete
+    lines of the prefix can be read as CSV, or 'txt' otherwise.
+    """
+    with open(file_path, "rb") as file:
+        prefix = file.read(SNIFF_PREFIX_BYTES)
+        if prefix.startswith(ZIP_SIGNATURES):
+            return sniff_zip(file_path)
+        if prefix.startswith(PDF_SIGNATURE):
+            return "pdf"
+
+        text = prefix[len(UTF8_BOM):] if prefix.startswith(UTF8_BOM) else prefix
+        if text.lstrip()[:1] in (b"{", b"["):
+            extension = sniff_json(file, text)
+            if extension is not None:
+                return extension
+
+    # libmagic も先頭部分しか読まない
+    extension = guess_extension_with_magic(file_path)
+    if extension != 'txt':
+        return extension
+    if is_csv_prefix(prefix, len(prefix) == SNIFF_PREFIX_BYTES):
+        return "csv"
+    return "txt"
@@ -3,10 +3,9 @@ from datetime import datetime
 import requests
 from rdflib import Graph, URIRef, Literal, RDF
 from rdflib.namespace import DCAT, DC, FOAF, XSD, DCTERMS
-import magic
-import mimetypes
 import tempfile
 import os
+from format_sniffer import sniff_file_format
 
 # JWT Token For Download File
 CMS_GET_ASSETS_TOKEN = os.getenv('CMS_GET_ASSETS_TOKEN', None)
@@ -179,10 +178,8 @@ def get_extension_file(url):
         if ext_file["status"]:
             return output_file_path, ext_file["ext"]
         else:
-            validator = magic.Magic(uncompress=True, mime=True)
-            file_type = validator.from_file(output_file_path)
-            extension = mimetypes.guess_extension(file_type, strict=True).replace('.', '')
-            if extension and extension == 'xlsx':
+            extension = sniff_file_format(output_file_path)
+            if extension == 'xlsx':
                 return output_file_path, extension
             return output_file_path, 'txt'
     except BaseException as e:
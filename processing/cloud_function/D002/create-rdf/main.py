@@ -4,18 +4,12 @@ from typing import Literal, Optional
 import uuid
 from collections import OrderedDict
 from flask import jsonify, make_response
-from pymongo import MongoClient
 from datetime import datetime, timezone
 from pydantic import BaseModel, ValidationError, field_validator
 from google.cloud.run_v2 import JobsClient, RunJobRequest, EnvVar
 from handle_create_rdf import handle_create_rdf, get_extension_file
-from urllib.parse import quote_plus
+from status_writer import get_collection, status_writer
 
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 PROJECT_ID = os.getenv('PROJECT_ID')
 REGION = os.getenv('REGION')
 CREATE_RDF_JOB_NAME = os.getenv('CREATE_RDF_JOB_NAME')
@@ -128,13 +122,8 @@ def trigger_job(data):
 
 
 def create_ticket_id(data):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
+        collection = get_collection()
         ticketId = str(uuid.uuid4())
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
@@ -152,18 +141,10 @@ def create_ticket_id(data):
     except BaseException as e:
         print(f"error {e}")
         raise ConnectionError(e)
-    finally:
-        client.close()
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -171,8 +152,6 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict, flush=True)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        client.close()
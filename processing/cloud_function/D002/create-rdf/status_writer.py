@@ -0,0 +1,162 @@
+import asyncio
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote_plus
+
+from pymongo import MongoClient, UpdateOne
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # motor は非同期のジョブでのみ使う
+    AsyncIOMotorClient = None
+
+MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
+PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
+USER_AUTH = os.getenv('USER_AUTH')
+MONGO_DB = os.getenv('MONGO_DB')
+MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
+
+# 同じチケット（ファイル）への更新をまとめて書き込むまでの最大待ち時間
+STATUS_FLUSH_INTERVAL_SECONDS = float(os.getenv("STATUS_FLUSH_INTERVAL_SECONDS", 1))
+# この process の更新は待たずにすぐ書き込む
+FLUSH_PROCESSES = ("Completed", "Failed")
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def mongo_uri() -> str:
+    escaped_user = quote_plus(USER_AUTH or "")
+    escaped_password = quote_plus(PASSWORD_MONGODB or "")
+    return MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@")
+
+
+def get_mongo_client() -> MongoClient:
+    """Return the pooled MongoClient of this process, created on first use."""
+    key = ("sync", os.getpid())
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = MongoClient(mongo_uri())
+        return _clients[key]
+
+
+def get_collection():
+    return get_mongo_client()[MONGO_DB][MONGO_COLLECTION]
+
+
+def get_async_collection():
+    """Return the collection of the pooled AsyncIOMotorClient of the running event loop."""
+    key = ("async", os.getpid(), id(asyncio.get_running_loop()))
+    if key not in _clients:
+        _clients[key] = AsyncIOMotorClient(mongo_uri())
+    return _clients[key][MONGO_DB][MONGO_COLLECTION]
+
+
+def _filter_key(query: dict):
+    return tuple(sorted(query.items()))
+
+
+def _merge_update(pending: OrderedDict, query: dict, fields: dict):
+    key = _filter_key(query)
+    if key in pending:
+        pending[key][1].update(fields)
+    else:
+        pending[key] = (dict(query), dict(fields))
+
+
+def _is_final(fields: dict) -> bool:
+    documents = [fields] + [value for value in fields.values() if isinstance(value, dict)]
+    return any(document.get("process") in FLUSH_PROCESSES for document in documents)
+
+
+def _to_requests(pending: OrderedDict) -> list:
+    return [UpdateOne(query, {"$set": fields}) for query, fields in pending.values()]
+
+
+class StatusWriter:
+    """
+    Write ticket status updates through the pooled client.
+
+    Successive `$set` updates with the same filter are merged (later values
+    win, as with sequential updates) and written together with one
+    `bulk_write` at most `flush_interval` seconds later. Updates which set a
+    final process, or which are made with `flush=True`, are written at once
+    with everything pending. Pending updates are also written on exit.
+    """
+
+    def __init__(self, flush_interval: float = STATUS_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        self.pending = OrderedDict()
+        self.lock = threading.RLock()
+        self.timer = None
+
+    def update(self, query: dict, fields: dict, flush: bool = False):
+        with self.lock:
+            _merge_update(self.pending, query, fields)
+            if flush or self.flush_interval <= 0 or _is_final(fields):
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            pending, self.pending = self.pending, OrderedDict()
+            if not pending:
+                return
+            try:
+                get_collection().bulk_write(_to_requests(pending), ordered=True)
+            except BaseException as e:
+                print(f"error {e}")
+
+
+class AsyncStatusWriter:
+    """`StatusWriter` for async callers, writing with the pooled AsyncIOMotorClient."""
+
+    def __init__(self, flush_interval: float = STATUS_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        self.pending = OrderedDict()
+        self.timer = None
+
+    async def update(self, query: dict, fields: dict, flush: bool = False):
+        _merge_update(self.pending, query, fields)
+        if flush or self.flush_interval <= 0 or _is_final(fields):
+            await self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, lambda: asyncio.ensure_future(self.flush())
+            )
+
+    async def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending = self.pending, OrderedDict()
+        if not pending:
+            return
+        try:
+            await get_async_collection().bulk_write(_to_requests(pending), ordered=True)
+        except BaseException as e:
+            print(f"error {e}")
+
+
+status_writer = StatusWriter()
+async_status_writer = AsyncStatusWriter()
+
+
+@atexit.register
+def flush_on_exit():
+    status_writer.flush()
+    # イベントループの終了後に残った非同期の更新は同期のクライアントで書き込む
+    pending, async_status_writer.pending = async_status_writer.pending, OrderedDict()
+    if pending:
+        try:
+            get_collection().bulk_write(_to_requests(pending), ordered=True)
+        except BaseException as e:
+            print(f"error {e}")
@@ -0,0 +1,234 @@
+import copy
+import os
+import re
+
+import geopandas as gpd
+import pandas as pd
+
+from json_codec import loads
+from projected_reader import convert_default_dates
+
+try:
+    from pyogrio.raw import open_arrow
+    import pyarrow  # noqa: F401  open_arrow(use_pyarrow=True) に必要
+except ImportError:  # pyogrio / pyarrow がない環境ではファイル全体を1つのバッチとして読む
+    open_arrow = None
+
+# 1バッチの大きさ（JSON はバイト数、その他のファイルはレコード数）。ピークメモリはこれとグループ数で決まる
+CROSS_BATCH_BYTES = int(os.getenv("CROSS_BATCH_BYTES", 8 * 1024 * 1024))
+CROSS_BATCH_ROWS = int(os.getenv("CROSS_BATCH_ROWS", 200_000))
+
+COUNT_COLUMN = "__count__"
+
+SEPARATORS = b" \t\r\n,"
+# レコードの終わりの候補（"}" の後に "," と次のレコードの "{" が続く位置）
+RECORD_BOUNDARY = re.compile(rb"\}\s*,\s*\{")
+
+
+def iter_json_batches(path: str, columns: list, batch_bytes: int = CROSS_BATCH_BYTES):
+    """
+    Read the `columns` of a JSON array of records in DataFrames of about
+    `batch_bytes` of the file each.
+
+    The array is cut after the last complete record of the buffer, and each
+    batch is decoded once. The values are those of `pd.read_json(dtype=object)`
+    on the batch. A document which is not an array is read at once.
+    """
+    missing = set(columns)
+    with open(path, "rb") as file:
+        buffer = file.read(batch_bytes).lstrip()
+        if not buffer.startswith(b"["):
+            file.seek(0)
+            yield pd.read_json(file, dtype=object)[columns]
+            return
+        buffer = buffer[1:]
+        while True:
+            chunk = file.read(batch_bytes)
+            if not chunk:
+                break
+            records, buffer = split_records(buffer + chunk)
+            if records:
+                missing.difference_update(set().union(*records))
+                yield convert_default_dates(pd.DataFrame(records, columns=columns).astype(object))
+
+        buffer = buffer.rstrip()
+        if not buffer.endswith(b"]"):
+            raise ValueError("JSON の配列が閉じられていません。")
+        records = loads(b"[" + buffer[:-1].lstrip(SEPARATORS) + b"]")
+        if records:
+            missing.difference_update(set().union(*records))
+            yield convert_default_dates(pd.DataFrame(records, columns=columns).astype(object))
+    # ファイル全体を読んだ場合と同じく、どのレコードにもない項目はエラーにする
+    if missing:
+        raise KeyError(sorted(missing))
+
+
+def record_ends(buffer: bytes):
+    """Yield the candidate ends of records in the buffer, from the last one: a "}" followed by ",{"."""
+    end = len(buffer)
+    while True:
+        end = buffer.rfind(b"}", 0, end)
+        if end < 0:
+            return
+        if RECORD_BOUNDARY.match(buffer, end):
+            yield end + 1
+
+
+def split_records(buffer: bytes):
+    """
+    Decode the complete records at the start of the buffer, and return them
+    with the rest of the buffer.
+
+    A candidate end inside a string or a nested array of objects does not
+    decode, and the previous one is tried.
+    """
+    for end in record_ends(buffer):
+        try:
+            return loads(b"[" + buffer[:end].lstrip(SEPARATORS) + b"]"), buffer[end:]
+        except ValueError:
+            pass
+    return [], buffer
+
+
+def iter_file_batches(path: str, columns: list, batch_rows: int = CROSS_BATCH_ROWS):
+    """Read the attributes of a vector file in DataFrames of at most `batch_rows` rows, without the geometry."""
+    if open_arrow is None:
+        yield gpd.read_file(path)
+        return
+    with open_arrow(path, columns=columns, read_geometry=False, batch_size=batch_rows,
+                    use_pyarrow=True) as (_, reader):
+        for batch in reader:
+            yield batch.to_pandas()
+
+
+class CrossTabAccumulator:
+    """
+    Mergeable partial aggregates of `cross_tabulation`.
+
+    Batches are added one at a time; only the counts of each (key fields,
+    count fields) combination and n / count / sum / sum of squares of each
+    numeric field per key are kept, so the memory is proportional to the
+    number of groups rather than rows. Accumulators of disjoint parts of the
+    input can be merged. Means and the Total margins are computed by
+    `result`.
+    """
+
+    def __init__(self, key_fields: list, fields: list):
+        self.key_fields = list(key_fields)
+        self.count_fields = [field["name"] for field in fields if field.get("cnt", False)]
+        self.numeric_fields = {}
+        for field in fields:
+            aggregations = []
+            if field.get("sum", False):
+                aggregations.append("sum")
+            if field.get("avg", False):
+                aggregations.append("mean")
+            if aggregations:
+                self.numeric_fields[field["name"]] = aggregations
+        self.counts = None
+        self.stats = None
+
+    @property
+    def columns(self) -> list:
+        """The input columns which the aggregates use."""
+        return list(dict.fromkeys(self.key_fields + self.count_fields + list(self.numeric_fields)))
+
+    def add(self, df: pd.DataFrame):
+        for field_name in self.numeric_fields:
+            df[field_name] = pd.to_numeric(df[field_name], errors="coerce")
+
+        if self.count_fields:
+            counts = df.groupby(self.key_fields + self.count_fields, sort=False).size()
+            self.counts = merge_partials([self.counts, counts])
+
+        if self.numeric_fields:
+            # 数値フィールドごとの途中集計: 数値に変換できた件数, 合計, 二乗和と、キーごとの行数
+            values = {}
+            for field_name in self.numeric_fields:
+                value = df[field_name]
+                values[(field_name, "count")] = value.notna().astype("int64")
+                value = value.fillna(0)
+                values[(field_name, "sum")] = value
+                values[(field_name, "sumsq")] = value.astype("float64") ** 2
+            grouped = pd.DataFrame(values).groupby([df[key_field] for key_field in self.key_fields], sort=False)
+            stats = grouped.sum()
+            stats[("", "n")] = grouped.size()
+            self.stats = merge_partials([self.stats, stats])
+
+    def empty(self) -> "CrossTabAccumulator":
+        """Return an accumulator of the same fields without aggregates."""
+        part = copy.copy(self)
+        part.counts = None
+        part.stats = None
+        return part
+
+    def merge(self, *others: "CrossTabAccumulator"):
+        self.counts = merge_partials([self.counts] + [other.counts for other in others])
+        self.stats = merge_partials([self.stats] + [other.stats for other in others])
+
+    def split(self, partitions: int) -> list:
+        """
+        Split the aggregates into `partitions` accumulators by the hash of the
+        key fields, so that a key is in the same partition whichever batch it
+        comes from.
+        """
+        parts = [self.empty() for _ in range(partitions)]
+        for name in ("counts", "stats"):
+            partial = getattr(self, name)
+            if partial is None:
+                continue
+            keys = pd.DataFrame({level: partial.index.get_level_values(level)
+                                 for level in range(len(self.key_fields))})
+            ids = pd.util.hash_pandas_object(keys, index=False).to_numpy() % partitions
+            for partition, part in enumerate(parts):
+                setattr(part, name, partial[ids == partition])
+        return parts
+
+    def result(self):
+        """Return the crosstab and the numeric aggregates in the form of `cross_tabulation`."""
+        cross_tab = []
+        numeric_aggregates = []
+
+        if self.counts is not None and len(self.counts):
+            counts = self.counts.rename(COUNT_COLUMN).reset_index()
+            cross_tab = pd.crosstab([counts[key_field] for key_field in self.key_fields],
+                                    [counts[count_field] for count_field in self.count_fields],
+                                    values=counts[COUNT_COLUMN], aggfunc="sum",
+                                    margins=True, margins_name="Total").fillna(0).astype("int64")
+
+        if self.stats is not None and len(self.stats):
+            # キーは一意なので groupby は並べ替えるだけ。sort_index と違い、数値と文字列が
+            # 混ざったキーも df.groupby(key_fields) と同じ順に並ぶ
+            stats = self.stats.groupby(level=list(range(len(self.key_fields)))).sum()
+            aggregates = {}
+            for field_name, aggregations in self.numeric_fields.items():
+                for aggregation in aggregations:
+                    if aggregation == "sum":
+                        aggregates[(field_name, "sum")] = stats[(field_name, "sum")]
+                    else:
+                        aggregates[(field_name, "avg")] = stats[(field_name, "sum")] / stats[("", "n")]
+            numeric_aggregates = pd.DataFrame(aggregates).reset_index()
+
+        return cross_tab, numeric_aggregates
+
+
+def merge_partials(partials: list):
+    """Add partial aggregates (Series or DataFrames indexed by the group keys), ignoring None."""
+    partials = [partial for partial in partials if partial is not None]
+    if len(partials) <= 1:
+        return partials[0] if partials else None
+    levels = list(range(partials[0].index.nlevels))
+    return pd.concat(partials).groupby(level=levels, sort=False).sum()
+
+
+def chunked_cross_tabulation(path: str, file_extension: str, key_fields: list, fields: list,
+                             batch_bytes: int = CROSS_BATCH_BYTES, batch_rows: int = CROSS_BATCH_ROWS):
+    """`cross_tabulation` which reads only the used columns of the input, one batch at a time."""
+    accumulator = CrossTabAccumulator(key_fields, fields)
+    if file_extension == "json":
+        batches = iter_json_batches(path, accumulator.columns, batch_bytes)
+    else:
+        batches = iter_file_batches(path, accumulator.columns, batch_rows)
+    for batch in batches:
+        accumulator.add(batch)
+    return accumulator.result()
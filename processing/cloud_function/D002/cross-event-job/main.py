@@ -1,25 +1,20 @@
 import sys
 import json
 import time
+import numpy as np
 import pandas as pd
-import geopandas as gpd
 import os
-from pymongo import MongoClient
 from datetime import datetime, timezone
 import requests
-from json import JSONDecoder
 from collections import OrderedDict
-import magic
-import mimetypes
 import tempfile
-from urllib.parse import quote_plus
+from status_writer import status_writer
+from json_codec import JSON_HEADERS, dumps, loads
+from format_sniffer import sniff_file_format
+from chunked_crosstab import chunked_cross_tabulation
+from parallel_crosstab import parallel_cross_tabulation
+from projected_reader import read_json_frame, read_vector_frame
 
-custom_json_decoder = JSONDecoder(object_pairs_hook=OrderedDict)
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 
 # Retrieve Job-defined env vars
 TASK_INDEX = os.getenv("CLOUD_RUN_TASK_INDEX", 0)
@@ -30,13 +25,30 @@ DMS_DATA = os.getenv("DMS_DATA", "")
 # JWT Token For Download File
 CMS_GET_ASSETS_TOKEN = os.getenv('CMS_GET_ASSETS_TOKEN', None)
 
+# 結果の形式（records: 行ごとのオブジェクトの配列, columnar: 列ごとの配列とキーの辞書）
+OUTPUT_FORMAT_RECORDS = 'records'
+OUTPUT_FORMAT_COLUMNAR = 'columnar'
 
-def cross_tabulation(input, file_extension, key_fields, fields):
+# このサイズ以上の入力はバッチごとに読みながら集計する（リクエストの "chunked": true でも指定できる）
+CROSS_CHUNKED_MIN_BYTES = int(os.getenv("CROSS_CHUNKED_MIN_BYTES", 1024 * 1024 * 1024))
+# このサイズ以上の入力は CPU コア数のプロセスで集計する（0 は無効）。速くなることを複数コアの
+# bench_cross_parallel.py で確認するまでは既定で無効にし、リクエストの "parallel": true でのみ使う
+CROSS_PARALLEL_MIN_BYTES = int(os.getenv("CROSS_PARALLEL_MIN_BYTES", 0))
+
+
+def cross_tabulation(input, file_extension, key_fields, fields, chunked=False, parallel=False):
     try:
+        if parallel:
+            return parallel_cross_tabulation(input, file_extension, key_fields, fields)
+        if chunked:
+            return chunked_cross_tabulation(input, file_extension, key_fields, fields)
+
+        # 集計に使う列だけを、型を推定して読み込む（ジオメトリは読まない）
+        input_columns = list(dict.fromkeys(key_fields + [field['name'] for field in fields]))
         if (file_extension == 'json'):
-            df = pd.read_json(input, dtype=object)
+            df = read_json_frame(input, input_columns, dtype=None)
         else:
-            df = gpd.read_file(input)
+            df = read_vector_frame(input, input_columns, read_geometry=False)
         agg_dict = {}
         columns = []
         cross_tab = []
@@ -79,14 +91,23 @@ def cross_tabulation(input, file_extension, key_fields, fields):
 
 def convert_numeric_agg_to_json(data, key_fields):
     try:
+        # 行ごとに MultiIndex を引かずに、列単位で値を取り出してからレコードを作る
+        columns = []
+        for col in data.columns.levels[0]:
+            if col in key_fields:
+                columns.append((col, None, data[(col, '')].tolist()))
+            else:
+                aggs = list(data[col].columns)
+                columns.append((col, aggs, [data[(col, agg)].tolist() for agg in aggs]))
+
         result = []
-        for _, row in data.iterrows():
+        for position in range(len(data)):
             record = {}
-            for col in data.columns.levels[0]:
-                if col in key_fields:
-                    record[col] = row[col]['']
+            for col, aggs, values in columns:
+                if aggs is None:
+                    record[col] = values[position]
                 else:
-                    record[col] = {agg: row[(col, agg)] for agg in data[col].columns}
+                    record[col] = {agg: agg_values[position] for agg, agg_values in zip(aggs, values)}
             result.append(record)
 
         return result
@@ -94,55 +115,126 @@ def convert_numeric_agg_to_json(data, key_fields):
         raise Exception(f"Error function convert_numeric_agg_to_json: {e}")
 
 
+def flatten_column_name(col) -> str:
+    name = "_".join(col)
+    return name[:-1] if name.endswith("_") else name
+
+
+def flatten_crosstab(cross_tab: pd.DataFrame) -> pd.DataFrame:
+    """Join the MultiIndex column names of the crosstab with '_' and move the keys to columns."""
+    if isinstance(cross_tab.columns, pd.MultiIndex):
+        cross_tab_cl = [flatten_column_name(col) for col in cross_tab.columns]
+        cross_tab_column_group_name = ""
+        if cross_tab.columns.names:
+            cross_tab_column_group_name = "_".join(cross_tab.columns.names)
+        cross_tab.columns = cross_tab_cl
+        if cross_tab_column_group_name:
+            cross_tab.columns.names = [cross_tab_column_group_name]
+    return cross_tab.reset_index()
+
+
+def flatten_numeric_aggregates(numeric_aggregates: pd.DataFrame) -> pd.DataFrame:
+    numeric_aggregates.columns = [flatten_column_name(col) for col in numeric_aggregates.columns]
+    return numeric_aggregates
+
+
+def frame_to_columnar(frame: pd.DataFrame, key_fields: list) -> dict:
+    """
+    Convert an aggregated frame to the columnar format: one array per
+    column, in `columns` order. The key columns are dictionary encoded, with
+    the distinct values in `keys` and their codes in `data`. Arrays are
+    passed as NumPy arrays, which the JSON codec writes without creating a
+    Python object per value.
+    """
+    data = OrderedDict()
+    keys = OrderedDict()
+    for name in frame.columns:
+        values = frame[name]
+        if name in key_fields:
+            codes, uniques = pd.factorize(values)
+            keys[name] = uniques.tolist()
+            data[name] = codes
+        else:
+            data[name] = np.ascontiguousarray(values.to_numpy())
+    return OrderedDict({
+        'length': len(frame),
+        'columns': list(frame.columns),
+        'keys': keys,
+        'data': data
+    })
+
+
+def aggregate_to_output(frame, key_fields: list, output_format: str):
+    if output_format == OUTPUT_FORMAT_COLUMNAR:
+        if frame is None:
+            frame = pd.DataFrame()
+        return frame_to_columnar(frame, key_fields), frame.iloc[:1].to_dict(orient='records')
+    if frame is None:
+        return [], []
+    records = frame.to_dict(orient='records', into=OrderedDict())
+    return records, records
+
+
+def crosstab_key_paths(labels: pd.Index, drop_none: bool = False) -> list:
+    """
+    Return the path of nested keys of each label of the crosstab index or
+    columns, built from the level codes.
+    """
+    if isinstance(labels, pd.MultiIndex):
+        levels = [level.tolist() for level in labels.levels]
+        codes = [level_codes.tolist() for level_codes in labels.codes]
+        keys = [[level[code] if code >= 0 else None for code in level_codes]
+                for level, level_codes in zip(levels, codes)]
+        return [tuple(key for key in path if not (drop_none and key is None)) for path in zip(*keys)]
+    return [(key,) for key in labels.tolist()]
+
+
+def drop_empty_keys(path: tuple, run: int = 0) -> tuple:
+    """
+    Leave out the empty keys (the margins of the lower levels) of a key path
+    the way the crosstab JSON has always nested them: in a run of empty keys
+    the first, third, ... are left out, so their values go to the parent
+    level, and the others are kept. `run` is the number of empty keys just
+    before the path. Return the path and the number of empty keys at its end.
+    """
+    kept = []
+    for key in path:
+        if key != "":
+            run = 0
+            kept.append(key)
+            continue
+        run += 1
+        if run % 2 == 0:
+            kept.append(key)
+    return tuple(kept), run
+
+
 def crosstab_to_json(crosstab):
     try:
         result = {}
-
-        # Determine the level of indexes and columns
-        index_levels = list(crosstab.index.names)
-        column_levels = list(crosstab.columns.names)
-
-        # Handling index levels
-        for index in crosstab.index:
-            current_level = result
-            if isinstance(index, tuple):
-                for level, name in zip(index_levels, index):
-                    if name not in current_level:
-                        current_level[name] = {}
-                    current_level = current_level[name]
-            else:
-                if index not in current_level:
-                    current_level[index] = {}
-                current_level = current_level[index]
-
-            # Handling the case where there is only one level for columns
-            if len(column_levels) == 1:
-                for column in crosstab.columns:
-                    if column not in current_level:
-                        current_level[column] = {}
-                    current_level[column]['count'] = int(crosstab.loc[index, column])
-            else:
-                for column in crosstab.columns:
-                    col_keys = [key for key in column if key is not None]
-                    col_level = current_level
-
-                    for key in col_keys:
-                        if key not in col_level:
-                            col_level[key] = {}
-                        col_level = col_level[key]
-
-                    col_level['count'] = int(crosstab.loc[index, column])
-
-        # Remove empty key if exists
-        def clean_empty_keys(d):
-            if "" in d:
-                empty_key_data = d.pop("")
-                d.update(empty_key_data)
-            for key, value in d.items():
-                if isinstance(value, dict):
-                    clean_empty_keys(value)
-
-        clean_empty_keys(result)
+        row_paths = [drop_empty_keys(path) for path in crosstab_key_paths(crosstab.index)]
+        column_keys = crosstab_key_paths(crosstab.columns, drop_none=True)
+        # 列のパスは直前の行のパスの末尾にある空のキーの数（偶数・奇数）で変わる
+        column_paths = [[drop_empty_keys(path, run)[0] for path in column_keys] for run in (0, 1)]
+        counts = crosstab.to_numpy(dtype="int64").tolist()
+
+        # 1パスでネストした辞書を作る
+        for (row_path, run), row_counts in zip(row_paths, counts):
+            row_level = result
+            for key in row_path:
+                child = row_level.get(key)
+                if child is None:
+                    child = row_level[key] = {}
+                row_level = child
+
+            for column_path, count in zip(column_paths[run % 2], row_counts):
+                col_level = row_level
+                for key in column_path:
+                    child = col_level.get(key)
+                    if child is None:
+                        child = col_level[key] = {}
+                    col_level = child
+                col_level['count'] = count
 
         return result
     except BaseException as e:
@@ -153,44 +245,34 @@ def cross_event(request_data):
     ticket_id = None
     output_file_path = None
     try:
-        req = custom_json_decoder.decode(request_data)
+        req = loads(request_data)
 
         ticket_id = req["ticketId"]
         input_file = req['input']
         key_fields = req['keyFields']
         fields = req['fields']
         api_endpoint = req['apiEndpoint']
+        output_format = req.get('outputFormat', OUTPUT_FORMAT_RECORDS)
+        if output_format not in (OUTPUT_FORMAT_RECORDS, OUTPUT_FORMAT_COLUMNAR):
+            raise ValueError(f"outputFormat は '{OUTPUT_FORMAT_RECORDS}' または '{OUTPUT_FORMAT_COLUMNAR}' を指定してください。")
 
         output_file_path, file_extension = get_extension_file(input_file)
         if output_file_path is None:
             raise Exception("ファイルをダウンロードできませんでした。")
         input_file = output_file_path
+        input_size = os.path.getsize(input_file)
+        chunked = req.get('chunked', False) or input_size >= CROSS_CHUNKED_MIN_BYTES
+        parallel = req.get('parallel', False) or 0 < CROSS_PARALLEL_MIN_BYTES <= input_size
 
         # クロス集計の実行
-        cross_tab, numeric_aggregates = cross_tabulation(input_file, file_extension, key_fields, fields)
-        crosstab_json = []
-        if len(cross_tab):
-            if isinstance(cross_tab.columns, pd.MultiIndex):
-                cross_tab_cl = ["_".join(col) if not "_".join(col).endswith("_") else "_".join(col)[:-1] for col in
-                                cross_tab.columns]
-                cross_tab_column_group_name = ""
-                if cross_tab.columns.names:
-                    cross_tab_column_group_name = "_".join(cross_tab.columns.names)
-                cross_tab.columns = cross_tab_cl
-                if cross_tab_column_group_name:
-                    cross_tab.columns.names = [cross_tab_column_group_name]
-            new_cross_tab_df = cross_tab.reset_index()
-            cross_tab_ordered_dict = OrderedDict()
-            crosstab_json = new_cross_tab_df.to_dict(orient='records', into=cross_tab_ordered_dict)
-
-        numeric_aggregates_result = []
-        if len(numeric_aggregates):
-            numeric_aggregates_cl = ["_".join(col) if not "_".join(col).endswith("_") else "_".join(col)[:-1] for col in
-                                     numeric_aggregates.columns]
-            numeric_aggregates.columns = numeric_aggregates_cl
-            numeric_aggregates_ordered_dict = OrderedDict()
-            numeric_aggregates_result = numeric_aggregates.to_dict(orient='records',
-                                                                   into=numeric_aggregates_ordered_dict)
+        cross_tab, numeric_aggregates = cross_tabulation(input_file, file_extension, key_fields, fields, chunked,
+                                                         parallel)
+        crosstab_frame = flatten_crosstab(cross_tab) if len(cross_tab) else None
+        numeric_aggregates_frame = flatten_numeric_aggregates(numeric_aggregates) if len(numeric_aggregates) else None
+
+        crosstab_json, crosstab_sample = aggregate_to_output(crosstab_frame, key_fields, output_format)
+        numeric_aggregates_result, numeric_aggregates_sample = aggregate_to_output(
+            numeric_aggregates_frame, key_fields, output_format)
 
         json_result = OrderedDict(
             {
@@ -199,7 +281,7 @@ def cross_event(request_data):
             }
         )
 
-        schema = generate_schema(numeric_aggregates_result, crosstab_json)
+        schema = generate_schema(numeric_aggregates_sample, crosstab_sample, output_format)
 
         call_api_endpoint(json_result, schema, ticket_id, api_endpoint)
         update_information({"process": "Completed", "message": "処理が成功しました。"}, ticket_id)
@@ -217,21 +299,23 @@ def cross_event(request_data):
             os.remove(output_file_path)
 
 
-def generate_schema(numeric_aggregates_result, crosstab_json):
+def generate_schema(numeric_aggregates_result, crosstab_json, output_format=None):
     try:
+        # columnar の場合も列の型は先頭のレコードから判定する
+        data_type = 'columnar' if output_format == OUTPUT_FORMAT_COLUMNAR else 'array'
         schema = OrderedDict({
             'type': 'object',
             'properties': {
                 'countData':
                     {
                         'name': 'countData',
-                        'type': 'array',
+                        'type': data_type,
                         'properties': generate_properties(numeric_aggregates_result)
                     },
                 'crossTabData':
                     {
                         'name': 'crossTabData',
-                        'type': 'array',
+                        'type': data_type,
                         'properties': generate_properties(crosstab_json)
                     }
             }
@@ -312,7 +396,7 @@ def call_api_endpoint(data, schema, ticketId, api_endpoint):
         })
         print(f'request {request}')
         time.sleep(5)
-        response = requests.post(api_endpoint, json=request)
+        response = requests.post(api_endpoint, data=dumps(request), headers=JSON_HEADERS)
         print("response", response)
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
@@ -321,13 +405,7 @@ def call_api_endpoint(data, schema, ticketId, api_endpoint):
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -335,11 +413,9 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        client.close()
 
 def get_extension_file(url):
     try:
@@ -349,26 +425,7 @@ def get_extension_file(url):
         if ext_file["status"]:
             return output_file_path, ext_file["ext"]
         else:
-            validator = magic.Magic(uncompress=True, mime=True)
-            file_type = validator.from_file(output_file_path)
-            extension = mimetypes.guess_extension(file_type, strict=True).replace('.', '')
-
-            if extension and extension != 'txt' or extension == None:
-                return output_file_path, extension
-            else:
-                is_csv = is_csv_file(output_file_path)
-                if is_csv["status"]:
-                    return output_file_path, is_csv["ext"]
-
-                file = open(output_file_path, "r", encoding="utf8", errors="ignore")
-                data = file.read()
-                is_json = is_json_file(data)
-                if is_json["status"]:
-                    file.close()
-                    return output_file_path, is_json["ext"]
-
-                file.close()
-                return output_file_path, 'txt'
+            return output_file_path, sniff_file_format(output_file_path)
     except BaseException as e:
         print(e)
         return None, 'txt'
@@ -393,35 +450,6 @@ def download_file(url):
 
     return output_file_path
 
-def is_json_file(file_data):
-    json_data = None
-    try:
-        json_data = json.loads(file_data)
-        # Check geojson or json
-        if type(json_data) == dict:
-            if (
-                    "type" in json_data
-                    and json_data["type"] == "FeatureCollection"
-                    and "features" in json_data
-                    and type(json_data["features"]) == list
-            ):
-                return {"status": True, "ext": "geojson"}
-            else:
-                return {"status": True, "ext": "json"}
-        else:
-            return {"status": True, "ext": "json"}
-    except BaseException as e:
-        return {"status": False, "ext": ""}
-
-
-def is_csv_file(data):
-    try:
-        pd.read_csv(data)
-        return {"status": True, "ext": "csv"}
-    except Exception as e:
-        return {"status": False, "ext": "not csv"}
-
-
 def get_extention_file_from_url(url):
     arr_file_url = url.split('/')
     file_name = arr_file_url[len(arr_file_url) - 1]
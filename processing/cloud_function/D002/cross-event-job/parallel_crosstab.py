@@ -0,0 +1,231 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+
+import pandas as pd
+
+from chunked_crosstab import (CROSS_BATCH_BYTES, CROSS_BATCH_ROWS, SEPARATORS, CrossTabAccumulator,
+                              chunked_cross_tabulation, record_ends)
+from json_codec import loads
+from projected_reader import convert_default_dates
+
+try:
+    import pyarrow as pa
+    from pyogrio.raw import open_arrow
+except ImportError:  # pyogrio / pyarrow がない環境では1プロセスで集計する
+    pa = None
+
+CROSS_MAX_WORKERS = int(os.getenv("CROSS_MAX_WORKERS", os.cpu_count() or 1))
+# パーティションごとの途中集計がこの数たまったら、ワーカーでまとめてメモリを抑える
+CROSS_MERGE_FAN_IN = int(os.getenv("CROSS_MERGE_FAN_IN", 16))
+
+JSON = "json"
+ARROW = "arrow"
+
+
+class RecordBoundaryError(Exception):
+    """A batch of the JSON array was not cut at the end of a record."""
+
+
+def is_json_array(path: str) -> bool:
+    with open(path, "rb") as file:
+        return file.read(4096).lstrip().startswith(b"[")
+
+
+def iter_json_chunks(path: str, batch_bytes: int = CROSS_BATCH_BYTES):
+    """
+    Yield the JSON array of records in byte ranges of about `batch_bytes`,
+    cut at the last candidate end of a record without decoding them.
+    """
+    with open(path, "rb") as file:
+        buffer = file.read(batch_bytes).lstrip()[1:]
+        while True:
+            chunk = file.read(batch_bytes)
+            if not chunk:
+                break
+            buffer += chunk
+            end = next(record_ends(buffer), None)
+            if end is not None:
+                yield buffer[:end]
+                buffer = buffer[end:]
+
+        buffer = buffer.rstrip()
+        if not buffer.endswith(b"]"):
+            raise ValueError("JSON の配列が閉じられていません。")
+        yield buffer[:-1]
+
+
+def iter_arrow_chunks(path: str, columns: list, batch_rows: int = CROSS_BATCH_ROWS):
+    """Yield the attributes of a vector file as Arrow record batches of `batch_rows` rows, without the geometry."""
+    with open_arrow(path, columns=columns, read_geometry=False, batch_size=batch_rows,
+                    use_pyarrow=True) as (_, reader):
+        yield from reader
+
+
+def write_arrow_stream(batch, sink):
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+
+
+def to_shared_memory(chunk, kind: str) -> tuple:
+    """
+    Write a batch (bytes of the JSON array, or an Arrow record batch as an
+    IPC stream) to a new shared memory segment. Return the segment and the
+    size of the data.
+    """
+    if kind == ARROW:
+        # 大きさを数えてから、IPC ストリームを共有メモリに直接書く（中間のバッファを作らない）
+        mock = pa.MockOutputStream()
+        write_arrow_stream(chunk, mock)
+        size = mock.size()
+    else:
+        size = len(chunk)
+    segment = SharedMemory(create=True, size=max(size, 1))
+    try:
+        if kind == ARROW:
+            sink = pa.FixedSizeBufferWriter(pa.py_buffer(segment.buf))
+            write_arrow_stream(chunk, sink)
+            sink.close()
+            del sink
+        else:
+            segment.buf[:size] = memoryview(chunk).cast("B")
+    except BaseException:
+        segment.close()
+        segment.unlink()
+        raise
+    return segment, size
+
+
+def read_arrow_frame(view) -> pd.DataFrame:
+    """
+    Read an Arrow IPC stream from shared memory without copying it. The
+    DataFrame owns its data, so the segment can be closed afterwards.
+    """
+    with pa.ipc.open_stream(pa.py_buffer(view)) as reader:
+        table = reader.read_all()
+    return table.to_pandas()
+
+
+def aggregate_batch(name: str, size: int, kind: str, accumulator: CrossTabAccumulator, partitions: int):
+    """
+    Parse and aggregate one batch in a worker. Returns the partial aggregates
+    split into `partitions` by key, and the used columns found in the batch.
+    """
+    columns = accumulator.columns
+    segment = SharedMemory(name=name)
+    try:
+        if kind == ARROW:
+            # 変換が終わるまで共有メモリを開いたままにして、コピーせずに読む
+            frame = read_arrow_frame(segment.buf[:size])
+            found = set(frame.columns)
+        else:
+            data = bytes(segment.buf[:size])
+    finally:
+        segment.close()
+
+    if kind == JSON:
+        try:
+            records = loads(b"[" + data.lstrip(SEPARATORS) + b"]")
+        except ValueError as e:
+            raise RecordBoundaryError(str(e))
+        del data
+        frame = convert_default_dates(pd.DataFrame(records, columns=columns).astype(object))
+        found = set().union(*records)
+
+    accumulator = accumulator.empty()
+    accumulator.add(frame)
+    return accumulator.split(partitions), found & set(columns)
+
+
+def merge_partition(partition: int, accumulators: list):
+    """Merge the partial aggregates of one partition in a worker."""
+    merged = accumulators[0].empty()
+    merged.merge(*accumulators)
+    return partition, merged
+
+
+def parallel_cross_tabulation(path: str, file_extension: str, key_fields: list, fields: list,
+                              workers: int = CROSS_MAX_WORKERS, batch_bytes: int = CROSS_BATCH_BYTES,
+                              batch_rows: int = CROSS_BATCH_ROWS):
+    """
+    `cross_tabulation` run in a process pool.
+
+    The parent only cuts the input into batches: byte ranges of the JSON
+    array, or Arrow record batches of other vector files, which are written
+    as IPC streams straight into shared memory and read there by the workers
+    without a copy. The workers parse and aggregate the batches.
+    The partial aggregates are hash partitioned by the key fields and merged
+    per partition in the pool. The partitions hold disjoint keys, so they are
+    concatenated and the Total margins are computed over all of them.
+    """
+    accumulator = CrossTabAccumulator(key_fields, fields)
+    if workers <= 1 or pa is None:
+        return chunked_cross_tabulation(path, file_extension, key_fields, fields, batch_bytes, batch_rows)
+
+    if file_extension == "json":
+        if not is_json_array(path):
+            return chunked_cross_tabulation(path, file_extension, key_fields, fields, batch_bytes, batch_rows)
+        chunks, kind = iter_json_chunks(path, batch_bytes), JSON
+    else:
+        chunks, kind = iter_arrow_chunks(path, accumulator.columns, batch_rows), ARROW
+
+    try:
+        partitions, found = run_partitioned(chunks, kind, accumulator, workers)
+    except RecordBoundaryError as e:
+        # 文字列の中で区切った場合は、レコードを確かめながら読む1プロセスの集計でやり直す
+        print(f"[CROSS] Cannot split the JSON records ({e}), aggregating in one process")
+        return chunked_cross_tabulation(path, file_extension, key_fields, fields, batch_bytes, batch_rows)
+
+    missing = set(accumulator.columns) - found
+    if missing:
+        raise KeyError(sorted(missing))
+    accumulator.merge(*partitions)
+    return accumulator.result()
+
+
+def run_partitioned(chunks, kind: str, accumulator: CrossTabAccumulator, workers: int):
+    """Run the batches and the partition merges in a process pool, see `parallel_cross_tabulation`."""
+    pending = {}
+    partials = [[] for _ in range(workers)]
+    found = set()
+
+    def collect(futures):
+        for future in futures:
+            segment = pending.pop(future)
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+            result = future.result()
+            if segment is None:
+                partition, merged = result
+                partials[partition].append(merged)
+            else:
+                parts, batch_found = result
+                found.update(batch_found)
+                for partition, part in enumerate(parts):
+                    partials[partition].append(part)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for chunk in chunks:
+                segment, size = to_shared_memory(chunk, kind)
+                future = executor.submit(aggregate_batch, segment.name, size, kind, accumulator, workers)
+                pending[future] = segment
+                # 読み込みがワーカーより先に進みすぎないように、処理中のバッチ数を抑える
+                while len(pending) >= 2 * workers:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                for partition, parts in enumerate(partials):
+                    if len(parts) >= CROSS_MERGE_FAN_IN:
+                        pending[executor.submit(merge_partition, partition, parts)] = None
+                        partials[partition] = []
+            while pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+
+            final = [executor.submit(merge_partition, partition, parts)
+                     for partition, parts in enumerate(partials) if parts]
+            return [future.result()[1] for future in final], found
+        finally:
+            for segment in pending.values():
+                if segment is not None:
+                    segment.close()
+                    segment.unlink()
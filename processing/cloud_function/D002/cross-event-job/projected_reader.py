@@ -0,0 +1,73 @@
+from io import StringIO
+
+import geopandas as gpd
+import pandas as pd
+
+from json_codec import dumps_str, loads
+
+
+def is_default_date_column(name) -> bool:
+    """Whether `pd.read_json` converts the column to datetimes by default (keep_default_dates)."""
+    if not isinstance(name, str):
+        return False
+    name = name.lower()
+    return (name.endswith(("_at", "_time")) or name in ("modified", "date", "datetime")
+            or name.startswith("timestamp"))
+
+
+def frame_from_records(records: list, columns: list = None, dtype=object) -> pd.DataFrame:
+    """
+    Build the DataFrame which `pd.read_json(dtype=dtype)` returns for a list
+    of records, keeping only `columns` (those not found in any record are
+    left out).
+
+    With dtype=None the inferred dtypes (int64, float64, bool, ...) are kept
+    instead of object.
+    """
+    if columns is not None:
+        found = set().union(*records) if records else set()
+        columns = [column for column in columns if column in found]
+    frame = pd.DataFrame(records, columns=columns)
+    if dtype is not None:
+        frame = frame.astype(dtype)
+    return convert_default_dates(frame, dtype)
+
+
+def convert_default_dates(frame: pd.DataFrame, dtype=object) -> pd.DataFrame:
+    """Convert the date-like columns as `pd.read_json` does, by running it on their values only."""
+    date_columns = [column for column in frame.columns if is_default_date_column(column)]
+    if date_columns:
+        # 標準ライブラリの JSON では NaN を書けないので null にする
+        dates = frame[date_columns].astype(object)
+        dates = dates.where(dates.notna(), None)
+        converted = pd.read_json(StringIO(dumps_str({"columns": date_columns, "data": dates.to_numpy().tolist()})),
+                                 orient="split", dtype=dtype if dtype is not None else True)
+        for column in date_columns:
+            values = converted[column].set_axis(frame.index)
+            frame[column] = values if dtype is None else values.astype(dtype)
+    return frame
+
+
+def read_json_frame(path: str, columns: list = None, dtype=object) -> pd.DataFrame:
+    """
+    Read a JSON array of records like `pd.read_json(path, dtype=dtype)`, but
+    decode it with the JSON codec and build only the `columns` which the
+    request uses. Other documents are read by `pd.read_json`.
+    """
+    with open(path, "rb") as file:
+        records = loads(file.read())
+    if not isinstance(records, list):
+        del records
+        frame = pd.read_json(path, dtype=dtype if dtype is not None else True)
+        return frame if columns is None else frame[[column for column in columns if column in frame.columns]]
+    return frame_from_records(records, columns, dtype)
+
+
+def read_vector_frame(path: str, columns: list = None, read_geometry: bool = True) -> pd.DataFrame:
+    """
+    Read a vector file like `gpd.read_file`, only with the `columns`
+    attributes. Without the geometry a DataFrame is returned.
+    """
+    if columns is None:
+        return gpd.read_file(path, ignore_geometry=not read_geometry)
+    return gpd.read_file(path, columns=columns, ignore_geometry=not read_geometry)
@@ -3,8 +3,6 @@ import pandas as pd
 import geopandas as gpd
 import time
 from collections import OrderedDict
-from pymongo import MongoClient
-from json import JSONDecoder
 from datetime import datetime, timezone
 import requests
 import tempfile
@@ -13,16 +11,11 @@ import json
 import uuid
 import re
 import sys
-import magic
-import mimetypes
-from urllib.parse import quote_plus
+from status_writer import status_writer
+from json_codec import JSON_HEADERS, dumps, loads
+from format_sniffer import sniff_file_format
+from projected_reader import read_json_frame
 
-custom_json_decoder = JSONDecoder(object_pairs_hook=OrderedDict)
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 
 MASKING_ID_POSTFIX = 'ID'
 MASKING_ADDRESS_POSTFIX = '_秘匿化'
@@ -42,7 +35,7 @@ def masking_data_event(request_data):
     ticket_id = None
     output_file_path = None
     try:
-        req = custom_json_decoder.decode(request_data)
+        req = loads(request_data)
         input_file = req['input']
         api_endpoint = req['apiEndpoint']
         option = req['option']
@@ -54,8 +47,8 @@ def masking_data_event(request_data):
 
         if file_extension == 'json' or file_extension == 'geojson':
             data, data_ranking = handle_masking_data(input_file, file_extension, option)
-            schema = generate_schema(data)
-            json_data = json.loads(data)
+            json_data = loads(data)
+            schema = generate_schema(json_data)
 
             call_api_endpoint(json_data, data_ranking, schema, ticket_id, api_endpoint)
             update_information({"process": "Completed", "message": "処理が成功しました。"}, ticket_id)
@@ -128,7 +121,8 @@ def handle_ranking(opt, field_name, rank_col):
 
 def get_input_data(input_file, file_extension):
     if file_extension == 'json':
-        df = pd.read_json(input_file, dtype=object)
+        # 全列を出力するので列は絞らず、pd.read_json(dtype=object) と同じ値で速く読む
+        df = read_json_frame(input_file)
     else:
         df = gpd.read_file(input_file)
     return df
@@ -176,7 +170,7 @@ def handle_masking_data(input_file, file_extension, option):
             masked_cols = pd.DataFrame(masked_cols)
             df = pd.concat([df, masked_cols], axis=1)
         df = df[cols_order]
-        json_data = df.to_json(force_ascii=False, orient='records', indent=4)
+        json_data = df.to_json(force_ascii=False, orient='records')
         return json_data, data_ranking
     except Exception as e:
         print(e)
@@ -261,11 +255,11 @@ def deviation_val(data, old_column):
     return new_column, deviation
 
 
-def generate_schema(masking_data_json):
+def generate_schema(masking_data):
     try:
         schema = OrderedDict({
             'type': 'array',
-            'properties': generate_properties(custom_json_decoder.decode(masking_data_json))
+            'properties': generate_properties(masking_data)
         })
         return schema
     except BaseException as e:
@@ -344,7 +338,7 @@ def call_api_endpoint(data, data_ranking, schema, ticketId, api_endpoint):
         })
         print(f'request {request}')
         time.sleep(5)
-        response = requests.post(api_endpoint, json=request)
+        response = requests.post(api_endpoint, data=dumps(request), headers=JSON_HEADERS)
         print("response", response)
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
@@ -353,13 +347,7 @@ def call_api_endpoint(data, data_ranking, schema, ticketId, api_endpoint):
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -367,11 +355,9 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        client.close()
 
 
 def get_extension_file(url):
@@ -382,23 +368,7 @@ def get_extension_file(url):
         if ext_file["status"]:
             return output_file_path, ext_file["ext"]
         else:
-            validator = magic.Magic(uncompress=True, mime=True)
-            file_type = validator.from_file(output_file_path)
-            extension = mimetypes.guess_extension(file_type, strict=True).replace('.', '')
-
-            if extension and extension != 'txt' or extension == None:
-                return output_file_path, extension
-            else:
-
-                file = open(output_file_path, "r", encoding="utf8", errors="ignore")
-                data = file.read()
-                is_json = is_json_file(data)
-                if is_json["status"]:
-                    file.close()
-                    return output_file_path, is_json["ext"]
-
-                file.close()
-                return output_file_path, 'txt'
+            return output_file_path, sniff_file_format(output_file_path)
     except BaseException as e:
         print(e)
         return None, 'txt'
@@ -424,25 +394,6 @@ def download_file(url):
     return output_file_path
 
 
-def is_json_file(file_data):
-    try:
-        json_data = json.loads(file_data)
-        if type(json_data) == dict:
-            if (
-                    "type" in json_data
-                    and json_data["type"] == "FeatureCollection"
-                    and "features" in json_data
-                    and type(json_data["features"]) == list
-            ):
-                return {"status": True, "ext": "geojson"}
-            else:
-                return {"status": True, "ext": "json"}
-        else:
-            return {"status": True, "ext": "json"}
-    except BaseException as e:
-        return {"status": False, "ext": ""}
-
-
 def get_extention_file_from_url(url):
     arr_file_url = url.split('/')
     file_name = arr_file_url[len(arr_file_url) - 1]
@@ -1,22 +1,16 @@
 import sys
 import os
-from io import BytesIO
 import time
-from pymongo import MongoClient
 from datetime import datetime, timezone
 import geopandas as gpd
 import requests
 import json
-from json import JSONDecoder
 from collections import OrderedDict
-from urllib.parse import quote_plus
-custom_json_decoder = JSONDecoder(object_pairs_hook=OrderedDict)
+from status_writer import status_writer
+from json_codec import JSON_HEADERS, dumps, loads
+from asset_cache import read_asset_frame
+from concurrent_loader import load_concurrently
 
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 
 # Retrieve Job-defined env vars
 TASK_INDEX = os.getenv("CLOUD_RUN_TASK_INDEX", 0)
@@ -30,14 +24,14 @@ CMS_GET_ASSETS_TOKEN = os.getenv('CMS_GET_ASSETS_TOKEN', None)
 def spatial_aggregate_event(request_data):
     ticket_id = None
     try:
-        request = custom_json_decoder.decode(request_data)
+        request = loads(request_data)
 
         ticket_id = request["ticketId"]
         summarizedGdf = process_spatial(request)
         if len(summarizedGdf) == 0:
             raise ValueError("ポイントとポリゴンをマージする際にデータが存在しません。")
         summarize_json = summarizedGdf.to_json()
-        data = custom_json_decoder.decode(summarize_json)
+        data = loads(summarize_json)
         properties = generate_properties(data)
 
         call_api_endpoint(data, properties, ticket_id, request["apiEndpoint"])
@@ -56,8 +50,13 @@ def spatial_aggregate_event(request_data):
 
 def process_spatial(request):
     try:
-        polygon = load_and_process_data(request["inputLeft"], is_left_file=True)
-        point = load_and_process_data(request["inputRight"], is_left_file=False)
+        # 左右の入力のダウンロードと読み込みを並行して行う
+        inputs = load_concurrently({
+            "inputLeft": lambda: load_and_process_data(request["inputLeft"], is_left_file=True),
+            "inputRight": lambda: load_and_process_data(request["inputRight"], is_left_file=False),
+        })
+        polygon = inputs["inputLeft"]
+        point = inputs["inputRight"]
         key_field = request["keyFields"]
         updated_keys = []
 
@@ -198,21 +197,19 @@ def load_and_process_data(file_path, is_input_data_1=True, is_left_file=True):
 
 def read_geojson(path: str, **kwargs) -> gpd.GeoDataFrame:
     try:
-         # Download file
-        headers = {
-            'Authorization': f'Bearer {CMS_GET_ASSETS_TOKEN}'
-        }
-
-        if not CMS_GET_ASSETS_TOKEN:
-            response = requests.get(path)
-        else:
-            response = requests.get(path, headers=headers)
-            
-        response.raise_for_status()
-        bytesIo = BytesIO(response.content)
-
-        gdf = gpd.read_file(bytesIo, **kwargs)
-        return gdf
+        # Download file
+        headers = None
+        if CMS_GET_ASSETS_TOKEN:
+            headers = {
+                'Authorization': f'Bearer {CMS_GET_ASSETS_TOKEN}'
+            }
+
+        def read(file_path):
+            with open(file_path, "rb") as file:
+                return gpd.read_file(file, **kwargs)
+
+        # 同じ参照データは解析済みの GeoParquet をキャッシュから読む
+        return read_asset_frame(path, read, f"gpd.read_file:{sorted(kwargs.items())}", headers)
     except BaseException as e:
         print(f"ファイル {path} の読み込み中にエラーが発生しました: {e}")
         return None
@@ -230,7 +227,7 @@ def call_api_endpoint(data, properties, ticketId, apiEndpoint):
         })
         print(f"request {request}")
         time.sleep(5)
-        response = requests.post(apiEndpoint, json=request)
+        response = requests.post(apiEndpoint, data=dumps(request), headers=JSON_HEADERS)
         print("response", response)
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
@@ -305,13 +302,7 @@ def generate_properties(data):
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -319,11 +310,9 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        client.close()
 
 # Define main script
 def main():
@@ -0,0 +1,335 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import geopandas as gpd
+import pandas as pd
+import requests
+
+try:
+    import pyarrow  # noqa: F401  Parquet の読み書きに使う
+except ImportError:
+    pyarrow = None
+
+# キャッシュは ASSET_CACHE_DIR を指定したときだけ使う。Cloud Run の /tmp はメモリ上にあり実行ごとに消えるので、
+# 永続ディスクか Filestore（NFS）をマウントしたディレクトリを指定すること。Cloud Storage FUSE は
+# ファイルロックがないので、SQLite の索引が壊れることがある
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", "")
+ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", 4 * 1024 * 1024 * 1024))
+ASSET_DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("ASSET_DOWNLOAD_TIMEOUT_SECONDS", 300))
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+# WAL は共有メモリを使うので、1台のマシンのローカルディスクでのみ指定できる。NFS では DELETE のままにすること
+ASSET_CACHE_JOURNAL_MODE = os.getenv("ASSET_CACHE_JOURNAL_MODE", "DELETE")
+
+RAW = "raw"
+
+
+class AssetCache:
+    """
+    Content-addressed on-disk cache of downloaded assets.
+
+    Files are stored under the SHA-256 of their content, and each URL points
+    to the content it returned last time together with its ETag and
+    Last-Modified, which are sent back as a conditional GET. Parsed copies
+    of the content (Parquet / GeoParquet) are stored next to it, so a
+    repeated ticket skips both the transfer and the parse. Entries are
+    evicted least recently used first when the cache is larger than
+    `max_bytes`, except the contents in use: `fetch` pins the content it
+    returns until `release` is called with its hash.
+    """
+
+    def __init__(self, directory: str = ASSET_CACHE_DIR, max_bytes: int = ASSET_CACHE_MAX_BYTES,
+                 journal_mode: str = ASSET_CACHE_JOURNAL_MODE):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.objects_directory = os.path.join(self.directory, "objects")
+        os.makedirs(self.objects_directory, exist_ok=True)
+        self.lock = threading.Lock()
+        # 使用中のコンテンツのハッシュ -> 参照数（追い出しの対象外）
+        self.pinned = {}
+        self.connection = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), timeout=30,
+                                          check_same_thread=False)
+        self.connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, content_hash TEXT NOT NULL, etag TEXT, last_modified TEXT)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "content_hash TEXT NOT NULL, kind TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, "
+            "last_used_at REAL NOT NULL, PRIMARY KEY (content_hash, kind))"
+        )
+        self.connection.commit()
+
+    def owns(self, path: str) -> bool:
+        """Whether the file belongs to the cache (and must not be deleted by the caller)."""
+        return path is not None and os.path.abspath(path).startswith(self.objects_directory + os.sep)
+
+    def fetch(self, url: str, headers: dict = None):
+        """
+        Download the URL through the cache.
+
+        Returns the path of the cached file and its content hash. The file is
+        shared with other tickets and must not be modified or deleted. It is
+        not evicted until `release` is called with the content hash.
+        """
+        headers = dict(headers or {})
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT urls.content_hash, etag, last_modified, path FROM urls JOIN objects "
+                "ON urls.content_hash = objects.content_hash AND objects.kind = ? WHERE url = ?", (RAW, url)
+            ).fetchone()
+            if row is not None:
+                self._pin(row[0])
+        try:
+            if row is not None and os.path.exists(row[3]):
+                if row[1]:
+                    headers["If-None-Match"] = row[1]
+                if row[2]:
+                    headers["If-Modified-Since"] = row[2]
+
+            with requests.get(url, headers=headers, stream=True,
+                              timeout=ASSET_DOWNLOAD_TIMEOUT_SECONDS) as response:
+                if response.status_code == 304 and row is not None:
+                    # 変更がなければキャッシュのファイルをピンしたまま返す
+                    self._touch(row[0], RAW)
+                    return row[3], row[0]
+                response.raise_for_status()
+                path, content_hash = self._store(response)
+        except BaseException:
+            if row is not None:
+                self.release(row[0])
+            raise
+        if row is not None:
+            self.release(row[0])
+
+        try:
+            with self.lock:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO urls (url, content_hash, etag, last_modified) VALUES (?, ?, ?, ?)",
+                    (url, content_hash, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                )
+                self.connection.commit()
+            self.evict()
+        except BaseException:
+            self.release(content_hash)
+            raise
+        return path, content_hash
+
+    def _pin(self, content_hash: str):
+        # self.lock を持った状態で呼ぶ
+        self.pinned[content_hash] = self.pinned.get(content_hash, 0) + 1
+
+    def release(self, content_hash: str):
+        """Unpin a content returned by `fetch`, so that it can be evicted again."""
+        with self.lock:
+            count = self.pinned.get(content_hash, 0) - 1
+            if count > 0:
+                self.pinned[content_hash] = count
+            else:
+                self.pinned.pop(content_hash, None)
+
+    def _store(self, response):
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=self.objects_directory, delete=False) as temp_file:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                if chunk:
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+        content_hash = digest.hexdigest()
+        path = os.path.join(self.objects_directory, content_hash)
+        # 同じ内容の古いファイルが追い出されないように、置き換える前にピンする
+        with self.lock:
+            self._pin(content_hash)
+        try:
+            os.replace(temp_file.name, path)
+            self._register(content_hash, RAW, path)
+        except BaseException:
+            self.release(content_hash)
+            raise
+        return path, content_hash
+
+    def _register(self, content_hash: str, kind: str, path: str):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO objects (content_hash, kind, path, size, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (content_hash, kind, path, os.path.getsize(path), time.time())
+            )
+            self.connection.commit()
+
+    def _touch(self, content_hash: str, kind: str):
+        with self.lock:
+            self.connection.execute("UPDATE objects SET last_used_at = ? WHERE content_hash = ? AND kind = ?",
+                                    (time.time(), content_hash, kind))
+            self.connection.commit()
+
+    def read_frame(self, url: str, read, kind: str, headers: dict = None):
+        """Return the DataFrame parsed from the URL by `read(path)`, see `read_file_frame`."""
+        path, content_hash = self.fetch(url, headers)
+        try:
+            return self.read_file_frame(path, read, kind, content_hash)
+        finally:
+            self.release(content_hash)
+
+    def read_file_frame(self, path: str, read, kind: str, content_hash: str = None):
+        """
+        Return the DataFrame parsed from a cached file by `read(path)`. The
+        file must be pinned by `fetch` while it is read.
+
+        The parsed frame is stored as (Geo)Parquet under `kind`, which must
+        change whenever `read` would return something different for the
+        same content.
+        """
+        if content_hash is None:
+            content_hash = os.path.basename(path)
+        with self.lock:
+            row = self.connection.execute("SELECT path FROM objects WHERE content_hash = ? AND kind = ?",
+                                          (content_hash, kind)).fetchone()
+        if pyarrow is not None and row is not None and os.path.exists(row[0]):
+            try:
+                frame = read_parquet(row[0])
+                self._touch(content_hash, kind)
+                return frame
+            except Exception as e:
+                print(f"[ASSET CACHE] Cannot read {row[0]}: {e}")
+
+        frame = read(path)
+        if pyarrow is not None and isinstance(frame, pd.DataFrame):
+            self._store_frame(frame, content_hash, kind)
+        return frame
+
+    def _store_frame(self, frame: pd.DataFrame, content_hash: str, kind: str):
+        kind_hash = hashlib.sha256(kind.encode()).hexdigest()[:16]
+        parsed_path = os.path.join(self.objects_directory, f"{content_hash}.{kind_hash}.parquet")
+        temp_path = f"{parsed_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            frame.to_parquet(temp_path)
+            os.replace(temp_path, parsed_path)
+            self._register(content_hash, kind, parsed_path)
+            self.evict()
+        except Exception as e:
+            # 型が混在した列など、Parquet にできないデータは解析結果をキャッシュしない
+            print(f"[ASSET CACHE] Cannot store the parsed data: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def evict(self):
+        """
+        Delete the least recently used objects while the cache is larger than
+        `max_bytes`, except those of the pinned contents, which are in use.
+        """
+        with self.lock:
+            total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self.connection.execute(
+                "SELECT content_hash, kind, path, size FROM objects ORDER BY last_used_at"
+            ).fetchall()
+            for content_hash, kind, path, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if content_hash in self.pinned:
+                    continue
+                # 元のファイルを消す場合は、その解析結果と URL の対応も消す
+                if kind == RAW:
+                    related = self.connection.execute(
+                        "SELECT path, size FROM objects WHERE content_hash = ?", (content_hash,)
+                    ).fetchall()
+                    self.connection.execute("DELETE FROM objects WHERE content_hash = ?", (content_hash,))
+                    self.connection.execute("DELETE FROM urls WHERE content_hash = ?", (content_hash,))
+                else:
+                    related = [(path, size)]
+                    self.connection.execute("DELETE FROM objects WHERE content_hash = ? AND kind = ?",
+                                            (content_hash, kind))
+                for related_path, related_size in related:
+                    if os.path.exists(related_path):
+                        os.remove(related_path)
+                        total -= related_size
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def read_parquet(path: str) -> pd.DataFrame:
+    try:
+        return gpd.read_parquet(path)
+    except ValueError:
+        # geometry 列のない DataFrame
+        return pd.read_parquet(path)
+
+
+_asset_cache = None
+_asset_cache_lock = threading.Lock()
+
+
+def get_asset_cache():
+    """Return the asset cache of this process, or None when it is disabled or not available."""
+    global _asset_cache
+    if not ASSET_CACHE_DIR:
+        return None
+    with _asset_cache_lock:
+        if _asset_cache is None:
+            try:
+                _asset_cache = AssetCache()
+            except (sqlite3.Error, OSError) as e:
+                print(f"[ASSET CACHE] Cannot open {ASSET_CACHE_DIR}: {e}")
+                return None
+        return _asset_cache
+
+
+def download_to_file(url: str, headers: dict = None) -> str:
+    """Download the URL to a new temporary file, which the caller deletes."""
+    with requests.get(url, headers=headers, stream=True, timeout=ASSET_DOWNLOAD_TIMEOUT_SECONDS) as response:
+        response.raise_for_status()
+        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                if chunk:
+                    temp_file.write(chunk)
+            return temp_file.name
+
+
+def fetch_asset(url: str, headers: dict = None) -> str:
+    """
+    Return the path of the downloaded URL, from the asset cache when it is
+    enabled. The caller passes it to `release_asset` once it is read.
+    """
+    cache = get_asset_cache()
+    if cache is None:
+        return download_to_file(url, headers)
+    return cache.fetch(url, headers)[0]
+
+
+def read_asset_frame(url: str, read, kind: str, headers: dict = None) -> pd.DataFrame:
+    """Return `read(path)` of the downloaded URL, from the parsed cache when it is enabled."""
+    cache = get_asset_cache()
+    if cache is None:
+        path = download_to_file(url, headers)
+        try:
+            return read(path)
+        finally:
+            os.remove(path)
+    return cache.read_frame(url, read, kind, headers)
+
+
+def read_asset_file(path: str, read, kind: str) -> pd.DataFrame:
+    """Return `read(path)` of a file returned by `fetch_asset`, from the parsed cache when it is cached."""
+    cache = get_asset_cache()
+    if cache is None or not cache.owns(path):
+        return read(path)
+    return cache.read_file_frame(path, read, kind)
+
+
+def release_asset(path: str):
+    """Delete a file returned by `fetch_asset`, or unpin it when it belongs to the cache."""
+    if path is None:
+        return
+    cache = get_asset_cache()
+    if cache is not None and cache.owns(path):
+        cache.release(os.path.basename(path))
+    elif os.path.exists(path):
+        os.remove(path)
+
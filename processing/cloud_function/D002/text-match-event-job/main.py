@@ -8,21 +8,15 @@ import pandas as pd
 import requests
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from pymongo import MongoClient
 from datetime import datetime, timezone
-from json import JSONDecoder
 from collections import OrderedDict
-import magic
-import mimetypes
-import tempfile
-from urllib.parse import quote_plus
-custom_json_decoder = JSONDecoder(object_pairs_hook=OrderedDict)
-
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
+from status_writer import status_writer
+from json_codec import JSON_HEADERS, dumps, loads
+from format_sniffer import sniff_file_format
+from projected_reader import read_json_frame, read_vector_frame
+from asset_cache import fetch_asset, read_asset_file, release_asset
+from concurrent_loader import load_concurrently
+
 
 # Retrieve Job-defined env vars
 TASK_INDEX = os.getenv("CLOUD_RUN_TASK_INDEX", 0)
@@ -34,17 +28,33 @@ DMS_DATA = os.getenv("DMS_DATA", "")
 CMS_GET_ASSETS_TOKEN = os.getenv('CMS_GET_ASSETS_TOKEN', None)
 
 
-def load_data(url: str, file_extension: str = 'json') -> pd.DataFrame:
-    """Load data from a URL with the given file extension."""
+def load_data(url: str, file_extension: str = 'json', columns: List[str] = None) -> pd.DataFrame:
+    """
+    Load data from a URL with the given file extension. With `columns`, only
+    these columns are read (those not in the data are left out), and the
+    geometry only when "geometry" is one of them.
+    """
 
     if file_extension == 'json':
-        return pd.read_json(url, dtype=object)
+        return read_json_frame(url, columns)
     elif file_extension == 'geojson':
-        return gpd.read_file(url)
+        if columns is None:
+            return gpd.read_file(url)
+        attributes = [col for col in columns if col != "geometry"]
+        return read_vector_frame(url, attributes, read_geometry="geometry" in columns)
     else:
         raise ValueError(f"対応していないファイル拡張子です: {file_extension}。サポートされている形式は 'json' または 'geojson' のみです。")
 
 
+def load_input_data(path: str, file_extension: str, columns: List[str] = None) -> pd.DataFrame:
+    """Load a downloaded input, reusing the parsed GeoParquet of a cached GeoJSON."""
+    if file_extension == 'geojson':
+        kind = "load_data:geojson" if columns is None else f"load_data:geojson:{columns}"
+        return read_asset_file(path, lambda file_path: load_data(file_path, file_extension, columns), kind)
+    # JSON は dtype=object で読むので、Parquet を経由すると型が変わってしまう
+    return load_data(path, file_extension, columns)
+
+
 def embedding_address(
         main_data: str,
         sub_data: str,
@@ -52,8 +62,7 @@ def embedding_address(
         columns: List[Dict[str, str]],
         threshold: float = 0.5
 ) -> tuple:
-    output_file_left = None
-    output_file_right = None
+    downloaded_files = {}
     try:
         main_column = []
         sub_column = []
@@ -62,14 +71,23 @@ def embedding_address(
             main_column.append(col["leftField"])
             sub_column.append(col["rightField"])
 
-        output_file_left, left_input_type = get_extension_file(main_data)
-        output_file_right, right_input_type = get_extension_file(sub_data)
+        def download_and_load(name, url, columns=None):
+            output_file, input_type = get_extension_file(url)
+            downloaded_files[name] = output_file
+            if output_file is None:
+                raise Exception("ファイルをダウンロードできませんでした。")
+            return load_input_data(output_file, input_type, columns), input_type
 
-        if output_file_left is None or output_file_right is None:
-            raise Exception("ファイルをダウンロードできませんでした。")
+        # keepRightFields がある場合、サブデータはその列と結合に使う列だけを読む
+        sub_columns = list(dict.fromkeys(keep_right_fields + sub_column)) if keep_right_fields else None
 
-        main_df = load_data(output_file_left, left_input_type)
-        sub_df = load_data(output_file_right, right_input_type)
+        # メインデータとサブデータのダウンロードと読み込みを並行して行う
+        inputs = load_concurrently({
+            "main_data": lambda: download_and_load("main_data", main_data),
+            "sub_data": lambda: download_and_load("sub_data", sub_data, sub_columns),
+        })
+        main_df, left_input_type = inputs["main_data"]
+        sub_df, _ = inputs["sub_data"]
 
         for col in main_column:
             if col not in main_df.columns:
@@ -171,7 +189,7 @@ def embedding_address(
             result_df = result_df.drop(columns=["geometry.1"], errors='ignore')
             json_data = result_df.to_json()
 
-        data = custom_json_decoder.decode(json_data)
+        data = loads(json_data)
 
         # 結果の表示
         if not_merged == 0:
@@ -200,10 +218,8 @@ def embedding_address(
         print(f"Error function embedding_address: {err}")
         raise Exception(err)
     finally:
-        if output_file_left is not None and os.path.exists(output_file_left):
-            os.remove(output_file_left)
-        if output_file_right is not None and os.path.exists(output_file_right):
-            os.remove(output_file_right)
+        for output_file in downloaded_files.values():
+            release_asset(output_file)
 
 
 def generate_schema(res):
@@ -305,7 +321,7 @@ def call_api_endpoint(data, schema, ticketId, api_endpoint, file_extension):
         })
         print(f'request {request}')
         time.sleep(5)
-        response = requests.post(api_endpoint, json=request)
+        response = requests.post(api_endpoint, data=dumps(request), headers=JSON_HEADERS)
         print("response", response)
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
@@ -318,7 +334,7 @@ def call_api_endpoint(data, schema, ticketId, api_endpoint, file_extension):
 def text_match_event(request_data):
     ticket_id = None
     try:
-        req = custom_json_decoder.decode(request_data)
+        req = loads(request_data)
 
         ticket_id = req["ticketId"]
         input_left = req['inputLeft']
@@ -344,13 +360,7 @@ def text_match_event(request_data):
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -358,11 +368,9 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict)
     except Exception as e:
         print(f"error {e}")
-    finally:
-        client.close()
 
 
 # Function get extension file
@@ -370,81 +378,24 @@ def get_extension_file(url):
     try:
         ext_file = get_extention_file_from_url(url)
         output_file_path = download_file(url)
+
         if ext_file["status"]:
             return output_file_path, ext_file["ext"]
         else:
-            validator = magic.Magic(uncompress=True, mime=True)
-            file_type = validator.from_file(output_file_path)
-            extension = mimetypes.guess_extension(file_type, strict=True).replace('.', '')
-
-            if extension and extension != 'txt':
-                return output_file_path, extension
-            else:
-                is_csv = is_csv_file(output_file_path)
-                if is_csv["status"]:
-                    return output_file_path, is_csv["ext"]
-
-                file = open(output_file_path, "r", encoding="utf8", errors="ignore")
-                data = file.read()
-                is_json = is_json_file(data)
-                if is_json["status"]:
-                    file.close()
-                    return output_file_path, is_json["ext"]
-
-                file.close()
-                return output_file_path, 'txt'
+            return output_file_path, sniff_file_format(output_file_path)
     except BaseException as e:
         print(e)
         return None, 'txt'
 
 def download_file(url):
     # Download file
-    headers = {
-        'Authorization': f'Bearer {CMS_GET_ASSETS_TOKEN}'
-    }
-
-    if not CMS_GET_ASSETS_TOKEN:
-        data = requests.get(url, stream=True)
-    else:
-        data = requests.get(url, headers=headers, stream=True)
-    data.raise_for_status()
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        for chunk in data.iter_content(chunk_size=8192):
-            if chunk:
-                temp_file.write(chunk)
-
-        output_file_path = temp_file.name
-
-    return output_file_path
-
-def is_json_file(file_data):
-    json_data = None
-    try:
-        json_data = json.loads(file_data)
-        # Check geojson or json
-        if type(json_data) == dict:
-            if (
-                    "type" in json_data
-                    and json_data["type"] == "FeatureCollection"
-                    and "features" in json_data
-                    and type(json_data["features"]) == list
-            ):
-                return {"status": True, "ext": "geojson"}
-            else:
-                return {"status": True, "ext": "json"}
-        else:
-            return {"status": True, "ext": "json"}
-    except BaseException as e:
-        return {"status": False, "ext": ""}
-
-
-def is_csv_file(data):
-    try:
-        pd.read_csv(data)
-        return {"status": True, "ext": "csv"}
-    except Exception as e:
-        return {"status": False, "ext": "not csv"}
+    headers = None
+    if CMS_GET_ASSETS_TOKEN:
+        headers = {
+            'Authorization': f'Bearer {CMS_GET_ASSETS_TOKEN}'
+        }
 
+    return fetch_asset(url, headers)
 
 def get_extention_file_from_url(url):
     arr_file_url = url.split('/')
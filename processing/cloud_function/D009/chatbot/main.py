@@ -1,11 +1,9 @@
-import os
 import uuid
 from datetime import datetime, timezone
 
 from flask import jsonify, make_response
 from pydantic import BaseModel, ValidationError, Field
-from pymongo import MongoClient
-from urllib.parse import quote_plus
+from status_writer import get_collection, status_writer
 from work_follow import graph
 
 RAG_TEMPLATE = """Answer with respect to the context and must be in Japanese:
@@ -16,12 +14,6 @@ question: {question}
 {format_instructions}
 """
 
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
-
 
 class RequestBody(BaseModel):
     prompt: str
@@ -91,13 +83,8 @@ def chatbot(request):
 
 
 def create_ticket_id():
-    client = None
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
+        collection = get_collection()
         ticketId = str(uuid.uuid4())
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
@@ -115,19 +102,10 @@ def create_ticket_id():
     except BaseException as e:
         print(f"error {e}")
         raise Exception(e)
-    finally:
-        if client:
-            client.close()
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -135,9 +113,7 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict, flush=True)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        client.close()
 
@@ -1,7 +1,6 @@
 import asyncio
 import json
 import math
-import mimetypes
 import os
 import sys
 import tempfile
@@ -12,21 +11,16 @@ from datetime import timezone
 
 import boto3
 import geopandas as gpd
-import magic
 import pandas as pd
 import requests
 from langchain_aws.embeddings import BedrockEmbeddings
 from langchain_community.document_loaders import DataFrameLoader
 from langchain_google_community import BigQueryVectorStore
-from pymongo import MongoClient
-from urllib.parse import quote_plus
+from status_writer import status_writer
+from json_codec import JSON_HEADERS, dumps, loads
 from llm import LLMChat
+from format_sniffer import sniff_file_format
 
-MONGO_CLIENT = f"mongodb://{os.getenv('MONGO_CLIENT')}"
-PASSWORD_MONGODB = os.getenv('PASSWORD_MONGODB')
-USER_AUTH = os.getenv('USER_AUTH')
-MONGO_DB = os.getenv('MONGO_DB')
-MONGO_COLLECTION = os.getenv('MONGO_COLLECTION')
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID', '')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', '')
 REGION = os.getenv('REGION', 'asia-northeast1')
@@ -50,28 +44,11 @@ def get_extension_file(url):
     try:
         ext_file = get_extention_file_from_url(url)
         output_file_path = download_file(url)
+
         if ext_file["status"]:
             return output_file_path, ext_file["ext"]
         else:
-
-            validator = magic.Magic(uncompress=True, mime=True)
-            file_type = validator.from_file(output_file_path)
-            extension = mimetypes.guess_extension(file_type, strict=True).replace('.', '')
-
-            if extension and extension != 'txt' or extension == None:
-                return output_file_path, extension
-            else:
-                file = open(output_file_path, "r", encoding="utf8", errors="ignore")
-                data = file.read()
-                is_json = is_json_file(data)
-                file.close()
-                if is_json["status"]:
-                    return output_file_path, is_json["ext"]
-
-                is_csv = is_csv_file(output_file_path)
-                if is_csv["status"]:
-                    return output_file_path, is_csv["ext"]
-                return output_file_path, 'txt'
+            return output_file_path, sniff_file_format(output_file_path)
     except BaseException as e:
         print(e)
         return None, 'txt'
@@ -96,35 +73,6 @@ def download_file(url):
 
     return output_file_path
 
-def is_json_file(file_data):
-    json_data = None
-    try:
-        json_data = json.loads(file_data)
-        # Check geojson or json
-        if type(json_data) == dict:
-            if (
-                    "type" in json_data
-                    and json_data["type"] == "FeatureCollection"
-                    and "features" in json_data
-                    and type(json_data["features"]) == list
-            ):
-                return {"status": True, "ext": "geojson"}
-            else:
-                return {"status": True, "ext": "json"}
-        else:
-            return {"status": True, "ext": "json"}
-    except BaseException as e:
-        return {"status": False, "ext": ""}
-
-
-def is_csv_file(data):
-    try:
-        pd.read_csv(data)
-        return {"status": True, "ext": "csv"}
-    except Exception as e:
-        return {"status": False, "ext": "not csv"}
-
-
 def get_extention_file_from_url(url):
     arr_file_url = url.split('/')
     file_name = arr_file_url[len(arr_file_url) - 1]
@@ -259,7 +207,7 @@ def vectorize_event(message):
     ticket_id = None
     output_file_path = None
     try:
-        request = json.loads(message)
+        request = loads(message)
         ticket_id = request["ticketId"]
 
         file_id = request.get("id", None)
@@ -365,13 +313,7 @@ def load_embeddings(model_id: str):
 
 
 def update_information(data, ticketId):
-    global client
     try:
-        escaped_user = quote_plus(USER_AUTH)
-        escaped_password = quote_plus(PASSWORD_MONGODB)
-        client = MongoClient(MONGO_CLIENT.replace("://", f"://{escaped_user}:{escaped_password}@"))
-        db = client[MONGO_DB]
-        collection = db[MONGO_COLLECTION]
         now = datetime.now(timezone.utc)
         formatted_time = now.strftime('%Y-%m-%d %H:%M:%S')
         document = {
@@ -379,11 +321,9 @@ def update_information(data, ticketId):
         }
         merged_dict = data.copy()
         merged_dict.update(document)
-        collection.update_one({"_id": ticketId}, {"$set": merged_dict})
+        status_writer.update({"_id": ticketId}, merged_dict)
     except BaseException as e:
         print(f"error {e}")
-    finally:
-        client.close()
 
 
 def call_api_endpoint(data, ticketId, api_endpoint):
@@ -421,7 +361,7 @@ def call_api_endpoint(data, ticketId, api_endpoint):
 
         print(f'request {request}')
         time.sleep(5)
-        response = requests.post(api_endpoint, json=request)
+        response = requests.post(api_endpoint, data=dumps(request), headers=JSON_HEADERS)
         print("response", response)
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")